@@ -0,0 +1,64 @@
+# benchmarks/bench_db_bulk.py
+"""Persisting a batch import: per-row save_* calls vs. the bulk APIs.
+
+Records `--products` materials with one history row per platform, first with
+save_material / save_history (one transaction each), then with
+save_materials_bulk / save_history_bulk (one transaction each).
+
+Usage: python -m benchmarks.bench_db_bulk --products 1000 --platforms 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from data.db import Database
+
+PLATFORMS = ("taobao", "jd", "douyin", "xiaohongshu")
+COPIES = [{"title": "轻跑运动鞋 透气缓震", "selling_points": ["透气网面", "缓震中底", "轻量鞋身"]}] * 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--platforms", type=int, default=4, choices=range(1, len(PLATFORMS) + 1))
+    args = parser.parse_args()
+
+    platforms = PLATFORMS[:args.platforms]
+    materials = [
+        {"name": f"商品{i}", "selling_points": ["透气", "缓震"], "price": 99.0, "image_path": f"/uploads/{i}.png"}
+        for i in range(args.products)
+    ]
+    workdir = tempfile.mkdtemp(prefix="easyvibe-bulk-bench-")
+
+    db = Database(os.path.join(workdir, "per_row.db"))
+    start = time.perf_counter()
+    for m in materials:
+        material_id = db.save_material(m["name"], m["selling_points"], m["price"], m["image_path"])
+        for pk in platforms:
+            db.save_history(material_id, "minimal", pk, "promo", f"/outputs/{m['name']}_{pk}.png", COPIES)
+    per_row = time.perf_counter() - start
+    db.close()
+
+    db = Database(os.path.join(workdir, "bulk.db"))
+    start = time.perf_counter()
+    ids = db.save_materials_bulk(materials)
+    db.save_history_bulk(
+        [
+            {"material_index": i, "template_name": "minimal", "platform": pk, "copy_style": "promo",
+             "image_path": f"/outputs/{m['name']}_{pk}.png", "copies": COPIES}
+            for i, m in enumerate(materials) for pk in platforms
+        ],
+        material_ids=ids,
+    )
+    bulk = time.perf_counter() - start
+    db.close()
+
+    rows = args.products * (1 + len(platforms))
+    print(f"{args.products} products x {len(platforms)} platforms = {rows} rows")
+    print(f"  per-row save_*:  {per_row * 1000:8.1f} ms ({rows / per_row:8.0f} rows/s)")
+    print(f"  bulk save_*_bulk:{bulk * 1000:8.1f} ms ({rows / bulk:8.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
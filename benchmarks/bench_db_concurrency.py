@@ -0,0 +1,92 @@
+# benchmarks/bench_db_concurrency.py
+"""Read/write throughput of data/db.py under contention.
+
+Writer threads insert history rows (save_history, one commit each) while
+reader threads page through history (list_history) for a fixed duration, all
+sharing one Database instance the way batch workers and background threads do
+(`--instance-per-thread` gives each thread its own, like each page script does).
+`--journal-mode delete` switches the file back to the rollback journal for
+comparison with WAL.
+
+Usage: python -m benchmarks.bench_db_concurrency --writers 4 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from data.db import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--journal-mode", choices=("wal", "delete"), default="wal")
+    parser.add_argument("--instance-per-thread", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="easyvibe-db-bench-")
+    db = Database(os.path.join(workdir, "bench.db"))
+    if args.journal_mode == "delete":
+        db.conn.execute("PRAGMA journal_mode=DELETE")
+    material_id = db.save_material("商品", ["卖点"], 99.0, "/a.png")
+    db.conn.executemany(
+        "INSERT INTO generation_history (material_id, template_name, platform, copy_style, "
+        "generated_image_path, generated_copy) VALUES (?, 'minimal', 'taobao', 'promo', ?, '[]')",
+        ((material_id, f"/seed{i}.png") for i in range(args.seed_rows)),
+    )
+    db.conn.commit()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    write_latency, read_latency = [], []
+
+    def worker(kind):
+        conn_db = Database(db.db_path) if args.instance_per_thread else db
+        done, latencies = 0, []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                if kind == "writes":
+                    conn_db.save_history(material_id, "minimal", "taobao", "promo", "/out.png", [{"title": "T"}])
+                else:
+                    conn_db.list_history(limit=50)
+            except sqlite3.Error:
+                with lock:
+                    counts["errors"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            done += 1
+        with lock:
+            counts[kind] += done
+            (write_latency if kind == "writes" else read_latency).extend(latencies)
+
+    threads = [threading.Thread(target=worker, args=("writes",)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=("reads",)) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    db.close()
+
+    def p95(values):
+        values = sorted(values)
+        return values[int(0.95 * (len(values) - 1))] * 1000 if values else 0.0
+
+    mode = "instance per thread" if args.instance_per_thread else "shared instance"
+    print(f"journal={args.journal_mode} {mode} writers={args.writers} readers={args.readers} {args.seconds:.0f}s")
+    print(f"  writes: {counts['writes'] / args.seconds:8.0f}/s  p95 {p95(write_latency):6.2f} ms")
+    print(f"  reads:  {counts['reads'] / args.seconds:8.0f}/s  p95 {p95(read_latency):6.2f} ms")
+    print(f"  sqlite errors ('database is locked' etc.): {counts['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_db_pagination.py
+"""Listing latency of data/db.py at scale (1M history rows by default).
+
+Seeds a temporary database with materials and generation history spread over
+a year across platforms and templates, then times the first page, a deep page
+(keyset cursor vs. the equivalent OFFSET query) and filtered pages, plus a
+large listing read in full (every JSON column decoded), lazily (names only)
+and with `columns=`.
+`--drop-indexes` removes the listing indexes to show the unindexed baseline.
+
+Usage: python -m benchmarks.bench_db_pagination --rows 1000000 --repeat 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from data.db import Database
+
+PLATFORMS = ("taobao", "jd", "douyin", "xiaohongshu")
+TEMPLATES = ("minimal", "promo", "premium", "fresh", "social")
+LISTING_INDEXES = (
+    "idx_materials_created",
+    "idx_history_created",
+    "idx_history_platform_created",
+    "idx_history_template_created",
+    "idx_history_material",
+)
+HISTORY_SQL = (
+    "SELECT h.*, m.name as product_name FROM generation_history h "
+    "LEFT JOIN materials m ON h.material_id = m.id ORDER BY h.created_at DESC, h.id DESC LIMIT 50 OFFSET ?"
+)
+
+
+def _seed(db: Database, rows: int, materials: int, seed: int):
+    rng = random.Random(seed)
+    db.conn.executemany(
+        "INSERT INTO materials (name, selling_points, price, image_path, created_at) "
+        "VALUES (?, '[\"卖点\"]', ?, '', datetime('2025-01-01', ?))",
+        ((f"商品{i}", rng.uniform(10, 500), f"+{i * 365 * 86400 // materials} seconds") for i in range(materials)),
+    )
+    # Rows arrive in time order, several per second at peak, like real usage
+    db.conn.executemany(
+        "INSERT INTO generation_history (material_id, template_name, platform, copy_style, "
+        "generated_image_path, generated_copy, created_at) "
+        "VALUES (?, ?, ?, 'promo', '/out.png', '[{\"title\": \"T\"}]', datetime('2025-01-01', ?))",
+        (
+            (rng.randint(1, materials), rng.choice(TEMPLATES), rng.choice(PLATFORMS),
+             f"+{i * 365 * 86400 // rows} seconds")
+            for i in range(rows)
+        ),
+    )
+    db.conn.commit()
+
+
+def _time(fn, repeat: int) -> float:
+    """Best-of-repeat wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--materials", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--drop-indexes", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db = Database(os.path.join(tempfile.mkdtemp(prefix="easyvibe-db-bench-"), "bench.db"))
+    start = time.perf_counter()
+    _seed(db, args.rows, args.materials, args.seed)
+    if args.drop_indexes:
+        for name in LISTING_INDEXES:
+            db.conn.execute(f"DROP INDEX {name}")
+    db.conn.execute("ANALYZE")
+    print(f"seeded {args.rows} history rows / {args.materials} materials in {time.perf_counter() - start:.1f}s"
+          f"{' (listing indexes dropped)' if args.drop_indexes else ''}")
+
+    deep = args.rows // 2
+    cursor_row = db.conn.execute(
+        "SELECT created_at, id FROM generation_history ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+        (deep - 1,),
+    ).fetchone()
+    deep_cursor = (cursor_row[0], cursor_row[1])
+    month = ("2025-06-01", "2025-07-01")
+
+    cases = [
+        ("list_history(limit=50)", lambda: db.list_history(limit=50)),
+        ("history page 1", lambda: db.list_history_page()),
+        (f"history page @{deep} keyset", lambda: db.list_history_page(after=deep_cursor)),
+        (f"history page @{deep} OFFSET", lambda: db.conn.execute(HISTORY_SQL, (deep,)).fetchall()),
+        ("platform filter", lambda: db.list_history_page(platform="douyin")),
+        ("platform+template filter", lambda: db.list_history_page(platform="douyin", template_name="premium")),
+        ("one month range", lambda: db.list_history_page(since=month[0], until=month[1])),
+        ("platform + month, deep", lambda: db.list_history_page(
+            after=(f"{month[0]} 12:00:00", 0), platform="jd", since=month[0])),
+        ("materials page 1", lambda: db.list_materials_page()),
+        ("list_history(5000), decode all", lambda: [dict(r) for r in db.list_history(limit=5000)]),
+        ("list_history(5000), names only", lambda: [r["product_name"] for r in db.list_history(limit=5000)]),
+        ("list_history(5000, columns=)", lambda: [
+            r["product_name"] for r in db.list_history(limit=5000, columns=["product_name", "platform"])
+        ]),
+    ]
+    for label, fn in cases:
+        print(f"{label:>32}: {_time(fn, args.repeat):8.2f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_import_time.py
+"""Cold import time of each Streamlit page's module imports.
+
+Parses the top-level imports of app.py and pages/*.py, imports them in a fresh
+interpreter with `python -X importtime` and sums the cumulative time of each
+top-level module. Modules loaded at interpreter startup are not counted.
+Streamlit itself (and pandas, which it pulls in) are excluded by default, and
+modules streamlit already imports (requests) are preloaded: they are paid once
+per server process, not per page.
+
+Exits non-zero if any page exceeds the budget.
+
+Usage: python -m benchmarks.bench_import_time --budget-ms 150 --repeat 3
+"""
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cold project imports per page (after streamlit is loaded)
+IMPORT_BUDGET_MS = 150.0
+DEFAULT_EXCLUDE = ("streamlit", "pandas")
+DEFAULT_PRELOAD = ("requests",)
+
+
+def page_imports(path: str, exclude=DEFAULT_EXCLUDE) -> list[str]:
+    """Top-level modules imported by a page script, in order, minus excluded packages."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] not in exclude and name not in modules:
+                modules.append(name)
+    return modules
+
+
+def _top_level_imports(code: str) -> list[tuple[float, str]]:
+    """Run code under -X importtime; return [(cumulative ms, module)] of top-level imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name[1] == " ":
+            continue  # nested import, already counted by its parent
+        entries.append((int(cumulative) / 1000, name.strip()))
+    return entries
+
+
+def measure(modules: list[str], preload=DEFAULT_PRELOAD) -> tuple[float, list[tuple[float, str]]]:
+    """Import modules in a fresh interpreter; return (total ms, [(ms, module)] of top-level entries).
+
+    Startup modules and `preload` (imported first) are not counted.
+    """
+    if not modules:
+        return 0.0, []
+    skip = {name for _, name in _top_level_imports("pass")} | set(preload)
+    code = "".join(f"import {name}\n" for name in (*preload, *modules))
+    entries = [(ms, name) for ms, name in _top_level_imports(code) if name not in skip]
+    return sum(ms for ms, _ in entries), sorted(entries, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of N runs")
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list")
+    parser.add_argument("--include-streamlit", action="store_true",
+                        help="count streamlit, pandas and requests too")
+    args = parser.parse_args()
+
+    exclude, preload = ((), ()) if args.include_streamlit else (DEFAULT_EXCLUDE, DEFAULT_PRELOAD)
+    pages = [os.path.join(ROOT, "app.py")] + sorted(glob.glob(os.path.join(ROOT, "pages", "[0-9]*.py")))
+    over = []
+    for path in pages:
+        modules = page_imports(path, exclude)
+        total, entries = min((measure(modules, preload) for _ in range(args.repeat)), key=lambda r: r[0])
+        status = "ok" if total <= args.budget_ms else "OVER"
+        print(f"{os.path.relpath(path, ROOT):>22}: {total:7.1f} ms  [{status}]")
+        for ms, name in entries[:args.top]:
+            print(f"{'':>26}{ms:7.1f} ms  {name}")
+        if total > args.budget_ms:
+            over.append(path)
+    print(f"budget {args.budget_ms:.0f} ms per page")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
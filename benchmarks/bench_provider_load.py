@@ -0,0 +1,119 @@
+# benchmarks/bench_provider_load.py
+"""Offline throughput / tail-latency benchmark of the AI background and copy pipelines.
+
+Starts benchmarks/stub_server.py in-process, points both clients at it and
+fires concurrent generate_ai_background / generate_copy calls.
+
+Usage: python -m benchmarks.bench_provider_load --requests 40 --concurrency 8 \
+           --task-duration lognormal:2,0.4 --quota-error-rate 0.05
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from benchmarks.stub_server import StubState, start_server
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int(pct * (len(values) - 1))]
+
+
+def _report(label: str, latencies: list[float], errors: int, elapsed: float):
+    done = len(latencies)
+    print(
+        f"{label:>10}: {done} ok / {errors} failed in {elapsed:6.2f}s "
+        f"({done / elapsed if elapsed else 0:5.2f} req/s) | "
+        f"p50 {_percentile(latencies, 0.50):6.2f}s p95 {_percentile(latencies, 0.95):6.2f}s "
+        f"p99 {_percentile(latencies, 0.99):6.2f}s max {max(latencies, default=0):6.2f}s"
+    )
+
+
+def _run(fn, count: int, concurrency: int):
+    latencies, errors = [], 0
+
+    def one(i):
+        start = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one, i) for i in range(count)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--task-duration", default="lognormal:2,0.4")
+    parser.add_argument("--chat-latency", default="lognormal:1,0.4")
+    parser.add_argument("--task-failure-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-running-tasks", type=int, default=0)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    state = StubState(
+        task_duration=args.task_duration,
+        chat_latency=args.chat_latency,
+        task_failure_rate=args.task_failure_rate,
+        quota_error_rate=args.quota_error_rate,
+        max_running_tasks=args.max_running_tasks,
+        seed=args.seed,
+    )
+    server = start_server(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["DASHSCOPE_HTTP_BASE_URL"] = f"{base}/api/v1"
+    os.environ["DEEPSEEK_BASE_URL"] = base
+    os.environ.setdefault("DASHSCOPE_API_KEY", "stub-key")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "stub-key")
+
+    # Import after the environment points at the stub server
+    from core import bg_generator, copy_generator, metrics
+    from core.copy_generator import generate_copy
+    from core.result_cache import BlobCache
+    from data.db import Database
+
+    workdir = tempfile.mkdtemp(prefix="easyvibe-bench-")
+    bg_generator._result_cache = BlobCache(os.path.join(workdir, "cache"), 1 << 30)
+    bg_generator._journal_db = Database(os.path.join(workdir, "journal.db"))
+    # Keep stub copy out of the real copy cache in data/app.db
+    copy_generator._cache_db = Database(os.path.join(workdir, "copy_cache.db"))
+    bg_generator.POLL_INTERVAL = args.poll_interval
+
+    def make_background(i):
+        # Distinct product per request so the result cache never short-circuits
+        product = Image.new("RGBA", (400, 400), (i % 256, (i * 7) % 256, (i * 13) % 256, 255))
+        bg_generator.generate_ai_background(product, f"商品{i}", "minimal", 800, 800)
+
+    def make_copy(i):
+        generate_copy(f"商品{i}", ["卖点"], 99.0, "taobao", "promo")
+
+    print(f"stub server {base} | {args.requests} requests @ concurrency {args.concurrency}")
+    _report("background", *_run(make_background, args.requests, args.concurrency))
+    _report("copy", *_run(make_copy, args.requests, args.concurrency))
+    print(f"stub counts: {state.counts}")
+    for name in ("dashscope", "deepseek"):
+        depth = metrics.summarize(f"governor.{name}.queue_depth")
+        wait = metrics.summarize(f"governor.{name}.wait_seconds")
+        print(f"governor {name}: queue depth p95 {depth['p95']:.0f} max {depth['max']:.0f} | "
+              f"wait p95 {wait['p95']:.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
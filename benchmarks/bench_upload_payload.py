@@ -0,0 +1,67 @@
+# benchmarks/bench_upload_payload.py
+"""Compare DashScope upload payloads before/after upload preparation.
+
+Usage: python -m benchmarks.bench_upload_payload
+
+"before" reproduces the original behaviour (default-compression PNG for the
+canvas, full-resolution RGBA PNG for the reference image); "after" uses the
+current helpers in core.bg_generator. Network time is not included — upload
+latency scales with the byte counts printed here.
+"""
+import os
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from core.bg_generator import (
+    _prepare_ref_image,
+    _save_rgb_to_temp,
+    _save_rgba_to_temp,
+)
+
+
+def _make_canvas(width=800, height=800):
+    product = Image.effect_noise((400, 400), 40).convert("RGBA")
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    canvas.paste(product, ((width - 400) // 2, (height - 400) // 2))
+    return canvas
+
+
+def _make_phone_photo():
+    # ~12MP photo with real texture so it doesn't compress to nothing
+    return Image.effect_noise((4000, 3000), 60).convert("RGB")
+
+
+def _legacy(canvas, ref):
+    sizes = []
+    for img in (canvas, ref.convert("RGBA")):
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        sizes.append(len(buf.getvalue()))
+    return sizes
+
+
+def _current(canvas, ref):
+    sizes = []
+    for path in (_save_rgba_to_temp(canvas), _save_rgb_to_temp(_prepare_ref_image(ref))):
+        sizes.append(os.path.getsize(path))
+        os.unlink(path)
+    return sizes
+
+
+def main():
+    canvas = _make_canvas()
+    ref = _make_phone_photo()
+    for label, fn in (("before", _legacy), ("after", _current)):
+        start = time.perf_counter()
+        canvas_bytes, ref_bytes = fn(canvas, ref)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:>6}: canvas {canvas_bytes / 1024:8.1f} KiB | ref {ref_bytes / 1024:9.1f} KiB | "
+            f"total {(canvas_bytes + ref_bytes) / 1024:9.1f} KiB | prepare {elapsed * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
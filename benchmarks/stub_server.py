@@ -0,0 +1,338 @@
+# benchmarks/stub_server.py
+"""Local stand-in for the DashScope and DeepSeek HTTP APIs, for offline load tests.
+
+Implements just enough of each API for core/bg_generator.py and
+core/copy_generator.py:
+
+    GET  /api/v1/uploads?action=getPolicy        OSS upload policy (points back here)
+    POST /oss                                     OSS form upload
+    POST /api/v1/services/aigc/background-generation/generation/   submit task
+    GET  /api/v1/tasks/<task_id>                  task status
+    POST /api/v1/tasks/<task_id>/cancel           cancel a PENDING task
+    GET  /results/<task_id>/<i>.png               result image
+    POST /chat/completions, /v1/chat/completions  DeepSeek (OpenAI-compatible) chat,
+                                                  SSE-streamed when "stream": true
+
+Point the clients at it with:
+
+    DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8765/api/v1
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765
+
+Usage: python -m benchmarks.stub_server --port 8765 --task-duration lognormal:8,0.5
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlparse
+
+from PIL import Image
+
+CHAT_CANDIDATES = [
+    {"title": "本地测试标题一", "selling_points": ["卖点一", "卖点二", "卖点三"]},
+    {"title": "本地测试标题二", "selling_points": ["卖点甲", "卖点乙", "卖点丙"]},
+]
+CHAT_CONTENT = json.dumps({"candidates": CHAT_CANDIDATES}, ensure_ascii=False)
+
+
+def chat_content(payload: dict) -> str:
+    """Reply body for a chat request: per-platform candidates when the prompt asks for several platforms.
+
+    Multi-platform copy prompts end with a {"platforms": {...}} example listing
+    the requested keys; anything else gets the single-platform CHAT_CONTENT.
+    """
+    messages = payload.get("messages") or []
+    prompt = messages[-1].get("content", "") if messages else ""
+    for line in reversed(str(prompt).splitlines()):
+        if not line.startswith('{"platforms"'):
+            continue
+        try:
+            platforms = json.loads(line)["platforms"]
+        except (ValueError, KeyError):
+            break
+        return json.dumps(
+            {"platforms": {key: {"candidates": CHAT_CANDIDATES} for key in platforms}},
+            ensure_ascii=False,
+        )
+    return CHAT_CONTENT
+
+
+class Latency:
+    """Latency distribution parsed from 'fixed:S', 'uniform:A,B' or 'lognormal:MEDIAN,SIGMA' (seconds)."""
+
+    def __init__(self, spec: str):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",")] if args else []
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        median, sigma = self.args
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+class StubState:
+    """Shared configuration and task table for all request handlers."""
+
+    def __init__(
+        self,
+        submit_latency: str = "fixed:0.05",
+        task_duration: str = "lognormal:8,0.4",
+        chat_latency: str = "lognormal:4,0.4",
+        task_failure_rate: float = 0.0,
+        quota_error_rate: float = 0.0,
+        max_running_tasks: int = 0,
+        seed: int | None = None,
+    ):
+        self.submit_latency = Latency(submit_latency)
+        self.task_duration = Latency(task_duration)
+        self.chat_latency = Latency(chat_latency)
+        self.task_failure_rate = task_failure_rate
+        self.quota_error_rate = quota_error_rate
+        self.max_running_tasks = max_running_tasks
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tasks: dict[str, dict] = {}
+        self.ids = itertools.count(1)
+        self.counts = {"submitted": 0, "throttled": 0, "uploads": 0, "chat": 0, "canceled": 0}
+        self._result_png = None
+
+    def result_png(self) -> bytes:
+        if self._result_png is None:
+            buf = BytesIO()
+            Image.new("RGB", (800, 800), (180, 170, 160)).save(buf, format="PNG")
+            self._result_png = buf.getvalue()
+        return self._result_png
+
+    def running_tasks(self, now: float) -> int:
+        return sum(1 for t in self.tasks.values() if t["done_at"] > now)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state: StubState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _stream_chat(self, content: str, duration: float, piece_chars: int = 8):
+        """Send content as OpenAI-style SSE chunks spread over `duration` seconds."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = [content[i:i + piece_chars] for i in range(0, len(content), piece_chars)]
+        base = {"id": "stub-chat", "object": "chat.completion.chunk", "created": int(time.time()), "model": "deepseek-chat"}
+
+        def send(payload):
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+        for piece in pieces:
+            time.sleep(duration / len(pieces))
+            send({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        send({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        send({**base, "choices": [], "usage": {"prompt_tokens": 300, "completion_tokens": 120, "total_tokens": 420}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _throttled(self) -> bool:
+        state = self.state
+        with state.lock:
+            hit = state.rng.random() < state.quota_error_rate
+            if hit:
+                state.counts["throttled"] += 1
+        if hit:
+            self._send_json(429, {"code": "Throttling.RateQuota", "message": "Requests rate limit exceeded"})
+        return hit
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        state = self.state
+        if path.rstrip("/") == "/api/v1/uploads":
+            host = f"http://{self.headers.get('Host')}/oss"
+            self._send_json(200, {
+                "request_id": "stub",
+                "data": {
+                    "upload_host": host,
+                    "upload_dir": "stub-uploads",
+                    "oss_access_key_id": "stub",
+                    "signature": "stub",
+                    "policy": "stub",
+                    "x_oss_object_acl": "private",
+                    "x_oss_forbid_overwrite": "true",
+                },
+            })
+        elif path.startswith("/api/v1/tasks/"):
+            task_id = path.rsplit("/", 1)[-1]
+            with state.lock:
+                task = state.tasks.get(task_id)
+            if task is None:
+                self._send_json(404, {"code": "NotFound", "message": "task not found"})
+                return
+            now = time.monotonic()
+            host = self.headers.get("Host")
+            output = {"task_id": task_id}
+            if task.get("canceled"):
+                output["task_status"] = "CANCELED"
+            elif now < task["done_at"]:
+                output["task_status"] = "RUNNING" if now > task["started_at"] else "PENDING"
+            elif task["fail"]:
+                output.update(task_status="FAILED", message="stub task failure")
+            else:
+                output["task_status"] = "SUCCEEDED"
+                output["results"] = [
+                    {"url": f"http://{host}/results/{task_id}/{i}.png"} for i in range(task["n"])
+                ]
+            self._send_json(200, {"request_id": "stub", "output": output})
+        elif path.startswith("/results/"):
+            body = state.result_png()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"code": "NotFound", "message": path})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._read_body()
+        state = self.state
+        if path == "/oss":
+            with state.lock:
+                state.counts["uploads"] += 1
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif path.rstrip("/") == "/api/v1/services/aigc/background-generation/generation":
+            if self._throttled():
+                return
+            payload = json.loads(body or b"{}")
+            with state.lock:
+                now = time.monotonic()
+                if state.max_running_tasks and state.running_tasks(now) >= state.max_running_tasks:
+                    state.counts["throttled"] += 1
+                    over_limit = True
+                else:
+                    over_limit = False
+                    task_id = f"stub-{next(state.ids)}"
+                    state.tasks[task_id] = {
+                        "n": int(payload.get("parameters", {}).get("n", 1)),
+                        "started_at": now + 0.5,
+                        "done_at": now + state.task_duration.sample(state.rng),
+                        "fail": state.rng.random() < state.task_failure_rate,
+                    }
+                    state.counts["submitted"] += 1
+                delay = state.submit_latency.sample(state.rng)
+            if over_limit:
+                self._send_json(429, {"code": "Throttling.AllocationQuota", "message": "Too many running tasks"})
+                return
+            time.sleep(delay)
+            self._send_json(200, {"request_id": "stub", "output": {"task_id": task_id, "task_status": "PENDING"}})
+        elif path.startswith("/api/v1/tasks/") and path.endswith("/cancel"):
+            task_id = path.split("/")[-2]
+            with state.lock:
+                task = state.tasks.get(task_id)
+                # Like DashScope, only tasks that have not started running can be cancelled
+                cancellable = task is not None and time.monotonic() < task["started_at"]
+                if cancellable:
+                    task["canceled"] = True
+                    state.counts["canceled"] += 1
+            if cancellable:
+                self._send_json(200, {"request_id": "stub"})
+            else:
+                self._send_json(400, {"code": "UnsupportedOperation", "message": "task is not PENDING"})
+        elif path in ("/chat/completions", "/v1/chat/completions"):
+            if self._throttled():
+                return
+            payload = json.loads(body or b"{}")
+            with state.lock:
+                state.counts["chat"] += 1
+                delay = state.chat_latency.sample(state.rng)
+            content = chat_content(payload)
+            if payload.get("stream"):
+                self._stream_chat(content, delay)
+                return
+            time.sleep(delay)
+            self._send_json(200, {
+                "id": "stub-chat",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "deepseek-chat",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 300, "completion_tokens": 120, "total_tokens": 420},
+            })
+        else:
+            self._send_json(404, {"code": "NotFound", "message": path})
+
+
+def start_server(state: StubState, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub server on a background thread; port 0 picks a free port."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--submit-latency", default="fixed:0.05")
+    parser.add_argument("--task-duration", default="lognormal:8,0.4")
+    parser.add_argument("--chat-latency", default="lognormal:4,0.4")
+    parser.add_argument("--task-failure-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-running-tasks", type=int, default=0, help="0 = unlimited")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    state = StubState(
+        submit_latency=args.submit_latency,
+        task_duration=args.task_duration,
+        chat_latency=args.chat_latency,
+        task_failure_rate=args.task_failure_rate,
+        quota_error_rate=args.quota_error_rate,
+        max_running_tasks=args.max_running_tasks,
+        seed=args.seed,
+    )
+    server = start_server(state, args.host, args.port)
+    print(f"stub server listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
+import contextvars
+import hashlib
 import os
+import queue
 import tempfile
+import threading
 import time
+from collections import OrderedDict
 from io import BytesIO
 
 import requests
-from dashscope.utils.oss_utils import check_and_upload_local
-from dotenv import load_dotenv
 from PIL import Image, ImageFilter
 
-load_dotenv()
+from core import metrics, providers
+from core.rate_limiter import get_governor
+from core.result_cache import BlobCache
+from data.db import Database
 
-BG_GEN_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/background-generation/generation/"
-TASK_URL = "https://dashscope.aliyuncs.com/api/v1/tasks/{task_id}"
+# Override with DASHSCOPE_HTTP_BASE_URL in the environment or .env (also applied to
+# the dashscope SDK for OSS uploads), e.g. to point at benchmarks/stub_server.py
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/api/v1"
+
+BG_GEN_PATH = "/services/aigc/background-generation/generation/"
+TASK_PATH = "/tasks/{task_id}"
+TASK_CANCEL_PATH = TASK_PATH + "/cancel"
 
 # Scene presets grouped by product category
 SCENE_PRESETS = {
@@ -161,6 +172,54 @@ STYLE_HINTS = {
 
 POLL_INTERVAL = 3
 MAX_POLL_TIME = 120
+# Task statuses that will never produce results: stop polling and don't resume.
+# UNKNOWN means DashScope no longer knows the task (expired or never existed).
+DEAD_TASK_STATUSES = ("FAILED", "CANCELED", "UNKNOWN")
+# Extra single-image tasks launched in fan-out mode with hedge=True; the
+# stragglers are cancelled once n results are in. Fan-out (and the hedge) only
+# runs when the dashscope governor has a slot for every task, see _fanout_plan.
+FANOUT_HEDGE_TASKS = 1
+
+# Product occupies 60% of the canvas (fit) so the model has room to build a scene
+PRODUCT_CANVAS_RATIO = 0.60
+# Longest side of a multi-aspect master canvas
+MASTER_MAX_SIDE = 2048
+
+# Upload preparation: the model works at ~1024px, so larger reference images only
+# cost upload bytes. The product canvas keeps alpha (PNG); fast zlib level is enough
+# because the transparent area compresses to almost nothing at any level.
+REF_IMAGE_MAX_SIDE = 1024
+REF_JPEG_QUALITY = 90
+# Reference images are sent as JPEG; transparent areas are flattened onto white
+REF_IMAGE_BACKGROUND = (255, 255, 255)
+PNG_COMPRESS_LEVEL = 1
+
+# DashScope temporary OSS uploads stay readable for 48h; refresh an hour early
+OSS_URL_TTL = 47 * 3600
+
+# Raw API outputs (before product re-paste) keyed on every generation input, so
+# regenerating from history or re-running a batch reuses paid results.
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cache", "ai_backgrounds")
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_result_cache = BlobCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+
+# Re-paste matte: contract the product alpha by MATTE_CONTRACT_PX so the API's edge
+# lighting peeks through, then feather by FEATHER_RADIUS for a smooth transition.
+# Mattes are cached per placed product so variants of the same product/size reuse them.
+FEATHER_RADIUS = 3
+MATTE_CONTRACT_PX = 1
+FEATHER_CACHE_SIZE = 32
+
+# (product digest, feather radius, contract px) -> (product RGB, feathered mask)
+_feather_cache: OrderedDict[tuple, tuple[Image.Image, Image.Image]] = OrderedDict()
+_feather_cache_lock = threading.Lock()
+
+# Journal of submitted DashScope tasks (data/db.py), opened lazily
+_journal_db: Database | None = None
+
+# content hash -> (oss_url, expires_at (monotonic), uploaded bytes)
+_upload_cache: dict[str, tuple[str, float, int]] = {}
+_upload_cache_lock = threading.Lock()
 
 
 def get_scene_presets() -> dict:
@@ -169,17 +228,41 @@ def get_scene_presets() -> dict:
 
 
 def _save_rgba_to_temp(image: Image.Image) -> str:
-    """Save RGBA image to a temporary PNG file, return the file path."""
+    """Save RGBA image to a temporary PNG file (fast compression), return the file path."""
     fd, path = tempfile.mkstemp(suffix=".png")
-    os.close(fd)
-    image.save(path, format="PNG")
+    with os.fdopen(fd, "wb") as f:
+        image.save(f, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return path
+
+
+def _save_rgb_to_temp(image: Image.Image) -> str:
+    """Save an opaque RGB image to a temporary JPEG file, return the file path."""
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        image.save(f, format="JPEG", quality=REF_JPEG_QUALITY)
     return path
 
 
+def _prepare_ref_image(ref_image: Image.Image) -> Image.Image:
+    """Flatten a reference image onto REF_IMAGE_BACKGROUND and downscale it to REF_IMAGE_MAX_SIDE."""
+    if ref_image.mode in ("RGBA", "LA", "PA") or "transparency" in ref_image.info:
+        # A bare convert("RGB") would turn transparent areas (e.g. around a cut-out) black
+        rgba = ref_image.convert("RGBA")
+        img = Image.new("RGB", rgba.size, REF_IMAGE_BACKGROUND)
+        img.paste(rgba, (0, 0), rgba)
+    else:
+        img = ref_image.convert("RGB")
+    if max(img.size) > REF_IMAGE_MAX_SIDE:
+        img.thumbnail((REF_IMAGE_MAX_SIDE, REF_IMAGE_MAX_SIDE), Image.LANCZOS)
+    return img
+
+
 def _upload_to_oss(local_path: str, api_key: str) -> str:
     """Upload a local file to DashScope OSS, return the HTTP URL."""
+    # Importing the dashscope SDK is slow, so it is only loaded for the first upload
+    oss_utils = providers.get("dashscope").utils.oss_utils
     file_url_local = f"file://{local_path}"
-    is_upload, oss_url, _ = check_and_upload_local(
+    is_upload, oss_url, _ = oss_utils.check_and_upload_local(
         model="wanx-background-generation-v2",
         content=file_url_local,
         api_key=api_key,
@@ -189,6 +272,88 @@ def _upload_to_oss(local_path: str, api_key: str) -> str:
     return oss_url
 
 
+def _pixels_digest(image: Image.Image) -> str:
+    """Hash image mode, size and pixels."""
+    h = hashlib.sha256()
+    h.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def _image_digest(image: Image.Image, api_key: str) -> str:
+    """Hash image pixels (plus the uploading account) into an upload cache key."""
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(api_key.encode()).digest())
+    h.update(_pixels_digest(image).encode())
+    return h.hexdigest()
+
+
+def _upload_image(image: Image.Image, api_key: str) -> tuple[str, int]:
+    """Upload an image to OSS, reusing the URL of identical content within OSS_URL_TTL.
+
+    RGB images are sent as JPEG, anything else as PNG. The OSS uploader only
+    accepts a file path, so the encoded bytes go through one temp file.
+
+    Returns:
+        (oss_url, bytes actually uploaded — 0 on a cache hit)
+    """
+    key = _image_digest(image, api_key)
+    now = time.monotonic()
+    with _upload_cache_lock:
+        cached = _upload_cache.get(key)
+    if cached and cached[1] > now:
+        metrics.incr("oss_upload.hits")
+        metrics.incr("oss_upload.bytes_saved", cached[2])
+        return cached[0], 0
+
+    start = time.perf_counter()
+    temp_path = _save_rgb_to_temp(image) if image.mode == "RGB" else _save_rgba_to_temp(image)
+    try:
+        size = os.path.getsize(temp_path)
+        oss_url = _upload_to_oss(temp_path, api_key)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+    metrics.incr("oss_upload.misses")
+    metrics.incr("oss_upload.bytes", size)
+    metrics.observe("oss_upload.seconds", time.perf_counter() - start)
+    with _upload_cache_lock:
+        for k in [k for k, v in _upload_cache.items() if v[1] <= now]:
+            del _upload_cache[k]
+        _upload_cache[key] = (oss_url, now + OSS_URL_TTL, size)
+    return oss_url, size
+
+
+def _result_cache_key(canvas: Image.Image, prompt: str, style: str,
+                      ref_image: Image.Image | None, n: int) -> str:
+    """Key raw API outputs on the product canvas (product + size), prompt, style, ref image and n."""
+    h = hashlib.sha256()
+    h.update(_pixels_digest(canvas).encode())
+    h.update(prompt.encode())
+    h.update(style.encode())
+    h.update(_pixels_digest(ref_image).encode() if ref_image is not None else b"-")
+    h.update(str(n).encode())
+    return h.hexdigest()
+
+
+def clear_result_cache() -> None:
+    """Delete all cached AI background results from disk."""
+    _result_cache.clear()
+
+
+def clear_upload_cache() -> None:
+    """Forget all cached OSS upload URLs."""
+    with _upload_cache_lock:
+        _upload_cache.clear()
+
+
+def clear_feather_cache() -> None:
+    """Forget all cached product re-paste mattes."""
+    with _feather_cache_lock:
+        _feather_cache.clear()
+
+
 def _submit_task(
     base_image_url: str,
     ref_prompt: str,
@@ -216,7 +381,7 @@ def _submit_task(
             "n": n,
         },
     }
-    resp = requests.post(BG_GEN_URL, json=payload, headers=headers, timeout=30)
+    resp = requests.post(_dashscope_url(BG_GEN_PATH), json=payload, headers=headers, timeout=30)
     if resp.status_code != 200:
         detail = resp.text
         raise RuntimeError(f"AI背景生成提交失败: {detail}")
@@ -227,10 +392,54 @@ def _submit_task(
     return task_id
 
 
-def _poll_result(task_id: str, api_key: str) -> dict:
-    """Poll task status until SUCCEEDED/FAILED or timeout."""
+def _dashscope_url(path: str, **params) -> str:
+    """Build a DashScope API URL, honouring DASHSCOPE_HTTP_BASE_URL (read after loading .env)."""
+    providers.load_env()
+    base_url = os.getenv("DASHSCOPE_HTTP_BASE_URL", DASHSCOPE_BASE_URL).rstrip("/")
+    return base_url + path.format(**params)
+
+
+def _get_journal() -> Database:
+    """Return the process-wide AI task journal, opening it on first use."""
+    global _journal_db
+    if _journal_db is None:
+        _journal_db = Database()
+    return _journal_db
+
+
+def _result_urls(result_data: dict) -> list[str]:
+    """Extract result image URLs from a SUCCEEDED task response."""
+    results = result_data.get("output", {}).get("results", [])
+    return [r["url"] for r in results if r.get("url")]
+
+
+def _cancel_task(task_id: str, api_key: str) -> None:
+    """Best-effort cancel of a task nobody is waiting for any more.
+
+    DashScope only cancels tasks that are still PENDING; a task that is already
+    running keeps its journal status, so a later identical request can resume it.
+    """
+    headers = {"Authorization": f"Bearer {api_key}"}
+    try:
+        resp = requests.post(_dashscope_url(TASK_CANCEL_PATH, task_id=task_id), headers=headers, timeout=10)
+    except requests.RequestException:
+        return
+    if resp.status_code == 200:
+        _get_journal().update_ai_task(task_id, "CANCELED")
+        metrics.incr("ai_bg.tasks_cancelled")
+
+
+def _poll_result(task_id: str, api_key: str, stop: threading.Event | None = None) -> dict:
+    """Poll task status until it succeeds, dies (DEAD_TASK_STATUSES) or times out, mirroring status into the journal.
+
+    On timeout the journal entry stays PENDING/RUNNING so a later request with
+    the same inputs can resume polling instead of paying for a new task. If
+    `stop` is set while waiting, the task is cancelled and polling gives up.
+    """
     headers = {"Authorization": f"Bearer {api_key}"}
-    url = TASK_URL.format(task_id=task_id)
+    url = _dashscope_url(TASK_PATH, task_id=task_id)
+    journal = _get_journal()
+    last_status = None
     start = time.time()
     while time.time() - start < MAX_POLL_TIME:
         resp = requests.get(url, headers=headers, timeout=30)
@@ -238,14 +447,339 @@ def _poll_result(task_id: str, api_key: str) -> dict:
         data = resp.json()
         status = data.get("output", {}).get("task_status")
         if status == "SUCCEEDED":
+            journal.update_ai_task(task_id, "SUCCEEDED", _result_urls(data))
             return data
-        if status == "FAILED":
-            err_msg = data.get("output", {}).get("message", "unknown error")
+        if status in DEAD_TASK_STATUSES:
+            journal.update_ai_task(task_id, status)
+            err_msg = data.get("output", {}).get("message") or ("unknown error" if status == "FAILED" else status)
             raise RuntimeError(f"AI背景生成失败: {err_msg}")
-        time.sleep(POLL_INTERVAL)
+        if status != last_status and status in ("PENDING", "RUNNING"):
+            journal.update_ai_task(task_id, status)
+            last_status = status
+        if stop is None:
+            time.sleep(POLL_INTERVAL)
+        elif stop.wait(POLL_INTERVAL):
+            _cancel_task(task_id, api_key)
+            raise RuntimeError("AI背景生成已取消")
     raise RuntimeError("AI背景生成超时")
 
 
+def _download_results(urls: list[str]) -> list[bytes]:
+    """Download raw result images."""
+    raw_images = [requests.get(url, timeout=30).content for url in urls]
+    if not raw_images:
+        raise RuntimeError("AI背景生成失败: 无法下载结果图片")
+    return raw_images
+
+
+def _resume_task(task: dict, api_key: str, stop: threading.Event | None = None) -> list[bytes] | None:
+    """Finish a journaled task: download finished results or keep polling.
+
+    Returns None when the task can no longer produce results (failed, cancelled,
+    unknown to DashScope, or its result URLs have expired), so the caller should
+    submit a new one.
+    """
+    task_id = task["task_id"]
+    if task["status"] == "SUCCEEDED":
+        try:
+            return _download_results(task["result_urls"])
+        except (RuntimeError, requests.RequestException):
+            _get_journal().update_ai_task(task_id, "EXPIRED")
+            return None
+    try:
+        result_data = _poll_result(task_id, api_key, stop)
+    except requests.HTTPError:
+        _get_journal().update_ai_task(task_id, "EXPIRED")
+        return None
+    except RuntimeError:
+        if _get_journal().get_ai_task(task_id)["status"] in DEAD_TASK_STATUSES:
+            return None
+        raise
+    return _download_results(_result_urls(result_data))
+
+
+def _upload_inputs(canvas: Image.Image, ref_image: Image.Image | None, api_key: str) -> tuple[str, str]:
+    """Upload the product canvas and optional reference image, recording one ai_bg.upload_* sample.
+
+    Returns:
+        (base_image_url, ref_image_url — "" without a reference image)
+    """
+    upload_start = time.perf_counter()
+    base_image_url, upload_bytes = _upload_image(canvas, api_key)
+    ref_image_url = ""
+    if ref_image is not None:
+        ref_image_url, ref_bytes = _upload_image(ref_image, api_key)
+        upload_bytes += ref_bytes
+    metrics.observe("ai_bg.upload_seconds", time.perf_counter() - upload_start)
+    metrics.observe("ai_bg.upload_bytes", upload_bytes)
+    return base_image_url, ref_image_url
+
+
+def _fetch_raw_results(
+    canvas: Image.Image,
+    prompt: str,
+    ref_image: Image.Image | None,
+    n: int,
+    api_key: str,
+    inputs_hash: str,
+    stop: threading.Event | None = None,
+    image_urls: tuple[str, str] | None = None,
+) -> list[bytes]:
+    """Upload inputs, run one DashScope task and download the raw result images.
+
+    Every submitted task is journaled under inputs_hash. An unclaimed task for
+    the same inputs (e.g. lost to a rerun or restart while polling) is resumed
+    instead of submitting a new one; tasks are marked CLAIMED once downloaded.
+    Setting `stop` abandons the call (see _poll_result). image_urls, from
+    _upload_inputs, skips the upload when the caller has already done it.
+    """
+    journal = _get_journal()
+    pending = journal.find_resumable_ai_task(inputs_hash)
+    if pending is not None:
+        raw_images = _resume_task(pending, api_key, stop)
+        if raw_images is not None:
+            metrics.incr("ai_task_journal.resumed")
+            journal.update_ai_task(pending["task_id"], "CLAIMED")
+            return raw_images
+
+    if image_urls is None:
+        image_urls = _upload_inputs(canvas, ref_image, api_key)
+    base_image_url, ref_image_url = image_urls
+
+    # A task holds a provider concurrency slot from submission until it finishes
+    with get_governor("dashscope").slot():
+        if stop is not None and stop.is_set():
+            raise RuntimeError("AI背景生成已取消")
+        task_id = _submit_task(base_image_url, prompt, n, api_key, ref_image_url=ref_image_url)
+        journal.save_ai_task(task_id, inputs_hash)
+        result_data = _poll_result(task_id, api_key, stop)
+
+    if not result_data.get("output", {}).get("results", []):
+        journal.update_ai_task(task_id, "FAILED")
+        raise RuntimeError("AI背景生成失败: 未返回结果图片")
+
+    raw_images = _download_results(_result_urls(result_data))
+    journal.update_ai_task(task_id, "CLAIMED")
+    return raw_images
+
+
+def _iter_fanned_out(
+    canvas: Image.Image,
+    prompt: str,
+    ref_image: Image.Image | None,
+    n: int,
+    api_key: str,
+    inputs_hash: str,
+    hedge: bool,
+):
+    """Yield raw result images from parallel single-image tasks as each one finishes.
+
+    Runs n tasks (plus FANOUT_HEDGE_TASKS when hedge is set) on worker threads,
+    each journaled under its own `<inputs_hash>:<i>` key. Results are yielded on
+    the calling thread; once n have arrived the remaining tasks are cancelled.
+    Fewer than n results are yielded if some tasks fail.
+
+    Raises:
+        RuntimeError: if every task fails
+    """
+    # Upload once up front and hand the URLs to every worker
+    image_urls = _upload_inputs(canvas, ref_image, api_key)
+
+    total = n + (FANOUT_HEDGE_TASKS if hedge else 0)
+    stop = threading.Event()
+    finished: queue.Queue = queue.Queue()
+
+    def run(i: int):
+        try:
+            finished.put(_fetch_raw_results(
+                canvas, prompt, ref_image, 1, api_key, f"{inputs_hash}:{i}", stop, image_urls,
+            ))
+        except Exception as e:
+            finished.put(e)
+
+    for i in range(total):
+        # Each worker inherits the caller's context (e.g. rate-limiter priority)
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(run, i), daemon=True).start()
+
+    delivered = 0
+    errors = []
+    try:
+        while delivered < n and delivered + len(errors) < total:
+            result = finished.get()
+            if isinstance(result, Exception):
+                errors.append(result)
+                continue
+            for img_data in result[: n - delivered]:
+                delivered += 1
+                yield img_data
+    finally:
+        stop.set()
+
+    if delivered < n:
+        metrics.incr("ai_bg.fanout_failed", n - delivered)
+        if delivered == 0:
+            raise errors[0]
+
+
+def _fanout_plan(n: int, hedge: bool) -> tuple[bool, bool]:
+    """Return (fan_out, hedge) for n results under the configured dashscope concurrency.
+
+    Tasks beyond max_concurrency wait in the governor queue, so they finish later
+    than a single n-image task would and are still billed; fan out only when all
+    n run at once, and add the hedge task only if it gets a slot of its own.
+    """
+    slots = get_governor("dashscope").max_concurrency
+    if slots < n:
+        return False, False
+    return True, hedge and slots >= n + FANOUT_HEDGE_TASKS
+
+
+def _compose_prompt(style: str, scene_prompt: str, custom_prompt: str, has_ref_image: bool) -> str:
+    """Compose prompt: purely descriptive, no instructions to the model.
+
+    Product integrity is guaranteed by the re-paste after generation, not by prompt.
+    """
+    has_user_input = bool(custom_prompt) or bool(scene_prompt)
+    parts = []
+    if custom_prompt:
+        parts.append(custom_prompt)
+    if scene_prompt:
+        parts.append(scene_prompt)
+    if has_user_input:
+        hint = STYLE_HINTS.get(style, STYLE_HINTS["minimal"])
+        parts.append(hint)
+    else:
+        # With ref_image but no text, still use short hint (ref_image is the main guide)
+        if has_ref_image:
+            hint = STYLE_HINTS.get(style, STYLE_HINTS["minimal"])
+            parts.append(hint)
+        else:
+            style_default = STYLE_PROMPTS.get(style, STYLE_PROMPTS["minimal"])
+            parts.append(style_default)
+    return "，".join(parts)
+
+
+def _generate_composed(
+    resized_product: Image.Image,
+    x: int,
+    y: int,
+    width: int,
+    height: int,
+    style: str,
+    scene_prompt: str,
+    custom_prompt: str,
+    ref_image: Image.Image | None,
+    n: int,
+    fresh: bool,
+    api_key: str,
+    feather_radius: float = FEATHER_RADIUS,
+    matte_contract: int = MATTE_CONTRACT_PX,
+    fan_out: bool = False,
+    hedge: bool = False,
+    on_candidate=None,
+) -> list[Image.Image]:
+    """Generate scenes around an already-placed product and re-paste the original product.
+
+    Each finished candidate is passed to on_candidate (on the calling thread) as
+    soon as it is blended, before the full list is returned.
+    """
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    canvas.paste(resized_product, (x, y), resized_product if resized_product.mode == "RGBA" else None)
+
+    prompt = _compose_prompt(style, scene_prompt, custom_prompt, ref_image is not None)
+
+    # Reuse raw API outputs for identical inputs unless new variations are requested
+    prepared_ref = _prepare_ref_image(ref_image) if ref_image is not None else None
+    cache_key = _result_cache_key(canvas, prompt, style, prepared_ref, n)
+    raw_images = None if fresh else _result_cache.get(cache_key)
+    if fresh:
+        metrics.incr("ai_bg_cache.bypass")
+    elif raw_images is not None:
+        metrics.incr("ai_bg_cache.hits")
+    else:
+        metrics.incr("ai_bg_cache.misses")
+
+    # Blend original product back into each raw result.
+    # API may alter product pixels, so we re-composite with feathered
+    # edges: core pixels are 100% original, outer 3-4px smoothly
+    # transition into the API's lighting/shadows for natural integration.
+    product_rgb, mask = _feathered_product(resized_product, feather_radius, matte_contract)
+
+    if raw_images is None and fan_out and n > 1:
+        fan_out, hedge = _fanout_plan(n, hedge)
+        if not fan_out:
+            metrics.incr("ai_bg.fanout_skipped")
+
+    if raw_images is not None:
+        stream = raw_images
+    elif fan_out and n > 1:
+        stream = _iter_fanned_out(canvas, prompt, prepared_ref, n, api_key, cache_key, hedge)
+    else:
+        stream = _fetch_raw_results(canvas, prompt, prepared_ref, n, api_key, cache_key)
+
+    images = []
+    fetched = []
+    for img_data in stream:
+        fetched.append(img_data)
+        img = Image.open(BytesIO(img_data)).convert("RGB")
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.LANCZOS)
+        # Masked paste is the same blend as alpha-compositing the feathered product
+        # (out = product * mask + scene * (1 - mask)) without an RGBA round trip
+        img.paste(product_rgb, (x, y), mask)
+        images.append(img)
+        if on_candidate is not None:
+            on_candidate(img)
+
+    # A fan-out with failed tasks returns fewer than n; don't serve that as complete
+    if raw_images is None and len(fetched) == n:
+        _result_cache.put(cache_key, fetched)
+
+    return images
+
+
+def _feathered_product(
+    resized_product: Image.Image,
+    feather_radius: float = FEATHER_RADIUS,
+    matte_contract: int = MATTE_CONTRACT_PX,
+) -> tuple[Image.Image, Image.Image | None]:
+    """Return (product RGB, feathered re-paste mask), cached per product pixels and matte settings."""
+    if resized_product.mode != "RGBA":
+        return resized_product.convert("RGB"), None
+
+    key = (_pixels_digest(resized_product), feather_radius, matte_contract)
+    with _feather_cache_lock:
+        cached = _feather_cache.get(key)
+        if cached is not None:
+            _feather_cache.move_to_end(key)
+    if cached is not None:
+        metrics.incr("feather_cache.hits")
+        return cached
+    metrics.incr("feather_cache.misses")
+
+    mask = resized_product.getchannel("A")
+    if matte_contract > 0:
+        mask = mask.filter(ImageFilter.MinFilter(2 * matte_contract + 1))
+    if feather_radius > 0:
+        mask = mask.filter(ImageFilter.GaussianBlur(feather_radius))
+    entry = (resized_product.convert("RGB"), mask)
+    with _feather_cache_lock:
+        _feather_cache[key] = entry
+        while len(_feather_cache) > FEATHER_CACHE_SIZE:
+            _feather_cache.popitem(last=False)
+    return entry
+
+
+def _require_api_key() -> str:
+    """Return the DashScope API key or raise if it is not configured."""
+    providers.load_env()
+    api_key = os.getenv("DASHSCOPE_API_KEY")
+    if not api_key:
+        raise RuntimeError("DASHSCOPE_API_KEY 未设置")
+    return api_key
+
+
 def generate_ai_background(
     product_image: Image.Image,
     product_name: str,
@@ -256,12 +790,18 @@ def generate_ai_background(
     custom_prompt: str = "",
     ref_image: Image.Image | None = None,
     n: int = 1,
+    fresh: bool = False,
+    feather_radius: float = FEATHER_RADIUS,
+    matte_contract: int = MATTE_CONTRACT_PX,
+    fan_out: bool = False,
+    hedge: bool = False,
+    on_candidate=None,
 ) -> list[Image.Image]:
     """Generate AI background with product composited via DashScope v2.
 
     Uses raw HTTP to the /background-generation/ endpoint (not ImageSynthesis SDK,
     which hardcodes /image-synthesis/ endpoint).
-    File upload to OSS is done via dashscope.utils.oss_utils.
+    File upload to OSS is done via dashscope.utils.oss_utils (SDK imported on first upload).
 
     Args:
         product_image: RGBA product image (transparent background)
@@ -273,6 +813,16 @@ def generate_ai_background(
         custom_prompt: optional user-supplied extra description
         ref_image: optional reference image for style/scene guidance
         n: number of images to generate
+        fresh: bypass the result cache and ask the API for new variations
+            (the new results still replace the cached entry)
+        feather_radius: Gaussian feather (px) of the product re-paste edge
+        matte_contract: px the product matte is shrunk before feathering
+        fan_out: split n into parallel single-image tasks so candidates arrive
+            as soon as each is done instead of all at once; ignored unless
+            DASHSCOPE_MAX_CONCURRENCY allows n tasks at a time
+        hedge: with fan_out, launch one extra task and cancel the straggler
+            (only if the concurrency limit has a slot left for it)
+        on_candidate: called with each finished image as it arrives
 
     Returns:
         List of PIL RGB Images with product naturally composited into scene
@@ -280,98 +830,174 @@ def generate_ai_background(
     Raises:
         RuntimeError: if the API call fails or times out
     """
-    api_key = os.getenv("DASHSCOPE_API_KEY")
-    if not api_key:
-        raise RuntimeError("DASHSCOPE_API_KEY 未设置")
+    api_key = _require_api_key()
 
-    # 1. Place product_image centered on a (width, height) transparent canvas at 60%
-    scale = min(width / product_image.width, height / product_image.height) * 0.60
+    # Place product_image centered on a (width, height) transparent canvas at 60%
+    scale = min(width / product_image.width, height / product_image.height) * PRODUCT_CANVAS_RATIO
     new_w = int(product_image.width * scale)
     new_h = int(product_image.height * scale)
     resized_product = product_image.resize((new_w, new_h), Image.LANCZOS)
-
-    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     x = (width - new_w) // 2
     y = (height - new_h) // 2
+
+    return _generate_composed(
+        resized_product, x, y, width, height, style,
+        scene_prompt, custom_prompt, ref_image, n, fresh, api_key,
+        feather_radius, matte_contract, fan_out, hedge, on_candidate,
+    )
+
+
+def plan_master_canvas(
+    product_size: tuple[int, int],
+    sizes: dict[str, tuple[int, int]],
+) -> tuple[tuple[int, int], float, dict[str, tuple[int, int]]]:
+    """Plan one master canvas that covers every target aspect ratio.
+
+    Each target frame is the target size scaled so the product occupies the same
+    60% share it would get from a per-platform generation. All frames are centered
+    on the product, so the master is their union. The product scale is chosen so no
+    frame is smaller than its target (crops are only ever downscaled), then capped
+    to MASTER_MAX_SIDE.
+
+    Returns:
+        ((master_w, master_h), product scale, {key: (frame_w, frame_h)})
+    """
+    pw, ph = product_size
+    per_target = {
+        key: min(w / pw, h / ph) * PRODUCT_CANVAS_RATIO for key, (w, h) in sizes.items()
+    }
+    scale = max(per_target.values())
+    frames = {
+        key: (w * scale / per_target[key], h * scale / per_target[key])
+        for key, (w, h) in sizes.items()
+    }
+    master_w = max(f[0] for f in frames.values())
+    master_h = max(f[1] for f in frames.values())
+    shrink = min(1.0, MASTER_MAX_SIDE / max(master_w, master_h))
+    scale *= shrink
+    frames = {key: (round(fw * shrink), round(fh * shrink)) for key, (fw, fh) in frames.items()}
+    master = (round(master_w * shrink), round(master_h * shrink))
+    return master, scale, frames
+
+
+def reframe(
+    image: Image.Image,
+    frame_size: tuple[int, int],
+    target_size: tuple[int, int],
+    product_bbox: tuple[int, int, int, int],
+) -> Image.Image:
+    """Crop a frame centered on the product's visible bounding box, then resize to target."""
+    fw, fh = frame_size
+    cx = (product_bbox[0] + product_bbox[2]) / 2
+    cy = (product_bbox[1] + product_bbox[3]) / 2
+    left = int(min(max(cx - fw / 2, 0), image.width - fw))
+    top = int(min(max(cy - fh / 2, 0), image.height - fh))
+    cropped = image.crop((left, top, left + fw, top + fh))
+    if cropped.size != target_size:
+        cropped = cropped.resize(target_size, Image.LANCZOS)
+    return cropped
+
+
+def _master_layout(product_image: Image.Image, sizes: dict[str, tuple[int, int]]):
+    """Return ((W, H), frames, resized product, x, y) for the shared master canvas."""
+    (master_w, master_h), scale, frames = plan_master_canvas(product_image.size, sizes)
+    new_w = int(product_image.width * scale)
+    new_h = int(product_image.height * scale)
+    resized_product = product_image.resize((new_w, new_h), Image.LANCZOS)
+    x = (master_w - new_w) // 2
+    y = (master_h - new_h) // 2
+    return (master_w, master_h), frames, resized_product, x, y
+
+
+def warm_ai_background_multi(
+    product_image: Image.Image,
+    sizes: dict[str, tuple[int, int]],
+    ref_image: Image.Image | None = None,
+) -> int:
+    """Upload the master canvas (and reference image) that generate_ai_background_multi will use.
+
+    Used for speculative prefetch: a later generate call with the same product,
+    sizes and reference image finds the URLs in the upload cache and goes
+    straight to task submission. No DashScope task is started.
+
+    Returns:
+        Bytes actually uploaded (0 if everything was already cached)
+
+    Raises:
+        RuntimeError: if the API key is missing or the upload fails
+    """
+    api_key = _require_api_key()
+
+    (master_w, master_h), _, resized_product, x, y = _master_layout(product_image, sizes)
+    canvas = Image.new("RGBA", (master_w, master_h), (0, 0, 0, 0))
     canvas.paste(resized_product, (x, y), resized_product if resized_product.mode == "RGBA" else None)
+    # Warm the feathered matte too; it is keyed on the same placed product
+    _feathered_product(resized_product)
 
-    # 2. Save to temp file and upload to OSS
-    temp_path = _save_rgba_to_temp(canvas)
-    ref_temp_path = None
-    try:
-        base_image_url = _upload_to_oss(temp_path, api_key)
-
-        # 2b. Upload reference image to OSS if provided
-        ref_image_url = ""
-        if ref_image is not None:
-            ref_temp_path = _save_rgba_to_temp(ref_image.convert("RGBA"))
-            ref_image_url = _upload_to_oss(ref_temp_path, api_key)
-
-        # 3. Compose prompt: purely descriptive, no instructions to the model.
-        #    Product integrity is guaranteed by re-paste in step 5, not by prompt.
-        has_user_input = bool(custom_prompt) or bool(scene_prompt)
-        parts = []
-        if custom_prompt:
-            parts.append(custom_prompt)
-        if scene_prompt:
-            parts.append(scene_prompt)
-        if has_user_input:
-            hint = STYLE_HINTS.get(style, STYLE_HINTS["minimal"])
-            parts.append(hint)
-        else:
-            # With ref_image but no text, still use short hint (ref_image is the main guide)
-            if ref_image is not None:
-                hint = STYLE_HINTS.get(style, STYLE_HINTS["minimal"])
-                parts.append(hint)
-            else:
-                style_default = STYLE_PROMPTS.get(style, STYLE_PROMPTS["minimal"])
-                parts.append(style_default)
-        prompt = "，".join(parts)
-
-        # 4. Submit async task and poll
-        task_id = _submit_task(base_image_url, prompt, n, api_key, ref_image_url=ref_image_url)
-        result_data = _poll_result(task_id, api_key)
-
-        # 5. Download result images and blend original product back in.
-        #    API may alter product pixels, so we re-composite with feathered
-        #    edges: core pixels are 100% original, outer 3-4px smoothly
-        #    transition into the API's lighting/shadows for natural integration.
-        results = result_data.get("output", {}).get("results", [])
-        if not results:
-            raise RuntimeError("AI背景生成失败: 未返回结果图片")
-
-        # Prepare feathered product once for all candidates
-        if resized_product.mode == "RGBA":
-            alpha = resized_product.split()[3]
-            # Contract alpha by 1px to let API's edge effects peek through
-            contracted = alpha.filter(ImageFilter.MinFilter(3))
-            # Feather for smooth transition
-            feathered = contracted.filter(ImageFilter.GaussianBlur(3))
-            product_blended = resized_product.copy()
-            product_blended.putalpha(feathered)
-        else:
-            product_blended = resized_product
+    _, uploaded = _upload_image(canvas, api_key)
+    if ref_image is not None:
+        _, ref_bytes = _upload_image(_prepare_ref_image(ref_image), api_key)
+        uploaded += ref_bytes
+    return uploaded
 
-        images = []
-        for result in results:
-            image_url = result.get("url")
-            if not image_url:
-                continue
-            img_data = requests.get(image_url, timeout=30).content
-            img = Image.open(BytesIO(img_data)).convert("RGBA")
-            if img.size != (width, height):
-                img = img.resize((width, height), Image.LANCZOS)
-            # Alpha-composite: feathered product on top of API result
-            img.alpha_composite(product_blended, (x, y))
-            images.append(img.convert("RGB"))
-
-        if not images:
-            raise RuntimeError("AI背景生成失败: 无法下载结果图片")
-
-        return images
-    finally:
-        # 6. Clean up temp files
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        if ref_temp_path and os.path.exists(ref_temp_path):
-            os.unlink(ref_temp_path)
+
+def generate_ai_background_multi(
+    product_image: Image.Image,
+    product_name: str,
+    style: str,
+    sizes: dict[str, tuple[int, int]],
+    scene_prompt: str = "",
+    custom_prompt: str = "",
+    ref_image: Image.Image | None = None,
+    n: int = 1,
+    fresh: bool = False,
+    feather_radius: float = FEATHER_RADIUS,
+    matte_contract: int = MATTE_CONTRACT_PX,
+    fan_out: bool = False,
+    hedge: bool = False,
+    on_candidate=None,
+) -> list[dict[str, Image.Image]]:
+    """Generate AI scenes once on a master canvas and reframe them for every target size.
+
+    One DashScope task per call regardless of how many platforms are selected,
+    instead of stretching a single platform's result to other aspect ratios.
+
+    Args:
+        product_image: RGBA product image (transparent background)
+        product_name: product name (for logging/context)
+        style: one of promo/minimal/premium/fresh/social
+        sizes: mapping of target key (e.g. platform) to (width, height)
+        scene_prompt, custom_prompt, ref_image, n, fresh, feather_radius,
+            matte_contract, fan_out, hedge: as in generate_ai_background
+        on_candidate: called with each finished candidate dict as it arrives
+
+    Returns:
+        One dict per candidate, mapping each key in `sizes` to an RGB image of that size
+
+    Raises:
+        RuntimeError: if the API call fails or times out
+    """
+    api_key = _require_api_key()
+
+    (master_w, master_h), frames, resized_product, x, y = _master_layout(product_image, sizes)
+    new_w, new_h = resized_product.size
+
+    bbox = resized_product.getbbox() if resized_product.mode == "RGBA" else None
+    if bbox is None:
+        bbox = (0, 0, new_w, new_h)
+    product_bbox = (x + bbox[0], y + bbox[1], x + bbox[2], y + bbox[3])
+
+    candidates = []
+
+    def reframe_master(master: Image.Image):
+        candidate = {key: reframe(master, frames[key], size, product_bbox) for key, size in sizes.items()}
+        candidates.append(candidate)
+        if on_candidate is not None:
+            on_candidate(candidate)
+
+    _generate_composed(
+        resized_product, x, y, master_w, master_h, style,
+        scene_prompt, custom_prompt, ref_image, n, fresh, api_key,
+        feather_radius, matte_contract, fan_out, hedge, reframe_master,
+    )
+    return candidates
@@ -1,8 +1,9 @@
 from PIL import Image
-from rembg import remove
 from io import BytesIO
 from typing import Union
 
+from core import providers
+
 
 def remove_background(input_image: Union[str, BytesIO, Image.Image]) -> Image.Image:
     """Remove background from product image.
@@ -23,5 +24,7 @@ def remove_background(input_image: Union[str, BytesIO, Image.Image]) -> Image.Im
     if img.mode != "RGBA":
         img = img.convert("RGBA")
 
+    # rembg pulls in onnxruntime, so it is imported on first use
+    remove = providers.get("rembg")
     output = remove(img)
     return output
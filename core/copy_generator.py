@@ -1,49 +1,275 @@
 # core/copy_generator.py
+import contextvars
+import hashlib
 import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core import metrics, providers
 from core.platforms import get_platform_config
+from core.rate_limiter import get_governor
+from data.db import Database
 
-load_dotenv()
+# DeepSeek (OpenAI-compatible) client, built on first use; see core/providers.py
+client = providers.LazyClient("deepseek")
 
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY", ""),
-    base_url="https://api.deepseek.com",
-)
+COPY_MODEL = "deepseek-chat"
+# Cached responses for identical prompt inputs are reused for this long
+COPY_CACHE_TTL_HOURS = 7 * 24
 
+# Completion budget per request, sized from each platform's title limit so a
+# runaway response is cut off instead of billed; a cut-off response is repaired
+COPY_CANDIDATES = 2
+TITLE_TOKENS_PER_CHAR = 1.5
+SELLING_POINTS_TOKENS = 180
+CANDIDATE_OVERHEAD_TOKENS = 30
+PLATFORM_OVERHEAD_TOKENS = 20
+
+# Batch copy: parallel chat completions (the deepseek governor still caps the
+# actual request rate) and retries with exponential backoff per product
+COPY_BATCH_CONCURRENCY = 8
+COPY_BATCH_RETRIES = 2
+COPY_RETRY_BACKOFF = 1.0
+
+# Response cache database; opened on first use
+_cache_db = None
+
+# title_templates / point_templates / filler_points / default_point drive
+# generate_copy_local; templates use {name}, {point} (first selling point) and {price}
 COPY_STYLES = {
     "promo": {
         "label": "促销紧迫感",
         "prompt_hint": "使用紧迫感、限时优惠、数字对比等促销手法，语气强烈有感染力",
+        "title_templates": ["【限时特惠】{name} {point} 到手仅¥{price}", "{name} 爆款直降 {point} 手慢无"],
+        "point_templates": ["{point}，限时抢购", "{point}，错过再等一年"],
+        "filler_points": ["到手价¥{price}，限时优惠", "现货速发，库存有限", "正品保障，放心下单"],
+        "default_point": "超值好物",
     },
     "seeding": {
         "label": "种草安利风",
         "prompt_hint": "像朋友推荐一样自然，用口语化表达，强调使用体验和感受",
+        "title_templates": ["被问爆的{name}！{point}真的绝", "{name}｜{point}，用了就回不去"],
+        "point_templates": ["{point}，亲测好用", "真心推荐：{point}"],
+        "filler_points": ["才¥{price}，性价比超高", "日常用起来很顺手", "身边朋友都在回购"],
+        "default_point": "好用到回购",
     },
     "professional": {
         "label": "专业参数风",
         "prompt_hint": "突出产品参数、材质、工艺等专业信息，语气客观专业有说服力",
+        "title_templates": ["{name} {point} 品质之选", "{name}｜{point}｜¥{price}"],
+        "point_templates": ["{point}", "核心优势：{point}"],
+        "filler_points": ["参考价¥{price}", "严选材质，做工精细", "品质检测，稳定可靠"],
+        "default_point": "品质优选",
     },
 }
 
 
-def generate_copy(
+def _get_cache_db() -> Database:
+    """Return the process-wide copy response cache, opening it on first use."""
+    global _cache_db
+    if _cache_db is None:
+        _cache_db = Database()
+    return _cache_db
+
+
+def _copy_cache_key(prompt: str, model: str) -> str:
+    """Hash the exact prompt (built from normalized inputs) and model into a cache key."""
+    return hashlib.sha256(json.dumps([model, prompt], ensure_ascii=False).encode()).hexdigest()
+
+
+def _usage_tokens(usage) -> tuple[int, int]:
+    """Return (prompt_tokens, completion_tokens) from a response's usage, 0 when not reported."""
+    counts = (getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+    return tuple(c if isinstance(c, int) else 0 for c in counts)
+
+
+def _normalize_product(product_name: str, selling_points: list[str], price: float) -> tuple[str, list[str], str]:
+    """Normalize inputs so cosmetic differences share one cache entry."""
+    name = product_name.strip()
+    points = [sp.strip() for sp in selling_points if sp and sp.strip()]
+    return name, points, f"{float(price):.2f}"
+
+
+def _max_tokens(platforms: list[str]) -> int:
+    """Completion token budget for COPY_CANDIDATES candidates on each platform."""
+    total = PLATFORM_OVERHEAD_TOKENS
+    for key in platforms:
+        title_tokens = math.ceil(get_platform_config(key)["title_max_chars"] * TITLE_TOKENS_PER_CHAR)
+        per_candidate = title_tokens + SELLING_POINTS_TOKENS + CANDIDATE_OVERHEAD_TOKENS
+        total += COPY_CANDIDATES * per_candidate + PLATFORM_OVERHEAD_TOKENS
+    return total
+
+
+def _chat_request(prompt: str, platforms: list[str]) -> dict:
+    """Keyword arguments for a JSON-mode chat completion."""
+    return {
+        "model": COPY_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.8,
+        "response_format": {"type": "json_object"},
+        "max_tokens": _max_tokens(platforms),
+    }
+
+
+def _record_call(style: str, platforms: list[str], usage, seconds: float) -> None:
+    """Record latency and token usage of one completion, per style and platform set."""
+    tag = f"{style}.{'+'.join(platforms)}"
+    prompt_tokens, completion_tokens = _usage_tokens(usage)
+    metrics.observe(f"copy.latency_seconds.{tag}", seconds)
+    metrics.observe(f"copy.prompt_tokens.{tag}", prompt_tokens)
+    metrics.observe(f"copy.completion_tokens.{tag}", completion_tokens)
+    metrics.incr("copy.prompt_tokens", prompt_tokens)
+    metrics.incr("copy.completion_tokens", completion_tokens)
+
+
+def _strip_fence(content: str) -> str:
+    """Drop a markdown code fence around the JSON, if the model added one."""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1].rsplit("```", 1)[0].strip()
+    return content
+
+
+def _parse_response(content: str, platforms: list[str], salvaged=None) -> tuple[dict, bool]:
+    """Parse a JSON response; if it is cut off or malformed, rebuild it from its complete candidates.
+
+    salvaged: (owner, candidate) pairs already pulled out by a CandidateStreamParser;
+    content is scanned when not given.
+
+    Returns:
+        (data, repaired)
+    """
+    try:
+        data = json.loads(_strip_fence(content))
+    except ValueError:
+        pass
+    else:
+        if not isinstance(data, dict):
+            raise RuntimeError("文案生成失败: 返回内容无法解析")
+        return data, False
+    if salvaged is None:
+        salvaged = CandidateStreamParser().feed(content)
+    if not salvaged:
+        raise RuntimeError("文案生成失败: 返回内容无法解析")
+    metrics.incr("copy.repaired")
+    if len(platforms) == 1:
+        return {"candidates": [c for _, c in salvaged]}, True
+    by_platform: dict = {}
+    for owner, candidate in salvaged:
+        by_platform.setdefault(owner, {"candidates": []})["candidates"].append(candidate)
+    return {"platforms": by_platform}, True
+
+
+def _complete_json(prompt: str, fresh: bool, extract, platforms: list[str], style: str):
+    """Run one JSON-mode chat completion through the response cache.
+
+    extract(data) picks the value to return and cache from the parsed JSON.
+    Responses that had to be repaired are returned but not cached.
+    """
+    cache = _get_cache_db()
+    cache_key = _copy_cache_key(prompt, COPY_MODEL)
+    if fresh:
+        metrics.incr("copy_cache.bypass")
+    else:
+        cached = cache.get_copy_cache(cache_key, COPY_CACHE_TTL_HOURS)
+        if cached is not None:
+            metrics.incr("copy_cache.hits")
+            metrics.incr("copy_cache.tokens_saved", cached["prompt_tokens"] + cached["completion_tokens"])
+            return cached["response"]
+        metrics.incr("copy_cache.misses")
+
+    with get_governor("deepseek").slot():
+        start = time.perf_counter()
+        response = client.chat.completions.create(**_chat_request(prompt, platforms))
+        _record_call(style, platforms, response.usage, time.perf_counter() - start)
+
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        metrics.incr("copy.truncated")
+    data, repaired = _parse_response(choice.message.content or "", platforms)
+    result = extract(data)
+    if not repaired:
+        cache.save_copy_cache(cache_key, result, COPY_MODEL, *_usage_tokens(response.usage))
+    return result
+
+
+def _format_price(price: str) -> str:
+    """Display form of a normalized price: 99.00 -> 99, 99.90 -> 99.9."""
+    return price.rstrip("0").rstrip(".") if "." in price else price
+
+
+# Local titles shorten the product name to no less than this before dropping the selling point
+TITLE_MIN_NAME_CHARS = 6
+
+
+def _fill_title(template: str, name: str, point: str, price: str, limit: int) -> str:
+    """Fill a title template to fit limit chars.
+
+    Shortens the product name first (down to TITLE_MIN_NAME_CHARS), then drops
+    the selling point, and only then cuts the title itself.
+    """
+    def fill(name_part, point_part):
+        title = template.format(name=name_part, point=point_part, price=price)
+        # Tidy the gaps an empty placeholder leaves behind
+        return re.sub(r"｜+", "｜", " ".join(title.split())).strip("｜ ")
+
+    shortest = min(len(name), TITLE_MIN_NAME_CHARS)
+    for point_part in (point, ""):
+        for name_chars in range(len(name), shortest - 1, -1):
+            title = fill(name[:name_chars], point_part)
+            if len(title) <= limit:
+                return title
+    return fill(name[:shortest], "")[:limit]
+
+
+def generate_copy_local(
     product_name: str,
     selling_points: list[str],
     price: float,
     platform: str,
     style: str,
 ) -> list[dict]:
-    """Generate 2 candidate copies for a product.
+    """Build 2 candidate copies from the style's templates, without calling the LLM.
+
+    Deterministic and instant: titles come from COPY_STYLES[style]["title_templates"]
+    filled with the product name, first selling point and price, and fit the
+    platform's title_max_chars. Selling points are the product's own (through
+    point_templates), topped up to 3 with the style's filler_points. Used as a
+    placeholder until LLM copy arrives and as an offline mode for batches.
 
     Returns:
         List of 2 dicts, each with keys: title, selling_points (list of strings)
     """
+    limit = get_platform_config(platform)["title_max_chars"]
+    style_config = COPY_STYLES[style]
+    name, points, price_text = _normalize_product(product_name, selling_points, price)
+    price_text = _format_price(price_text)
+    lead = points[0] if points else style_config["default_point"]
+
+    candidates = []
+    for i in range(COPY_CANDIDATES):
+        title_template = style_config["title_templates"][i % len(style_config["title_templates"])]
+        point_template = style_config["point_templates"][i % len(style_config["point_templates"])]
+        copy_points = [point_template.format(point=sp) for sp in points[:3]]
+        for filler in style_config["filler_points"]:
+            if len(copy_points) >= 3:
+                break
+            copy_points.append(filler.format(price=price_text))
+        candidates.append({
+            "title": _fill_title(title_template, name, lead, price_text, limit),
+            "selling_points": copy_points,
+        })
+    return candidates
+
+
+def _copy_prompt(product_name: str, selling_points: list[str], price: float, platform: str, style: str) -> str:
+    """Build the single-platform prompt from normalized inputs."""
     platform_config = get_platform_config(platform)
     style_config = COPY_STYLES[style]
+    product_name, selling_points, price = _normalize_product(product_name, selling_points, price)
 
-    prompt = f"""你是一位资深电商文案专家。请为以下商品生成2套营销文案。
+    return f"""你是一位资深电商文案专家。请为以下商品生成2套营销文案。
 
 商品信息：
 - 商品名称：{product_name}
@@ -59,16 +285,398 @@ def generate_copy(
 请严格按以下JSON格式返回，不要添加任何其他内容：
 {{"candidates": [{{"title": "商品标题", "selling_points": ["卖点描述1", "卖点描述2", "卖点描述3"]}}, {{"title": "商品标题", "selling_points": ["卖点描述1", "卖点描述2", "卖点描述3"]}}]}}"""
 
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.8,
+
+def _multi_copy_prompt(product_name: str, selling_points: list[str], price: float, platforms: list[str], style: str) -> str:
+    """Build the prompt asking for copy for several platforms at once."""
+    style_config = COPY_STYLES[style]
+    product_name, selling_points, price = _normalize_product(product_name, selling_points, price)
+
+    platform_lines = "\n".join(
+        f"- {key}（{cfg['label']}）：风格提示「{cfg['style_hint']}」，标题{cfg['title_max_chars']}字以内"
+        for key, cfg in ((key, get_platform_config(key)) for key in platforms)
+    )
+    candidate = {"title": "商品标题", "selling_points": ["卖点描述1", "卖点描述2", "卖点描述3"]}
+    example = json.dumps(
+        {"platforms": {key: {"candidates": [candidate, candidate]} for key in platforms}},
+        ensure_ascii=False,
     )
 
-    content = response.choices[0].message.content.strip()
-    # Handle possible markdown code block wrapping
-    if content.startswith("```"):
-        content = content.split("\n", 1)[1].rsplit("```", 1)[0].strip()
+    return f"""你是一位资深电商文案专家。请为以下商品分别针对每个目标平台生成2套营销文案，每个平台的文案需符合该平台的风格和标题字数限制。
+
+商品信息：
+- 商品名称：{product_name}
+- 核心卖点：{', '.join(selling_points)}
+- 价格：¥{price}
+
+目标平台：
+{platform_lines}
+
+文案风格要求：{style_config['prompt_hint']}
+
+请严格按以下JSON格式返回，不要添加任何其他内容：
+{example}"""
+
+
+def _valid_candidates(items) -> list[dict]:
+    """Keep candidates matching the schema: a non-empty title and a list of selling point strings."""
+    valid = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        title = item.get("title")
+        points = item.get("selling_points")
+        if not isinstance(title, str) or not title.strip() or not isinstance(points, list):
+            continue
+        valid.append({"title": title.strip(), "selling_points": [str(sp).strip() for sp in points if str(sp).strip()]})
+    return valid[:COPY_CANDIDATES]
+
+
+def _candidates_of(data: dict) -> list[dict]:
+    """Pull the schema-valid candidate list out of a single-platform response."""
+    candidates = _valid_candidates(data.get("candidates"))
+    if not candidates:
+        raise RuntimeError("文案生成失败: 返回内容缺少有效文案")
+    return candidates
+
+
+def _multi_extractor(platforms: list[str]):
+    """Return an extract(data) that pulls per-platform candidates from a multi-platform response."""
+    def extract(data: dict) -> dict[str, list[dict]]:
+        by_platform = data.get("platforms") or {}
+        result = {
+            key: _valid_candidates((by_platform.get(key) or {}).get("candidates"))
+            for key in platforms
+        }
+        missing = [key for key in platforms if not result[key]]
+        if missing:
+            raise RuntimeError(f"文案生成失败: 缺少平台 {', '.join(missing)} 的文案")
+        return result
+
+    return extract
+
+
+def generate_copy(
+    product_name: str,
+    selling_points: list[str],
+    price: float,
+    platform: str,
+    style: str,
+    fresh: bool = False,
+) -> list[dict]:
+    """Generate 2 candidate copies for a product.
+
+    The request uses JSON output mode with max_tokens sized from the platform's
+    title limit. Candidates that do not match the schema are dropped; a cut-off
+    or malformed response keeps its complete candidates (`copy.repaired`).
+    Latency and token usage are recorded per style and platform as `copy.*`
+    metrics.
+
+    Responses are cached in SQLite for COPY_CACHE_TTL_HOURS, keyed by the prompt
+    built from normalized inputs (trimmed name/selling points, price to 2 decimals)
+    and the model. Hits and tokens saved are recorded as `copy_cache.*` metrics.
+
+    Args:
+        fresh: skip the cache and ask for new variations (the result replaces
+            the cached entry)
+
+    Returns:
+        List of 2 dicts, each with keys: title, selling_points (list of strings)
+    """
+    prompt = _copy_prompt(product_name, selling_points, price, platform, style)
+    return _complete_json(prompt, fresh, _candidates_of, [platform], style)
+
+
+def generate_copy_multi(
+    product_name: str,
+    selling_points: list[str],
+    price: float,
+    platforms: list[str],
+    style: str,
+    fresh: bool = False,
+) -> dict[str, list[dict]]:
+    """Generate 2 candidate copies per platform from a single chat completion.
+
+    The prompt lists every platform with its own title_max_chars and style_hint,
+    so each platform gets copy written for it without one request per platform.
+    A single platform falls back to generate_copy (sharing its cache entries).
+
+    Returns:
+        Dict mapping each platform key to a list of 2 dicts (title, selling_points)
+
+    Raises:
+        RuntimeError: if the response is missing a platform
+    """
+    if len(platforms) == 1:
+        return {platforms[0]: generate_copy(product_name, selling_points, price, platforms[0], style, fresh=fresh)}
+
+    prompt = _multi_copy_prompt(product_name, selling_points, price, platforms, style)
+    return _complete_json(prompt, fresh, _multi_extractor(platforms), platforms, style)
+
+
+class CandidateStreamParser:
+    """Incremental scanner that pulls complete candidate objects out of streamed JSON.
+
+    feed() text chunks as they arrive; it returns (owner_key, candidate) for every
+    object that has just closed inside a `"candidates": [...]` array. owner_key is
+    the key of the object holding that array (a platform key in multi-platform
+    responses, None for the top-level single-platform shape). Text outside the
+    outermost JSON object, such as a markdown fence, is ignored, and candidates
+    that are not valid JSON are skipped.
+    """
+
+    def __init__(self):
+        self._data = ""
+        self._pos = 0
+        self._stack: list[list] = []   # [kind, key, start, is_candidate_array]
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._pending_key = None
+        self._done = False
+
+    def feed(self, text: str) -> list[tuple[str | None, dict]]:
+        found = []
+        self._data += text
+        data = self._data
+        for i in range(self._pos, len(data)):
+            ch = data[i]
+            if self._done:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = data[self._string_start:i + 1]
+                continue
+            if not self._stack and ch != "{":
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._stack and self._stack[-1][0] == "obj":
+                try:
+                    self._pending_key = json.loads(self._last_string)
+                except (TypeError, ValueError):
+                    # A ':' with no key before it, e.g. '{:'
+                    self._pending_key = None
+            elif ch in "{[":
+                key = self._pending_key if self._stack and self._stack[-1][0] == "obj" else None
+                self._pending_key = None
+                kind = "obj" if ch == "{" else "arr"
+                self._stack.append([kind, key, i, kind == "arr" and key == "candidates"])
+            elif ch in "}]":
+                kind, key, start, _ = self._stack.pop()
+                if kind == "obj" and self._stack and self._stack[-1][3]:
+                    # Grandparent object owns the candidates array
+                    owner = self._stack[-2][1] if len(self._stack) >= 2 else None
+                    try:
+                        found.append((owner, json.loads(data[start:i + 1])))
+                    except ValueError:
+                        # Malformed candidate (bad value, mismatched bracket): skip it, keep scanning
+                        pass
+                if not self._stack:
+                    self._done = True
+            elif ch == ",":
+                self._pending_key = None
+        self._pos = len(data)
+        return found
+
+
+def generate_copy_stream(
+    product_name: str,
+    selling_points: list[str],
+    price: float,
+    platforms: list[str],
+    style: str,
+    fresh: bool = False,
+):
+    """Stream copy generation, yielding each candidate as soon as its JSON object is complete.
+
+    Uses the same prompts, JSON mode, token budget and response cache as
+    generate_copy / generate_copy_multi; a cache hit yields every candidate
+    immediately. The complete result is cached once the stream ends (unless the
+    stream was cut off and had to be repaired).
+
+    Candidates for platforms that were not requested are dropped, and each
+    platform yields at most COPY_CANDIDATES.
+
+    Yields:
+        (platform, candidate) with candidate a dict of title, selling_points
+
+    Raises:
+        RuntimeError: if the response is missing a platform
+    """
+    if len(platforms) == 1:
+        prompt = _copy_prompt(product_name, selling_points, price, platforms[0], style)
+        extract = _candidates_of
+    else:
+        prompt = _multi_copy_prompt(product_name, selling_points, price, platforms, style)
+        extract = _multi_extractor(platforms)
+
+    def as_pairs(result):
+        if isinstance(result, dict):
+            return [(key, c) for key, items in result.items() for c in items]
+        return [(platforms[0], c) for c in result]
+
+    cache = _get_cache_db()
+    cache_key = _copy_cache_key(prompt, COPY_MODEL)
+    if fresh:
+        metrics.incr("copy_cache.bypass")
+    else:
+        cached = cache.get_copy_cache(cache_key, COPY_CACHE_TTL_HOURS)
+        if cached is not None:
+            metrics.incr("copy_cache.hits")
+            metrics.incr("copy_cache.tokens_saved", cached["prompt_tokens"] + cached["completion_tokens"])
+            yield from as_pairs(cached["response"])
+            return
+        metrics.incr("copy_cache.misses")
+
+    parser = CandidateStreamParser()
+    content = []
+    salvaged = []
+    streamed: dict[str, int] = {}
+    usage = None
+    with get_governor("deepseek").slot():
+        start = time.perf_counter()
+        stream = client.chat.completions.create(
+            **_chat_request(prompt, platforms),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].finish_reason == "length":
+                metrics.incr("copy.truncated")
+            delta = chunk.choices[0].delta.content or ""
+            content.append(delta)
+            for owner, candidate in parser.feed(delta):
+                owner = owner or platforms[0]
+                salvaged.append((owner, candidate))
+                # Like the extractors: only requested platforms, at most COPY_CANDIDATES each
+                if owner not in platforms or streamed.get(owner, 0) >= COPY_CANDIDATES:
+                    continue
+                valid = _valid_candidates([candidate])
+                if valid:
+                    streamed[owner] = streamed.get(owner, 0) + 1
+                    yield owner, valid[0]
+        _record_call(style, platforms, usage, time.perf_counter() - start)
+
+    data, repaired = _parse_response("".join(content), platforms, salvaged)
+    result = extract(data)
+    if not repaired:
+        cache.save_copy_cache(cache_key, result, COPY_MODEL, *_usage_tokens(usage))
+
+
+def format_copy_text(copies: list[dict] | dict[str, list[dict]]) -> str:
+    """Render candidate copies in the plain-text copy.txt download format.
+
+    Accepts a candidate list, or a per-platform dict (from generate_copy_multi),
+    which is rendered as one section per platform.
+    """
+    if isinstance(copies, dict):
+        return "".join(
+            f"##### {get_platform_config(key)['label']} #####\n\n{format_copy_text(items)}"
+            for key, items in copies.items()
+        )
+    copy_text = ""
+    for i, copy_item in enumerate(copies):
+        copy_text += f"=== 文案方案 {i + 1} ===\n"
+        copy_text += f"标题：{copy_item.get('title', '')}\n"
+        for sp in copy_item.get("selling_points", []):
+            copy_text += f"- {sp}\n"
+        copy_text += "\n"
+    return copy_text
+
+
+def _generate_copy_local_for(product: dict, platform: str | list[str], style: str):
+    """generate_copy_local for one batch product, per platform for a platform list."""
+    args = (product["name"], product.get("selling_points", []), product.get("price", 0))
+    if isinstance(platform, list):
+        return {key: generate_copy_local(*args, key, style) for key in platform}
+    return generate_copy_local(*args, platform, style)
+
+
+def _generate_copy_with_retries(product: dict, platform: str | list[str], style: str, retries: int, fresh: bool):
+    """Call generate_copy (or generate_copy_multi for a platform list) for one product, with retries."""
+    for attempt in range(retries + 1):
+        try:
+            if isinstance(platform, list):
+                return generate_copy_multi(
+                    product_name=product["name"],
+                    selling_points=product.get("selling_points", []),
+                    price=product.get("price", 0),
+                    platforms=platform,
+                    style=style,
+                    fresh=fresh,
+                )
+            return generate_copy(
+                product_name=product["name"],
+                selling_points=product.get("selling_points", []),
+                price=product.get("price", 0),
+                platform=platform,
+                style=style,
+                fresh=fresh,
+            )
+        except Exception:
+            if attempt == retries:
+                raise
+            metrics.incr("copy_batch.retries")
+            time.sleep(COPY_RETRY_BACKOFF * 2 ** attempt)
+
+
+def generate_copy_batch(
+    products: list[dict],
+    platform: str | list[str],
+    style: str,
+    max_workers: int = COPY_BATCH_CONCURRENCY,
+    retries: int = COPY_BATCH_RETRIES,
+    fresh: bool = False,
+    offline: bool = False,
+):
+    """Generate copy for many products concurrently, streaming results back in input order.
+
+    All requests are submitted immediately, so callers can do other work (e.g.
+    render images) while iterating. Each worker runs in a copy of the caller's
+    context, so rate_limiter.priority() applies to the batch requests.
+
+    Args:
+        products: dicts with keys name, selling_points, price
+        platform: platform key, or a list of keys for per-platform copy dicts
+            (as returned by generate_copy_multi)
+        style, fresh: as in generate_copy
+        max_workers: max chat completions in flight
+        retries: extra attempts per product after a failure
+        offline: build every product's copy with generate_copy_local instead
+            of calling the LLM
+
+    Returns:
+        Iterator of (index, candidates, error) in input order; on failure
+        candidates is empty ([] or {}) and error is the last exception
+    """
+    if offline:
+        return ((i, _generate_copy_local_for(product, platform, style), None) for i, product in enumerate(products))
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="copy-batch")
+    futures = [
+        pool.submit(contextvars.copy_context().run, _generate_copy_with_retries, product, platform, style, retries, fresh)
+        for product in products
+    ]
+    # Queued work still runs; the pool just accepts nothing new
+    pool.shutdown(wait=False)
+
+    def results():
+        for i, future in enumerate(futures):
+            try:
+                yield i, future.result(), None
+            except Exception as e:
+                metrics.incr("copy_batch.failed")
+                yield i, {} if isinstance(platform, list) else [], e
 
-    data = json.loads(content)
-    return data["candidates"]
+    return results()
@@ -1,15 +1,10 @@
 import os
+import time
 from PIL import Image
-from typing import Optional
+from typing import Callable, Optional
 from core.template_engine import list_templates, render_image
 from core.platforms import get_platform_config
-
-try:
-    from core.bg_remover import remove_background
-except ImportError:
-    # rembg may not be installed; remove_background will be patched in tests
-    def remove_background(input_image):
-        raise RuntimeError("rembg is not installed. Install it or use skip_bg_removal=True.")
+from core.bg_remover import remove_background
 
 PRESETS_DIR = os.path.join(os.path.dirname(__file__), "..", "templates", "presets")
 
@@ -72,6 +67,9 @@ def compose_images(
     skip_bg_removal: bool = False,
     ai_bg_override: Optional[Image.Image] = None,
     ai_composed_override: Optional[Image.Image] = None,
+    ai_composed_overrides: Optional[dict[str, Image.Image]] = None,
+    ai_deadline: Optional[float] = None,
+    on_ai_ready: Optional[Callable[[str, Image.Image], None]] = None,
 ) -> dict[str, Image.Image]:
     """Compose product images for multiple platforms.
 
@@ -84,6 +82,11 @@ def compose_images(
         skip_bg_removal: skip rembg if image already has transparent bg
         ai_bg_override: optional pre-generated background image (v1 style)
         ai_composed_override: optional pre-composed image with product in scene (v2 style)
+        ai_composed_overrides: optional per-platform pre-composed images (from
+            generate_ai_background_multi); takes precedence over ai_composed_override
+        ai_deadline: optional latency budget (seconds) shared by all platforms for
+            inline AI backgrounds; platforms that miss it get the gradient fallback
+        on_ai_ready: called as (platform, image) when a late AI background arrives
 
     Returns:
         Dict mapping platform key to composed PIL Image
@@ -93,10 +96,23 @@ def compose_images(
     else:
         clean_image = product_image
 
+    deadline_at = time.monotonic() + ai_deadline if ai_deadline is not None else None
+
     results = {}
     for platform in platforms:
         template = _find_template_for_platform(platform, template_style)
-        composed = render_image(template, clean_image, product_info, logo=logo, ai_bg_override=ai_bg_override, ai_composed_override=ai_composed_override)
+        composed_override = ai_composed_override
+        if ai_composed_overrides and platform in ai_composed_overrides:
+            composed_override = ai_composed_overrides[platform]
+        remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+        platform_ready = None
+        if on_ai_ready is not None:
+            platform_ready = lambda image, platform=platform: on_ai_ready(platform, image)
+        composed = render_image(
+            template, clean_image, product_info, logo=logo,
+            ai_bg_override=ai_bg_override, ai_composed_override=composed_override,
+            ai_deadline=remaining, on_ai_ready=platform_ready,
+        )
         results[platform] = composed
 
     return results
@@ -0,0 +1,71 @@
+# core/metrics.py
+import threading
+from collections import defaultdict, deque
+
+# Keep the most recent samples per series; enough for stable p95 without growing forever
+MAX_SAMPLES = 1000
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Add value to a named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample (e.g. latency in seconds, payload bytes) for a named series."""
+    with _lock:
+        _samples[name].append(value)
+
+
+def get_counter(name: str) -> float:
+    """Return the current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def hit_rate(prefix: str) -> float:
+    """Return hits / (hits + misses) for counters named `{prefix}.hits` / `{prefix}.misses`."""
+    with _lock:
+        hits = _counters.get(f"{prefix}.hits", 0)
+        misses = _counters.get(f"{prefix}.misses", 0)
+    total = hits + misses
+    return hits / total if total else 0.0
+
+
+def summarize(name: str) -> dict:
+    """Return count/mean/p50/p95/max for a sample series."""
+    with _lock:
+        values = sorted(_samples.get(name, ()))
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    count = len(values)
+    return {
+        "count": count,
+        "mean": sum(values) / count,
+        "p50": values[int(0.50 * (count - 1))],
+        "p95": values[int(0.95 * (count - 1))],
+        "max": values[-1],
+    }
+
+
+def snapshot() -> dict:
+    """Return all counters and per-series summaries as a plain dict."""
+    with _lock:
+        counters = dict(_counters)
+        names = list(_samples.keys())
+    return {
+        "counters": counters,
+        "series": {name: summarize(name) for name in names},
+    }
+
+
+def reset() -> None:
+    """Clear all counters and samples."""
+    with _lock:
+        _counters.clear()
+        _samples.clear()
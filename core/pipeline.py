@@ -0,0 +1,110 @@
+# core/pipeline.py
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.copy_generator import generate_copy_local, generate_copy_stream
+
+# Copy jobs are network-bound (streamed chat completions); the deepseek
+# governor still caps the actual request rate
+COPY_JOB_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=COPY_JOB_WORKERS, thread_name_prefix="copy-job")
+
+
+class CopyJob:
+    """Copy generation for one product, running on a worker while the caller renders images.
+
+    Candidates are kept as they stream in, so stream() can be called at any
+    time (and more than once, e.g. on a later Streamlit rerun): it replays what
+    has arrived and then follows the rest. Runs in a copy of the caller's
+    context, so rate_limiter.priority() applies.
+    """
+
+    def __init__(
+        self,
+        product_name: str,
+        selling_points: list[str],
+        price: float,
+        platforms: list[str],
+        style: str,
+        fresh: bool = False,
+    ):
+        self.product_name = product_name
+        self.selling_points = selling_points
+        self.price = price
+        self.platforms = platforms
+        self.style = style
+        self.fresh = fresh
+        self._cond = threading.Condition()
+        self._pairs: list[tuple[str, dict]] = []
+        self._done = False
+        self._error: Exception | None = None
+        self.future = _executor.submit(contextvars.copy_context().run, self._run)
+
+    def _run(self) -> None:
+        try:
+            for pair in generate_copy_stream(
+                self.product_name, self.selling_points, self.price, self.platforms, self.style, fresh=self.fresh,
+            ):
+                with self._cond:
+                    self._pairs.append(pair)
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def done(self) -> bool:
+        with self._cond:
+            return self._done
+
+    def local_copies(self) -> dict[str, list[dict]]:
+        """Template copy for every platform (generate_copy_local), to show while waiting."""
+        return {
+            key: generate_copy_local(self.product_name, self.selling_points, self.price, key, self.style)
+            for key in self.platforms
+        }
+
+    def stream(self):
+        """Yield (platform, candidate) pairs: those already received, then the rest as they arrive.
+
+        Raises:
+            Exception: whatever generate_copy_stream raised, after the candidates it produced
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self._pairs) and not self._done:
+                    self._cond.wait()
+                pairs = self._pairs[sent:]
+                done, error = self._done, self._error
+            sent += len(pairs)
+            yield from pairs
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def result(self) -> dict[str, list[dict]]:
+        """Wait for the job and return candidates per platform; a failed job raises its error."""
+        copies: dict[str, list[dict]] = {}
+        for key, candidate in self.stream():
+            copies.setdefault(key, []).append(candidate)
+        return copies
+
+
+def start_copy(
+    product_name: str,
+    selling_points: list[str],
+    price: float,
+    platforms: list[str],
+    style: str,
+    fresh: bool = False,
+) -> CopyJob:
+    """Start generating copy for every platform in the background; see CopyJob."""
+    return CopyJob(product_name, selling_points, price, platforms, style, fresh)
+
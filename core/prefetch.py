@@ -0,0 +1,105 @@
+# core/prefetch.py
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core import metrics
+
+# Inputs must stay unchanged this long before speculative work starts
+PREFETCH_DEBOUNCE_SECONDS = 1.5
+PREFETCH_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def input_signature(*parts) -> str:
+    """Hash UI inputs (bytes, strings, numbers, None, or tuples/lists of them) into a signature."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray)):
+            h.update(b"b")
+            h.update(hashlib.sha256(part).digest())
+        else:
+            h.update(b"r")
+            h.update(repr(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class Prefetcher:
+    """Debounced speculative work for one UI session.
+
+    `schedule(signature, fn)` (called on every rerun) starts `fn` on a shared
+    worker pool once the same signature has been scheduled for `debounce`
+    seconds. A different signature cancels the pending or queued work for the
+    previous one; work already running is left to finish, since its uploads and
+    results land in the upload/result caches. `take(signature)` hands the
+    in-flight Future to the click that needs it.
+    """
+
+    def __init__(self, debounce: float = PREFETCH_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._signature: str | None = None
+        self._fn = None
+        self._timer: threading.Timer | None = None
+        self._future: Future | None = None
+
+    def schedule(self, signature: str, fn) -> None:
+        """Arrange for fn() to run after the debounce interval unless the inputs change."""
+        with self._lock:
+            if signature == self._signature:
+                return
+            self._drop()
+            self._signature = signature
+            self._fn = fn
+            self._timer = threading.Timer(self.debounce, self._start, args=(signature,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start(self, signature: str) -> None:
+        with self._lock:
+            if signature == self._signature and self._future is None:
+                self._submit()
+
+    def _submit(self) -> None:
+        """Submit the pending fn; caller holds the lock."""
+        self._timer = None
+        self._future = _executor.submit(self._fn)
+        metrics.incr("prefetch.started")
+
+    def _drop(self) -> None:
+        """Cancel the pending timer and queued work; caller holds the lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._future is not None and self._future.cancel():
+            metrics.incr("prefetch.cancelled")
+        self._future = None
+        self._signature = None
+        self._fn = None
+
+    def take(self, signature: str) -> Future | None:
+        """Return the Future for signature's work (starting it now if still debouncing), or None.
+
+        The work is handed over: a second take() for the same inputs returns None.
+        """
+        with self._lock:
+            if signature != self._signature:
+                metrics.incr("prefetch.misses")
+                return None
+            if self._future is None:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._submit()
+            future = self._future
+            self._future = None
+            self._signature = None
+            self._fn = None
+        metrics.incr("prefetch.hits")
+        return future
+
+    def cancel(self) -> None:
+        """Drop any pending or queued work (e.g. prefetch was switched off)."""
+        with self._lock:
+            self._drop()
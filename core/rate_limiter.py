@@ -0,0 +1,221 @@
+# core/rate_limiter.py
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from core import metrics, providers
+
+# Request priorities: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+
+# Default per-provider limits; override with e.g. DASHSCOPE_RATE / DASHSCOPE_BURST /
+# DASHSCOPE_MAX_CONCURRENCY environment variables.
+PROVIDER_LIMITS = {
+    "dashscope": {"rate": 2.0, "burst": 2, "max_concurrency": 2},
+    "deepseek": {"rate": 5.0, "burst": 10, "max_concurrency": 8},
+}
+
+# Set RATE_LIMIT_DB to a SQLite file path to share token buckets across processes
+RATE_LIMIT_DB_ENV = "RATE_LIMIT_DB"
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed provider calls at the given priority (INTERACTIVE or BATCH)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """In-process token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class SQLiteTokenBucket:
+    """Token bucket whose state lives in a SQLite table, shared by every process using the file."""
+
+    def __init__(self, db_path: str, name: str, rate: float, burst: float):
+        self.db_path = db_path
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets "
+            "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def try_acquire(self) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens = float(self.burst) if row is None else min(
+                self.burst, row[0] + max(0.0, now - row[1]) * self.rate
+            )
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class Governor:
+    """Rate + concurrency gate for one provider, serving waiters by priority then arrival.
+
+    A caller proceeds when it is at the head of the queue, fewer than
+    `max_concurrency` calls are in flight, and the bucket yields a token.
+    Queue depth and wait time are recorded as `governor.<name>.*` metrics.
+    """
+
+    def __init__(self, name: str, bucket, max_concurrency: int):
+        self.name = name
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._active = 0
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._waiting)
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return self._active
+
+    def acquire(self, level: int | None = None, timeout: float | None = None) -> None:
+        """Block until this caller may call the provider.
+
+        Raises:
+            RuntimeError: if `timeout` seconds pass first
+        """
+        level = _priority.get() if level is None else level
+        ticket = (level, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            metrics.observe(f"governor.{self.name}.queue_depth", len(self._waiting))
+            try:
+                while True:
+                    wait = None
+                    if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                        wait = self.bucket.try_acquire()
+                        if wait == 0:
+                            break
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - start)
+                        if remaining <= 0:
+                            raise RuntimeError(f"{self.name} 请求排队超时")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # The next waiter may be able to go now too
+            self._cond.notify_all()
+        metrics.incr(f"governor.{self.name}.acquired")
+        metrics.observe(f"governor.{self.name}.wait_seconds", time.monotonic() - start)
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, level: int | None = None, timeout: float | None = None):
+        """Context manager wrapping acquire/release around one provider call."""
+        self.acquire(level, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_governors: dict[str, Governor] = {}
+_governors_lock = threading.Lock()
+
+
+def _limit(provider: str, key: str) -> float:
+    providers.load_env()
+    env = os.getenv(f"{provider.upper()}_{key.upper()}")
+    return float(env) if env else PROVIDER_LIMITS[provider][key]
+
+
+def get_governor(provider: str) -> Governor:
+    """Return the process-wide governor for a provider in PROVIDER_LIMITS."""
+    with _governors_lock:
+        governor = _governors.get(provider)
+        if governor is None:
+            rate = _limit(provider, "rate")
+            burst = _limit(provider, "burst")
+            db_path = os.getenv(RATE_LIMIT_DB_ENV)
+            if db_path:
+                bucket = SQLiteTokenBucket(db_path, provider, rate, burst)
+            else:
+                bucket = TokenBucket(rate, burst)
+            governor = Governor(provider, bucket, int(_limit(provider, "max_concurrency")))
+            _governors[provider] = governor
+        return governor
+
+
+def reset_governors() -> None:
+    """Drop all governors so the next call rebuilds them from current limits."""
+    with _governors_lock:
+        _governors.clear()
@@ -0,0 +1,88 @@
+# core/result_cache.py
+import os
+import shutil
+import tempfile
+import threading
+
+
+class BlobCache:
+    """Size-bounded on-disk cache mapping a hex key to a list of binary blobs.
+
+    Each entry is a directory `<root>/<key[:2]>/<key>/` holding `0.bin`, `1.bin`, ...
+    Entries are written to a temp directory and renamed into place, so readers
+    never see a half-written entry. The directory mtime doubles as the LRU clock:
+    hits touch it, and `put` evicts the oldest entries once the total size
+    exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> list[bytes] | None:
+        """Return the cached blobs for key, or None on a miss."""
+        entry = self._entry_dir(key)
+        try:
+            names = sorted(
+                (n for n in os.listdir(entry) if n.endswith(".bin")),
+                key=lambda n: int(n.split(".")[0]),
+            )
+            blobs = []
+            for name in names:
+                with open(os.path.join(entry, name), "rb") as f:
+                    blobs.append(f.read())
+            os.utime(entry)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return blobs or None
+
+    def put(self, key: str, blobs: list[bytes]) -> None:
+        """Store blobs under key (replacing any previous entry), then enforce max_bytes."""
+        entry = self._entry_dir(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".tmp-")
+        for i, blob in enumerate(blobs):
+            with open(os.path.join(staging, f"{i}.bin"), "wb") as f:
+                f.write(blob)
+        with self._lock:
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                if key.startswith(".tmp-"):
+                    continue
+                entry = os.path.join(shard_dir, key)
+                size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                entries.append((os.stat(entry).st_mtime, size, entry))
+                total += size
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def total_bytes(self) -> int:
+        """Return the combined size of all cached blobs."""
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return total
+
+    def clear(self) -> None:
+        """Delete every cached entry."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
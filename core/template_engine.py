@@ -1,8 +1,20 @@
+import contextvars
+import functools
 import json
 import os
 import random
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from PIL import Image, ImageDraw, ImageFilter, ImageFont
-from typing import Optional
+from typing import Callable, Optional
+
+from core import metrics
+
+# Workers for AI backgrounds requested with a latency budget; a call that misses
+# its deadline keeps running here (and lands in the result cache) after render_image returns
+AI_BG_WORKERS = 4
+
+_ai_executor = ThreadPoolExecutor(max_workers=AI_BG_WORKERS, thread_name_prefix="ai-bg")
 
 
 def load_template(path: str) -> dict:
@@ -231,6 +243,30 @@ def _draw_bokeh(canvas, bg_config):
 # --- End new rendering helpers ---
 
 
+def _await_ai_background(request, timeout: float, on_late: Optional[Callable] = None):
+    """Run request() on the AI worker pool, waiting at most timeout seconds for it.
+
+    Raises concurrent.futures.TimeoutError on a miss. With on_late the request keeps
+    running and its result is passed to on_late (on a worker thread) if it succeeds.
+    Without it nobody wants a late result: a spent budget (timeout <= 0) misses
+    without submitting the paid request, and a request still queued is cancelled.
+    """
+    if timeout <= 0 and on_late is None:
+        metrics.incr("render.ai_deadline_missed")
+        raise FuturesTimeoutError()
+    # Run in the caller's context so e.g. the rate-limiter priority carries over
+    future = _ai_executor.submit(contextvars.copy_context().run, request)
+    try:
+        return future.result(timeout=max(timeout, 0))
+    except FuturesTimeoutError:
+        metrics.incr("render.ai_deadline_missed")
+        if on_late is not None:
+            future.add_done_callback(lambda f: f.exception() is None and on_late(f.result()))
+        elif future.cancel():
+            metrics.incr("render.ai_cancelled")
+        raise
+
+
 def render_image(
     template: dict,
     product_image: Image.Image,
@@ -238,8 +274,18 @@ def render_image(
     logo: Optional[Image.Image] = None,
     ai_bg_override: Optional[Image.Image] = None,
     ai_composed_override: Optional[Image.Image] = None,
+    ai_deadline: Optional[float] = None,
+    on_ai_ready: Optional[Callable[[Image.Image], None]] = None,
 ) -> Image.Image:
-    """Render a product main image based on template config."""
+    """Render a product main image based on template config.
+
+    For AI-background templates without an override, ai_deadline (seconds) caps
+    how long to wait for the AI scene. On a miss the gradient fallback is
+    rendered immediately. With on_ai_ready the AI call keeps running, its result
+    is cached for the next identical request, and on_ai_ready receives the
+    re-rendered AI image (called from a worker thread). Without it no call is
+    started once the budget is spent, and a call still queued is cancelled.
+    """
     canvas_w = template["canvas"]["width"]
     canvas_h = template["canvas"]["height"]
 
@@ -271,17 +317,29 @@ def render_image(
             else:
                 from core.bg_generator import generate_ai_background
 
+                request = functools.partial(
+                    generate_ai_background,
+                    product_image=product_image,
+                    product_name=product_info.get("name", "商品"),
+                    style=bg.get("style", "minimal"),
+                    width=canvas_w,
+                    height=canvas_h,
+                    scene_prompt=product_info.get("scene_prompt", ""),
+                    custom_prompt=product_info.get("custom_prompt", ""),
+                    n=1,
+                )
                 try:
-                    ai_bgs = generate_ai_background(
-                        product_image=product_image,
-                        product_name=product_info.get("name", "商品"),
-                        style=bg.get("style", "minimal"),
-                        width=canvas_w,
-                        height=canvas_h,
-                        scene_prompt=product_info.get("scene_prompt", ""),
-                        custom_prompt=product_info.get("custom_prompt", ""),
-                        n=1,
-                    )
+                    if ai_deadline is None:
+                        ai_bgs = request()
+                    else:
+                        def rerender_late(late_bgs):
+                            on_ai_ready(render_image(
+                                template, product_image, product_info, logo=logo, ai_bg_override=late_bgs[0],
+                            ))
+
+                        ai_bgs = _await_ai_background(
+                            request, ai_deadline, rerender_late if on_ai_ready is not None else None,
+                        )
                     canvas = ai_bgs[0]
                     draw = ImageDraw.Draw(canvas)
                 except Exception:
@@ -2,16 +2,140 @@
 import sqlite3
 import json
 import os
+import threading
+import weakref
+from collections.abc import Mapping
+
+# Statuses of a journaled DashScope task that may still yield results
+RESUMABLE_TASK_STATUSES = ("PENDING", "RUNNING", "SUCCEEDED")
+# DashScope keeps task results for 24h; older tasks are not worth resuming
+TASK_RESUME_WINDOW_HOURS = 24
+
+# Connection tuning. WAL lets readers run alongside a writer; writers wait up to
+# BUSY_TIMEOUT_SECONDS for the lock instead of failing with "database is locked".
+# synchronous=NORMAL is durable in WAL mode except for the last commits on power loss.
+BUSY_TIMEOUT_SECONDS = 10
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+
+# Default page size of the keyset-paginated listings
+PAGE_SIZE = 50
+# Max materials returned by search_materials
+SEARCH_LIMIT = 200
+# The trigram tokenizer can only match terms of at least this many characters
+FTS_MIN_TERM_CHARS = 3
+
+# Selectable columns of the material / history listings: output name -> SQL
+# (materials are aliased m, history h). Callers pass `columns=` to fetch a subset.
+MATERIAL_FIELDS = {
+    "id": "m.id",
+    "name": "m.name",
+    "selling_points": "m.selling_points",
+    "price": "m.price",
+    "image_path": "m.image_path",
+    "created_at": "m.created_at",
+}
+HISTORY_FIELDS = {
+    "id": "h.id",
+    "material_id": "h.material_id",
+    "template_name": "h.template_name",
+    "platform": "h.platform",
+    "copy_style": "h.copy_style",
+    "generated_image_path": "h.generated_image_path",
+    "generated_copy": "h.generated_copy",
+    "created_at": "h.created_at",
+    "product_name": "m.name",
+}
+# JSON list columns, decoded on first access (an empty value reads as [])
+JSON_COLUMNS = frozenset({"selling_points", "generated_copy"})
+# Keyset cursors are built from these, so paginated queries always select them
+CURSOR_COLUMNS = ("created_at", "id")
+
+
+class Row(Mapping):
+    """Read-only result row that decodes JSON columns on first access.
+
+    Reads like the dicts the listing methods used to return (row["name"],
+    row.get("selling_points", []), dict(row)), but a listing only pays
+    json.loads for the columns a caller actually reads. Rows of one query
+    share their column index.
+    """
+
+    __slots__ = ("_values", "_index", "_decoded")
+
+    def __init__(self, values: tuple, index: dict):
+        self._values = values
+        self._index = index
+        self._decoded = None
+
+    def __getitem__(self, key):
+        value = self._values[self._index[key]]
+        if key not in JSON_COLUMNS:
+            return value
+        if self._decoded is None:
+            self._decoded = {}
+        if key not in self._decoded:
+            self._decoded[key] = json.loads(value) if value else []
+        return self._decoded[key]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+
+def _select_list(fields: dict, columns: list[str] | None, required: tuple = ()) -> str:
+    """SQL select list for the requested columns (all when None); unknown names raise KeyError."""
+    names = list(fields) if columns is None else list(dict.fromkeys([*columns, *required]))
+    return ", ".join(f"{fields[name]} AS {name}" for name in names)
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced (so Database.close can find it)."""
 
 
 class Database:
+    """SQLite access for materials, history, the AI task journal and the copy cache.
+
+    Each thread gets its own connection (see `conn`), so Streamlit sessions,
+    batch workers and background threads sharing an instance never share a
+    connection; the database runs in WAL mode so they do not block each other's reads.
+    """
+
     def __init__(self, db_path: str = None):
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), "app.db")
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        # journal_mode is persistent in the file, so it only needs setting once
+        self.conn.execute("PRAGMA journal_mode=WAL")
         self._create_tables()
+        self.has_fts = self._create_search_index()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened and tuned on first use.
+
+        A thread's connection is closed when the thread exits (or by close()).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, factory=_Connection,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+            self._connections.add(conn)
+        return conn
 
     def _create_tables(self):
         self.conn.executescript("""
@@ -33,9 +157,77 @@ class Database:
                 generated_copy TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            -- Listings are ordered newest first by (created_at, id); each index ends
+            -- in those columns so filtered pages are range scans, not sorts
+            CREATE INDEX IF NOT EXISTS idx_materials_created
+                ON materials (created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_history_created
+                ON generation_history (created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_history_platform_created
+                ON generation_history (platform, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_history_template_created
+                ON generation_history (template_name, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_history_material
+                ON generation_history (material_id);
+            CREATE TABLE IF NOT EXISTS ai_task_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL UNIQUE,
+                inputs_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result_urls TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_ai_task_journal_inputs
+                ON ai_task_journal (inputs_hash, status);
+            CREATE TABLE IF NOT EXISTS copy_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
         """)
         self.conn.commit()
 
+    def _create_search_index(self) -> bool:
+        """Create the FTS5 trigram index over material names and selling points.
+
+        External-content table kept in sync by triggers; built from existing rows
+        the first time. Returns False if this SQLite lacks FTS5 / the trigram
+        tokenizer, in which case search falls back to LIKE.
+        """
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'materials_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self.conn.executescript("""
+                CREATE VIRTUAL TABLE materials_fts USING fts5(
+                    name, selling_points, content='materials', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS materials_fts_insert AFTER INSERT ON materials BEGIN
+                    INSERT INTO materials_fts (rowid, name, selling_points)
+                    VALUES (new.id, new.name, new.selling_points);
+                END;
+                CREATE TRIGGER IF NOT EXISTS materials_fts_delete AFTER DELETE ON materials BEGIN
+                    INSERT INTO materials_fts (materials_fts, rowid, name, selling_points)
+                    VALUES ('delete', old.id, old.name, old.selling_points);
+                END;
+                CREATE TRIGGER IF NOT EXISTS materials_fts_update AFTER UPDATE OF name, selling_points ON materials BEGIN
+                    INSERT INTO materials_fts (materials_fts, rowid, name, selling_points)
+                    VALUES ('delete', old.id, old.name, old.selling_points);
+                    INSERT INTO materials_fts (rowid, name, selling_points)
+                    VALUES (new.id, new.name, new.selling_points);
+                END;
+                INSERT INTO materials_fts (materials_fts) VALUES ('rebuild');
+            """)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
     def save_material(self, name: str, selling_points: list, price: float, image_path: str) -> int:
         cursor = self.conn.execute(
             "INSERT INTO materials (name, selling_points, price, image_path) VALUES (?, ?, ?, ?)",
@@ -44,34 +236,111 @@ class Database:
         self.conn.commit()
         return cursor.lastrowid
 
-    def get_material(self, material_id: int) -> dict | None:
-        row = self.conn.execute("SELECT * FROM materials WHERE id = ?", (material_id,)).fetchone()
-        if row is None:
-            return None
-        d = dict(row)
-        d["selling_points"] = json.loads(d["selling_points"]) if d["selling_points"] else []
-        return d
+    def save_materials_bulk(self, materials: list[dict]) -> list[int]:
+        """Insert many materials in one transaction; returns their ids in input order.
+
+        Each dict has keys name, selling_points, price, image_path (as save_material).
+        """
+        if not materials:
+            return []
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO materials (name, selling_points, price, image_path) VALUES (?, ?, ?, ?)",
+                (
+                    (m["name"], json.dumps(m.get("selling_points", []), ensure_ascii=False),
+                     m.get("price", 0), m.get("image_path", ""))
+                    for m in materials
+                ),
+            )
+            # The write lock is held for the whole transaction, so the ids are consecutive
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(materials) + 1, last_id + 1))
+
+    def _rows(self, sql: str, params=()) -> list[Row]:
+        """Run a query and wrap the result tuples as lazily decoded Rows."""
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        index = {d[0]: i for i, d in enumerate(cursor.description)}
+        return [Row(values, index) for values in cursor.fetchall()]
+
+    def get_material(self, material_id: int) -> Row | None:
+        rows = self._rows(f"SELECT {_select_list(MATERIAL_FIELDS, None)} FROM materials m WHERE m.id = ?", (material_id,))
+        return rows[0] if rows else None
+
+    def get_materials(self, material_ids, columns: list[str] | None = None) -> dict[int, Row]:
+        """Fetch many materials in one query; returns {id: row} for the ids that exist.
+
+        The ids are passed as a single JSON parameter, so any number can be
+        looked up at once (e.g. every material referenced by a history page).
+        """
+        ids = sorted({int(i) for i in material_ids if i})
+        if not ids:
+            return {}
+        rows = self._rows(
+            f"SELECT {_select_list(MATERIAL_FIELDS, columns, ('id',))} FROM materials m "
+            "WHERE m.id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        )
+        return {row["id"]: row for row in rows}
+
+    def list_materials(self, columns: list[str] | None = None) -> list[Row]:
+        """All materials, newest first; `columns` limits the fields fetched (see MATERIAL_FIELDS)."""
+        return self._rows(
+            f"SELECT {_select_list(MATERIAL_FIELDS, columns)} FROM materials m ORDER BY m.created_at DESC, m.id DESC"
+        )
+
+    def list_materials_page(self, after: tuple | None = None, limit: int = PAGE_SIZE,
+                            columns: list[str] | None = None) -> tuple[list[Row], tuple | None]:
+        """Return one page of materials, newest first, and the cursor for the next page.
+
+        Keyset pagination: pass the returned cursor as `after` to get the next
+        page; it is None on the last page. Every page is an index range scan,
+        however deep. `columns` limits the fields fetched (see MATERIAL_FIELDS).
+        """
+        where, params = ("WHERE (m.created_at, m.id) < (?, ?)", list(after)) if after else ("", [])
+        rows = self._rows(
+            f"SELECT {_select_list(MATERIAL_FIELDS, columns, CURSOR_COLUMNS)} FROM materials m {where} "
+            "ORDER BY m.created_at DESC, m.id DESC LIMIT ?",
+            (*params, limit + 1),
+        )
+        results = rows[:limit]
+        cursor = (results[-1]["created_at"], results[-1]["id"]) if len(rows) > limit else None
+        return results, cursor
 
-    def list_materials(self) -> list[dict]:
-        rows = self.conn.execute("SELECT * FROM materials ORDER BY created_at DESC").fetchall()
-        results = []
-        for row in rows:
-            d = dict(row)
-            d["selling_points"] = json.loads(d["selling_points"]) if d["selling_points"] else []
-            results.append(d)
-        return results
-
-    def search_materials(self, keyword: str) -> list[dict]:
-        rows = self.conn.execute(
-            "SELECT * FROM materials WHERE name LIKE ? ORDER BY created_at DESC",
-            (f"%{keyword}%",),
-        ).fetchall()
-        results = []
-        for row in rows:
-            d = dict(row)
-            d["selling_points"] = json.loads(d["selling_points"]) if d["selling_points"] else []
-            results.append(d)
-        return results
+    def search_materials(self, keyword: str, limit: int = SEARCH_LIMIT,
+                         columns: list[str] | None = None) -> list[Row]:
+        """Search material names and selling points; best matches first.
+
+        Whitespace-separated terms must all match (as substrings). Terms of
+        FTS_MIN_TERM_CHARS or more go through the trigram index, ranked by bm25
+        with name matches weighted above selling points; shorter terms (e.g. a
+        single Chinese character) are matched with LIKE. `columns` limits the
+        fields fetched (see MATERIAL_FIELDS).
+        """
+        terms = keyword.split()
+        if not terms:
+            return []
+        select = _select_list(MATERIAL_FIELDS, columns)
+        long_terms = [t for t in terms if len(t) >= FTS_MIN_TERM_CHARS] if self.has_fts else []
+        short_terms = [t for t in terms if t not in long_terms]
+        like_sql = " AND ".join("(m.name LIKE ? OR m.selling_points LIKE ?)" for _ in short_terms)
+        like_params = [f"%{t}%" for t in short_terms for _ in range(2)]
+
+        if long_terms:
+            # Each term as an FTS5 string literal: implicit AND, no query syntax
+            match = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+            return self._rows(
+                f"SELECT {select} FROM materials_fts f JOIN materials m ON m.id = f.rowid "
+                f"WHERE materials_fts MATCH ? {'AND ' + like_sql if like_sql else ''} "
+                "ORDER BY bm25(materials_fts, 10.0, 1.0), m.created_at DESC, m.id DESC LIMIT ?",
+                (match, *like_params, limit),
+            )
+        return self._rows(
+            f"SELECT {select} FROM materials m WHERE {like_sql} "
+            "ORDER BY (m.name LIKE ?) DESC, m.created_at DESC, m.id DESC LIMIT ?",
+            (*like_params, f"%{short_terms[0]}%", limit),
+        )
 
     def update_material(self, material_id: int, **kwargs):
         allowed = {"name", "selling_points", "price", "image_path"}
@@ -101,17 +370,170 @@ class Database:
         self.conn.commit()
         return cursor.lastrowid
 
-    def list_history(self, limit: int = 50) -> list[dict]:
-        rows = self.conn.execute(
-            "SELECT h.*, m.name as product_name FROM generation_history h LEFT JOIN materials m ON h.material_id = m.id ORDER BY h.created_at DESC LIMIT ?",
+    def save_history_bulk(self, records: list[dict], material_ids: list[int] | None = None) -> list[int]:
+        """Insert many history rows in one transaction; returns their ids in input order.
+
+        Each dict has keys template_name, platform, copy_style, image_path, copies
+        (as save_history) and either material_id or material_index, an index into
+        material_ids (e.g. the ids save_materials_bulk just returned). Records
+        with neither get a NULL material_id.
+
+        Raises:
+            ValueError: if a material_index is given without material_ids or is
+                outside 0 <= material_index < len(material_ids)
+        """
+        if not records:
+            return []
+        for record in records:
+            if "material_index" not in record:
+                continue
+            if material_ids is None:
+                raise ValueError("material_index given without material_ids")
+            index = record["material_index"]
+            if not isinstance(index, int) or not 0 <= index < len(material_ids):
+                raise ValueError(f"material_index {index!r} out of range for {len(material_ids)} material_ids")
+
+        def material_of(record):
+            if "material_index" in record:
+                return material_ids[record["material_index"]]
+            return record.get("material_id")
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO generation_history (material_id, template_name, platform, copy_style, generated_image_path, generated_copy) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (material_of(r), r.get("template_name", ""), r["platform"], r.get("copy_style", ""),
+                     r.get("image_path", ""), json.dumps(r.get("copies", []), ensure_ascii=False))
+                    for r in records
+                ),
+            )
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(records) + 1, last_id + 1))
+
+    def list_history(self, limit: int = 50, columns: list[str] | None = None) -> list[Row]:
+        """Newest history rows with product_name; `columns` limits the fields fetched (see HISTORY_FIELDS)."""
+        return self._rows(
+            f"SELECT {_select_list(HISTORY_FIELDS, columns)} FROM generation_history h "
+            "LEFT JOIN materials m ON h.material_id = m.id ORDER BY h.created_at DESC, h.id DESC LIMIT ?",
             (limit,),
-        ).fetchall()
-        results = []
-        for row in rows:
-            d = dict(row)
-            d["generated_copy"] = json.loads(d["generated_copy"]) if d["generated_copy"] else []
-            results.append(d)
-        return results
+        )
+
+    def list_history_page(self, after: tuple | None = None, limit: int = PAGE_SIZE,
+                          platform: str | None = None, template_name: str | None = None,
+                          since: str | None = None, until: str | None = None,
+                          columns: list[str] | None = None) -> tuple[list[Row], tuple | None]:
+        """Return one page of generation history, newest first, and the cursor for the next page.
+
+        Keyset-paginated like list_materials_page. Filters are optional:
+        platform and template_name match exactly; since (inclusive) and until
+        (exclusive) bound created_at and take SQLite timestamps or dates,
+        e.g. "2026-01-31" or "2026-01-31 12:00:00". `columns` limits the
+        fields fetched (see HISTORY_FIELDS).
+        """
+        clauses, params = [], []
+        if after:
+            clauses.append("(h.created_at, h.id) < (?, ?)")
+            params.extend(after)
+        if platform:
+            clauses.append("h.platform = ?")
+            params.append(platform)
+        if template_name:
+            clauses.append("h.template_name = ?")
+            params.append(template_name)
+        if since:
+            clauses.append("h.created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("h.created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._rows(
+            f"SELECT {_select_list(HISTORY_FIELDS, columns, CURSOR_COLUMNS)} FROM generation_history h "
+            f"LEFT JOIN materials m ON h.material_id = m.id {where} ORDER BY h.created_at DESC, h.id DESC LIMIT ?",
+            (*params, limit + 1),
+        )
+        results = rows[:limit]
+        cursor = (results[-1]["created_at"], results[-1]["id"]) if len(rows) > limit else None
+        return results, cursor
+
+    def save_ai_task(self, task_id: str, inputs_hash: str, status: str = "PENDING") -> int:
+        cursor = self.conn.execute(
+            "INSERT INTO ai_task_journal (task_id, inputs_hash, status) VALUES (?, ?, ?) "
+            "ON CONFLICT(task_id) DO UPDATE SET inputs_hash = excluded.inputs_hash, "
+            "status = excluded.status, updated_at = CURRENT_TIMESTAMP",
+            (task_id, inputs_hash, status),
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def update_ai_task(self, task_id: str, status: str, result_urls: list | None = None):
+        if result_urls is None:
+            self.conn.execute(
+                "UPDATE ai_task_journal SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE task_id = ?",
+                (status, task_id),
+            )
+        else:
+            self.conn.execute(
+                "UPDATE ai_task_journal SET status = ?, result_urls = ?, updated_at = CURRENT_TIMESTAMP WHERE task_id = ?",
+                (status, json.dumps(result_urls), task_id),
+            )
+        self.conn.commit()
+
+    def get_ai_task(self, task_id: str) -> dict | None:
+        row = self.conn.execute("SELECT * FROM ai_task_journal WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        d = dict(row)
+        d["result_urls"] = json.loads(d["result_urls"]) if d["result_urls"] else []
+        return d
+
+    def find_resumable_ai_task(self, inputs_hash: str) -> dict | None:
+        """Return the newest unclaimed, still-valid task submitted for these inputs."""
+        placeholders = ", ".join("?" for _ in RESUMABLE_TASK_STATUSES)
+        row = self.conn.execute(
+            f"SELECT * FROM ai_task_journal WHERE inputs_hash = ? AND status IN ({placeholders}) "
+            "AND created_at >= datetime('now', ?) ORDER BY id DESC LIMIT 1",
+            (inputs_hash, *RESUMABLE_TASK_STATUSES, f"-{TASK_RESUME_WINDOW_HOURS} hours"),
+        ).fetchone()
+        if row is None:
+            return None
+        d = dict(row)
+        d["result_urls"] = json.loads(d["result_urls"]) if d["result_urls"] else []
+        return d
+
+    def get_copy_cache(self, cache_key: str, max_age_hours: float) -> dict | None:
+        """Return a cached copy response younger than max_age_hours, or None."""
+        row = self.conn.execute(
+            "SELECT * FROM copy_cache WHERE cache_key = ? AND created_at >= datetime('now', ?)",
+            (cache_key, f"-{max_age_hours} hours"),
+        ).fetchone()
+        if row is None:
+            return None
+        d = dict(row)
+        d["response"] = json.loads(d["response"])
+        return d
+
+    def save_copy_cache(self, cache_key: str, response, model: str,
+                        prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO copy_cache (cache_key, response, model, prompt_tokens, completion_tokens) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (cache_key, json.dumps(response, ensure_ascii=False), model, prompt_tokens, completion_tokens),
+        )
+        self.conn.commit()
+
+    def purge_copy_cache(self, max_age_hours: float) -> int:
+        """Delete cached copy responses older than max_age_hours; returns rows removed."""
+        cursor = self.conn.execute(
+            "DELETE FROM copy_cache WHERE created_at < datetime('now', ?)",
+            (f"-{max_age_hours} hours",),
+        )
+        self.conn.commit()
+        return cursor.rowcount
 
     def close(self):
-        self.conn.close()
+        """Close every thread's connection; threads reconnect on next use."""
+        for conn in list(self._connections):
+            conn.close()
+        self._connections.clear()
+        self._local = threading.local()
@@ -1,13 +1,17 @@
 # pages/1_generate.py
 import streamlit as st
+import functools
 import os
 import io
 import zipfile
 from PIL import Image
 from core.platforms import PLATFORMS
-from core.copy_generator import COPY_STYLES, generate_copy
+from core.copy_generator import COPY_STYLES, format_copy_text, generate_copy_batch
 from core.image_composer import compose_images
-from core.bg_generator import get_scene_presets, generate_ai_background
+from core.bg_generator import get_scene_presets, generate_ai_background_multi, warm_ai_background_multi
+from core import rate_limiter
+from core.pipeline import CopyJob, start_copy
+from core.prefetch import Prefetcher, input_signature
 from data.db import Database
 
 st.set_page_config(page_title="生成主图 & 文案", layout="wide")
@@ -18,6 +22,14 @@ prefill = st.session_state.pop("prefill_material", None)
 
 SCENE_PRESETS = get_scene_presets()
 
+# Seconds a batch item waits for an inline AI background before using the template fallback
+BATCH_AI_FALLBACK_DEADLINE = 15
+
+
+def _platform_sizes(platforms: list[str]) -> dict[str, tuple[int, int]]:
+    """Map platform keys to (width, height) for multi-aspect AI generation."""
+    return {k: (PLATFORMS[k]["width"], PLATFORMS[k]["height"]) for k in platforms}
+
 
 def _render_ai_bg_controls(key_prefix: str = ""):
     """Render AI background controls (3 modes). Returns (scene_prompt, custom_prompt, ref_image)."""
@@ -86,6 +98,96 @@ def _render_ai_bg_controls(key_prefix: str = ""):
     return scene_prompt, custom_prompt, ref_image
 
 
+def _render_copies(copies: dict[str, list[dict]]):
+    """Show candidate copies grouped by platform."""
+    st.subheader("候选文案")
+    for platform_key, items in copies.items():
+        st.markdown(f"**{PLATFORMS[platform_key]['label']}**（标题 {PLATFORMS[platform_key]['title_max_chars']} 字以内）")
+        for i, copy_item in enumerate(items):
+            with st.expander(f"文案方案 {i + 1}", expanded=i == 0):
+                st.markdown(f"**标题：** {copy_item.get('title', '')}")
+                for sp in copy_item.get("selling_points", []):
+                    st.markdown(f"- {sp}")
+
+
+def _start_copy_job(ctx: dict) -> CopyJob:
+    """Start copy generation in the background for a generation context."""
+    product_info = ctx["product_info"]
+    return start_copy(
+        product_name=product_info["name"],
+        selling_points=product_info.get("selling_points", []),
+        price=product_info["price"],
+        platforms=ctx["selected_platforms"],
+        style=ctx["copy_style"],
+        fresh=ctx.get("copy_fresh", False),
+    )
+
+
+def _stream_copies(job: CopyJob) -> dict[str, list[dict]]:
+    """Show a copy job's candidates as they stream in (candidates that already arrived show at once).
+
+    Local template copy is shown straight away and replaced platform by platform
+    as LLM candidates arrive; it is kept for any platform the LLM did not deliver.
+    """
+    copies = job.local_copies()
+    streamed = set()
+    placeholder = st.empty()
+    with placeholder.container():
+        st.caption("AI 文案生成中，先展示模板文案...")
+        _render_copies(copies)
+    try:
+        for platform_key, candidate in job.stream():
+            if platform_key not in streamed:
+                streamed.add(platform_key)
+                copies[platform_key] = []
+            copies[platform_key].append(candidate)
+            with placeholder.container():
+                st.caption("AI 文案生成中...")
+                _render_copies(copies)
+    except Exception as e:
+        st.warning(f"AI 文案生成失败，已使用模板文案: {e}")
+    placeholder.empty()
+    return copies
+
+
+def _progressive_preview(preview_platform: str, n: int):
+    """Return (placeholder, on_candidate) that fills a row of previews as AI candidates arrive."""
+    placeholder = st.empty()
+    cols = placeholder.container().columns(n)
+    shown = []
+
+    def on_candidate(bg_set):
+        if len(shown) < n:
+            cols[len(shown)].image(bg_set[preview_platform], use_container_width=True, caption=f"方案 {len(shown) + 1}")
+        shown.append(bg_set)
+
+    return placeholder, on_candidate
+
+
+def _prefetch_ai_background(product_bytes, product_name, style, sizes, scene_prompt, custom_prompt, ref_image, submit):
+    """Speculative work for the inline flow: background removal + upload, optionally the AI task.
+
+    Returns (rgba_product, candidates); candidates is None unless submit is set.
+    Runs on a worker thread, so it must not touch st.*.
+    """
+    from core.bg_remover import remove_background
+    rgba_product = remove_background(Image.open(io.BytesIO(product_bytes)))
+    if not submit:
+        warm_ai_background_multi(rgba_product, sizes, ref_image)
+        return rgba_product, None
+    candidates = generate_ai_background_multi(
+        product_image=rgba_product,
+        product_name=product_name,
+        style=style,
+        sizes=sizes,
+        scene_prompt=scene_prompt,
+        custom_prompt=custom_prompt,
+        ref_image=ref_image,
+        n=4,
+    )
+    return rgba_product, candidates
+
+
 # --- Input section ---
 input_method = st.radio("商品信息来源", ["在线录入", "批量导入", "从素材库选择"], horizontal=True)
 
@@ -127,11 +229,41 @@ if input_method == "在线录入":
         if use_ai_bg:
             scene_prompt, custom_prompt, ref_image = _render_ai_bg_controls(key_prefix="inline_")
 
+        # Speculative prefetch: start the slow AI background steps once the inputs settle
+        prefetcher = st.session_state.setdefault("inline_prefetcher", Prefetcher())
+        prefetch_signature = None
+        if use_ai_bg:
+            prefetch_ai_bg = st.checkbox("编辑时预取（输入停顿后提前抠图并上传）", value=False, key="inline_prefetch")
+            prefetch_submit = prefetch_ai_bg and st.checkbox(
+                "同时预提交 AI 背景任务（输入未变时点击即可取结果，会消耗 API 额度）",
+                value=False,
+                key="inline_prefetch_submit",
+            )
+            if prefetch_ai_bg and uploaded_file and selected_platforms:
+                product_bytes = uploaded_file.getvalue()
+                prefetch_sizes = _platform_sizes(selected_platforms)
+                prefetch_signature = input_signature(
+                    product_bytes, template_style, tuple(sorted(prefetch_sizes.items())),
+                    scene_prompt, custom_prompt,
+                    ref_image.tobytes() if ref_image is not None else None,
+                    prefetch_submit,
+                )
+                prefetcher.schedule(
+                    prefetch_signature,
+                    functools.partial(
+                        _prefetch_ai_background, product_bytes, product_name, template_style,
+                        prefetch_sizes, scene_prompt, custom_prompt, ref_image, prefetch_submit,
+                    ),
+                )
+        if prefetch_signature is None:
+            prefetcher.cancel()
+
         copy_style = st.selectbox(
             "文案风格",
             options=list(COPY_STYLES.keys()),
             format_func=lambda k: COPY_STYLES[k]["label"],
         )
+        copy_fresh = st.checkbox("文案换一批（不复用缓存结果）", value=False, key="inline_copy_fresh")
 
         # Logo upload
         logo_file = st.file_uploader("店铺 Logo（可选）", type=["png", "jpg", "jpeg"])
@@ -170,43 +302,64 @@ if input_method == "在线录入":
                     "selected_platforms": selected_platforms,
                     "actual_style": actual_style,
                     "copy_style": copy_style,
+                    "copy_fresh": copy_fresh,
                     "save_to_materials": save_to_materials,
                     "use_ai_bg": use_ai_bg,
                     "template_style": template_style,
                 }
                 st.session_state["gen_product_img"] = product_img
                 st.session_state["gen_logo"] = logo
+                # Copy generation runs alongside background removal, AI backgrounds and rendering
+                st.session_state["gen_copy_job"] = _start_copy_job(st.session_state["gen_context"])
 
                 # AI background candidate generation
                 if use_ai_bg:
                     from core.bg_remover import remove_background
-                    from core.platforms import get_platform_config
-                    platform_cfg = get_platform_config(selected_platforms[0])
-                    canvas_w = platform_cfg["width"]
-                    canvas_h = platform_cfg["height"]
+                    platform_sizes = _platform_sizes(selected_platforms)
+                    bg_fresh = st.session_state.pop("bg_fresh", False)
+
+                    # Attach to prefetched work for these exact inputs, if any
+                    rgba_product, bg_candidates = None, None
+                    prefetched = prefetcher.take(prefetch_signature) if prefetch_signature else None
+                    if prefetched is not None:
+                        with st.spinner("正在等待预取结果..."):
+                            try:
+                                rgba_product, bg_candidates = prefetched.result()
+                            except Exception:
+                                rgba_product, bg_candidates = None, None
+                    if bg_fresh:
+                        bg_candidates = None
 
-                    with st.spinner("正在去除背景..."):
-                        rgba_product = remove_background(product_img)
+                    if rgba_product is None:
+                        with st.spinner("正在去除背景..."):
+                            rgba_product = remove_background(product_img)
 
                     with st.spinner("正在生成 AI 背景候选..."):
                         try:
-                            bg_candidates = generate_ai_background(
-                                product_image=rgba_product,
-                                product_name=product_name,
-                                style=template_style,
-                                width=canvas_w,
-                                height=canvas_h,
-                                scene_prompt=scene_prompt,
-                                custom_prompt=custom_prompt,
-                                ref_image=ref_image,
-                                n=4,
-                            )
+                            # One generation on a master canvas, reframed per platform;
+                            # with DASHSCOPE_MAX_CONCURRENCY >= 4 the candidates fan out and preview as each lands
+                            if bg_candidates is None:
+                                preview, on_candidate = _progressive_preview(selected_platforms[0], 4)
+                                bg_candidates = generate_ai_background_multi(
+                                    product_image=rgba_product,
+                                    product_name=product_name,
+                                    style=template_style,
+                                    sizes=platform_sizes,
+                                    scene_prompt=scene_prompt,
+                                    custom_prompt=custom_prompt,
+                                    ref_image=ref_image,
+                                    n=4,
+                                    fresh=bg_fresh,
+                                    fan_out=True,
+                                    hedge=True,
+                                    on_candidate=on_candidate,
+                                )
+                                preview.empty()
                             st.session_state["bg_candidates"] = bg_candidates
                             st.session_state["bg_gen_params"] = {
                                 "product_name": product_name,
                                 "style": template_style,
-                                "width": canvas_w,
-                                "height": canvas_h,
+                                "sizes": platform_sizes,
                                 "scene_prompt": scene_prompt,
                                 "custom_prompt": custom_prompt,
                             }
@@ -224,18 +377,8 @@ if input_method == "在线录入":
                             template_style=actual_style,
                             logo=logo,
                         )
-                    with st.spinner("正在生成文案..."):
-                        try:
-                            copies = generate_copy(
-                                product_name=product_name,
-                                selling_points=selling_points,
-                                price=price,
-                                platform=selected_platforms[0],
-                                style=copy_style,
-                            )
-                        except Exception as e:
-                            st.error(f"文案生成失败: {e}")
-                            copies = []
+                    # Copy has been generating since the click; candidates not yet in stream in here
+                    copies = _stream_copies(st.session_state.pop("gen_copy_job"))
                     st.session_state["gen_images"] = images
                     st.session_state["gen_copies"] = copies
                     st.session_state["gen_saved"] = False
@@ -243,11 +386,12 @@ if input_method == "在线录入":
         # --- Candidate selection (persists across reruns via session_state) ---
         if "bg_candidates" in st.session_state and st.session_state.get("gen_context", {}).get("use_ai_bg"):
             bg_candidates = st.session_state["bg_candidates"]
+            preview_platform = st.session_state["gen_context"]["selected_platforms"][0]
             st.subheader("选择 AI 背景")
             cols = st.columns(4)
-            for i, bg_img in enumerate(bg_candidates):
+            for i, bg_set in enumerate(bg_candidates):
                 with cols[i]:
-                    st.image(bg_img, use_container_width=True, caption=f"方案 {i+1}")
+                    st.image(bg_set[preview_platform], use_container_width=True, caption=f"方案 {i+1}")
 
             selected_bg_idx = st.radio(
                 "选择背景方案",
@@ -261,6 +405,8 @@ if input_method == "在线录入":
             col_regen, col_confirm = st.columns(2)
             with col_regen:
                 if st.button("🔄 重新生成（点击后请再按一键生成）", key="inline_regenerate"):
+                    # Ask for new variations instead of the cached result
+                    st.session_state["bg_fresh"] = True
                     st.session_state.pop("bg_candidates", None)
                     st.session_state.pop("gen_images", None)
                     st.session_state.pop("gen_copies", None)
@@ -279,20 +425,10 @@ if input_method == "在线录入":
                             template_style=ctx["actual_style"],
                             logo=logo,
                             skip_bg_removal=True,
-                            ai_composed_override=selected_ai_composed,
+                            ai_composed_overrides=selected_ai_composed,
                         )
-                    with st.spinner("正在生成文案..."):
-                        try:
-                            copies = generate_copy(
-                                product_name=product_info["name"],
-                                selling_points=product_info["selling_points"],
-                                price=product_info["price"],
-                                platform=ctx["selected_platforms"][0],
-                                style=ctx["copy_style"],
-                            )
-                        except Exception as e:
-                            st.error(f"文案生成失败: {e}")
-                            copies = []
+                    # Copy has been generating since the click; candidates not yet in stream in here
+                    copies = _stream_copies(st.session_state.pop("gen_copy_job", None) or _start_copy_job(ctx))
                     st.session_state["gen_images"] = images
                     st.session_state["gen_copies"] = copies
                     st.session_state["gen_saved"] = False
@@ -302,7 +438,7 @@ if input_method == "在线录入":
         # --- Display results (persists across reruns) ---
         if "gen_images" in st.session_state:
             images = st.session_state["gen_images"]
-            copies = st.session_state.get("gen_copies", [])
+            copies = st.session_state.get("gen_copies", {})
             ctx = st.session_state.get("gen_context", {})
             product_info = ctx.get("product_info", {})
 
@@ -330,7 +466,7 @@ if input_method == "在线录入":
                         platform=platform_key,
                         copy_style=ctx.get("copy_style", ""),
                         image_path=out_path,
-                        copies=copies,
+                        copies=copies.get(platform_key, []),
                     )
                 st.session_state["gen_saved"] = True
 
@@ -341,12 +477,7 @@ if input_method == "在线录入":
                 st.image(img, use_container_width=True)
 
             if copies:
-                st.subheader("候选文案")
-                for i, copy_item in enumerate(copies):
-                    with st.expander(f"文案方案 {i + 1}", expanded=True):
-                        st.markdown(f"**标题：** {copy_item.get('title', '')}")
-                        for sp in copy_item.get("selling_points", []):
-                            st.markdown(f"- {sp}")
+                _render_copies(copies)
 
             st.subheader("下载")
             zip_buffer = io.BytesIO()
@@ -356,14 +487,7 @@ if input_method == "在线录入":
                     img.save(img_buffer, format="PNG")
                     zf.writestr(f"{platform_key}_main.png", img_buffer.getvalue())
                 if copies:
-                    copy_text = ""
-                    for i, copy_item in enumerate(copies):
-                        copy_text += f"=== 文案方案 {i + 1} ===\n"
-                        copy_text += f"标题：{copy_item.get('title', '')}\n"
-                        for sp in copy_item.get("selling_points", []):
-                            copy_text += f"- {sp}\n"
-                        copy_text += "\n"
-                    zf.writestr("copy.txt", copy_text)
+                    zf.writestr("copy.txt", format_copy_text(copies))
 
             zip_buffer.seek(0)
             st.download_button(
@@ -427,6 +551,8 @@ elif input_method == "批量导入":
         format_func=lambda k: COPY_STYLES[k]["label"],
         key="batch_copy_style",
     )
+    batch_copy_offline = st.checkbox("离线文案（按模板即时生成，不调用 DeepSeek）", value=False, key="batch_copy_offline")
+    batch_save = st.checkbox("保存到素材库和历史记录", value=False, key="batch_save")
 
     if st.button("🚀 批量生成", type="primary"):
         if not excel_file or not zip_file or not batch_platforms:
@@ -447,65 +573,115 @@ elif input_method == "批量导入":
                     if name.lower().endswith((".png", ".jpg", ".jpeg")):
                         image_map[os.path.basename(name)] = z.read(name)
 
+            rows = []
+            for _, row in df.iterrows():
+                name = str(row.get("商品名称", row.iloc[0]))
+                sps = []
+                for j in range(1, 4):
+                    col_name = f"卖点{j}"
+                    val = row.get(col_name, None)
+                    if val is not None and str(val) != "nan":
+                        sps.append(str(val))
+                price_val = float(row.get("价格", 0))
+                img_name = str(row.get("图片文件名", ""))
+                if img_name in image_map:
+                    rows.append({"name": name, "selling_points": sps, "price": price_val, "img_name": img_name})
+
             progress = st.progress(0)
             all_results = io.BytesIO()
-            with zf_mod.ZipFile(all_results, "w") as out_zip:
-                for idx, row in df.iterrows():
-                    progress.progress((idx + 1) / len(df))
-                    name = str(row.get("商品名称", row.iloc[0]))
-                    sps = []
-                    for j in range(1, 4):
-                        col_name = f"卖点{j}"
-                        val = row.get(col_name, None)
-                        if val is not None and str(val) != "nan":
-                            sps.append(str(val))
-                    price_val = float(row.get("价格", 0))
-                    img_name = str(row.get("图片文件名", ""))
-
-                    if img_name in image_map:
-                        product_img = Image.open(io.BytesIO(image_map[img_name]))
-                        product_info_batch = {
+            copy_failures = 0
+            # Rows to persist once the batch is done, in two bulk inserts
+            batch_materials, batch_history = [], []
+            upload_dir = os.path.join(os.path.dirname(__file__), "..", "data", "uploads")
+            output_dir = os.path.join(os.path.dirname(__file__), "..", "data", "outputs")
+            if batch_save:
+                os.makedirs(upload_dir, exist_ok=True)
+                os.makedirs(output_dir, exist_ok=True)
+            # Batch rows queue behind interactive requests at the provider governors
+            with rate_limiter.priority(rate_limiter.BATCH), zf_mod.ZipFile(all_results, "w") as out_zip:
+                # Copy for every row runs concurrently in the background while images render;
+                # results come back in row order
+                copy_results = generate_copy_batch(rows, batch_platforms, batch_copy_style, offline=batch_copy_offline)
+                for idx, row_info in enumerate(rows):
+                    progress.progress((idx + 1) / len(rows))
+                    name = row_info["name"]
+                    product_img = Image.open(io.BytesIO(image_map[row_info["img_name"]]))
+                    product_info_batch = {
+                        "name": name,
+                        "selling_points": row_info["selling_points"],
+                        "price": row_info["price"],
+                        "scene_prompt": batch_scene_prompt,
+                        "custom_prompt": batch_custom_prompt,
+                    }
+                    batch_actual_style = f"ai_{batch_style}" if batch_ai_bg else batch_style
+
+                    # For AI bg: early removal + v2 composed override
+                    batch_composed = None
+                    if batch_ai_bg:
+                        from core.bg_remover import remove_background
+                        rgba_product = remove_background(product_img)
+                        try:
+                            # One generation per product, reframed for every platform
+                            candidates = generate_ai_background_multi(
+                                product_image=rgba_product,
+                                product_name=name,
+                                style=batch_style,
+                                sizes=_platform_sizes(batch_platforms),
+                                scene_prompt=batch_scene_prompt,
+                                custom_prompt=batch_custom_prompt,
+                                ref_image=batch_ref_image,
+                                n=1,
+                            )
+                            batch_composed = candidates[0]
+                        except Exception:
+                            pass
+
+                    images = compose_images(
+                        product_img, product_info_batch, batch_platforms, batch_actual_style,
+                        skip_bg_removal=True if batch_composed else False,
+                        ai_composed_overrides=batch_composed,
+                        # Don't let a retry of a failed AI background stall the batch
+                        ai_deadline=BATCH_AI_FALLBACK_DEADLINE,
+                    )
+                    for pk, img in images.items():
+                        buf = io.BytesIO()
+                        img.save(buf, format="PNG")
+                        out_zip.writestr(f"{name}/{pk}_main.png", buf.getvalue())
+
+                    _, copies, copy_error = next(copy_results)
+                    if copies:
+                        out_zip.writestr(f"{name}/copy.txt", format_copy_text(copies))
+                    if copy_error is not None:
+                        copy_failures += 1
+
+                    if batch_save:
+                        img_save_path = os.path.join(upload_dir, f"{name}_{id(product_img)}.png")
+                        product_img.save(img_save_path)
+                        batch_materials.append({
                             "name": name,
-                            "selling_points": sps,
-                            "price": price_val,
-                            "scene_prompt": batch_scene_prompt,
-                            "custom_prompt": batch_custom_prompt,
-                        }
-                        batch_actual_style = f"ai_{batch_style}" if batch_ai_bg else batch_style
-
-                        # For AI bg: early removal + v2 composed override
-                        batch_composed = None
-                        if batch_ai_bg:
-                            from core.bg_remover import remove_background
-                            from core.platforms import get_platform_config
-                            platform_cfg = get_platform_config(batch_platforms[0])
-                            rgba_product = remove_background(product_img)
-                            try:
-                                candidates = generate_ai_background(
-                                    product_image=rgba_product,
-                                    product_name=name,
-                                    style=batch_style,
-                                    width=platform_cfg["width"],
-                                    height=platform_cfg["height"],
-                                    scene_prompt=batch_scene_prompt,
-                                    custom_prompt=batch_custom_prompt,
-                                    ref_image=batch_ref_image,
-                                    n=1,
-                                )
-                                batch_composed = candidates[0]
-                            except Exception:
-                                pass
-
-                        images = compose_images(
-                            product_img, product_info_batch, batch_platforms, batch_actual_style,
-                            skip_bg_removal=True if batch_composed else False,
-                            ai_composed_override=batch_composed,
-                        )
+                            "selling_points": row_info["selling_points"],
+                            "price": row_info["price"],
+                            "image_path": img_save_path,
+                        })
                         for pk, img in images.items():
-                            buf = io.BytesIO()
-                            img.save(buf, format="PNG")
-                            out_zip.writestr(f"{name}/{pk}_main.png", buf.getvalue())
-
+                            out_path = os.path.join(output_dir, f"{name}_{pk}.png")
+                            img.save(out_path)
+                            batch_history.append({
+                                "material_index": len(batch_materials) - 1,
+                                "template_name": batch_style,
+                                "platform": pk,
+                                "copy_style": batch_copy_style,
+                                "image_path": out_path,
+                                "copies": copies.get(pk, []),
+                            })
+
+            if copy_failures:
+                st.warning(f"{copy_failures} 个商品的文案生成失败，压缩包中未包含其 copy.txt")
+            if batch_materials:
+                db = Database()
+                material_ids = db.save_materials_bulk(batch_materials)
+                db.save_history_bulk(batch_history, material_ids=material_ids)
+                st.success(f"已保存 {len(material_ids)} 个商品到素材库，{len(batch_history)} 条生成记录")
             all_results.seek(0)
             st.download_button(
                 "📦 下载全部结果",
@@ -560,6 +736,7 @@ elif input_method == "从素材库选择":
             format_func=lambda k: COPY_STYLES[k]["label"],
             key="mat_copy_style",
         )
+        mat_copy_fresh = st.checkbox("文案换一批（不复用缓存结果）", value=False, key="mat_copy_fresh")
 
         if st.button("🚀 一键生成", type="primary", key="mat_generate"):
             # Clear previous generation state
@@ -588,35 +765,41 @@ elif input_method == "从素材库选择":
                     "selected_platforms": mat_platforms,
                     "actual_style": mat_actual_style,
                     "copy_style": mat_copy_style,
+                    "copy_fresh": mat_copy_fresh,
                     "mat_id": selected_mat["id"],
                     "use_ai_bg": mat_ai_bg,
                     "template_style": mat_template_style,
                 }
                 st.session_state["mat_gen_product_img"] = product_img
+                # Copy generation runs alongside background removal, AI backgrounds and rendering
+                st.session_state["mat_gen_copy_job"] = _start_copy_job(st.session_state["mat_gen_context"])
 
                 if mat_ai_bg:
                     from core.bg_remover import remove_background
-                    from core.platforms import get_platform_config
-                    platform_cfg = get_platform_config(mat_platforms[0])
-                    canvas_w = platform_cfg["width"]
-                    canvas_h = platform_cfg["height"]
 
                     with st.spinner("正在去除背景..."):
                         rgba_product = remove_background(product_img)
 
                     with st.spinner("正在生成 AI 背景候选..."):
                         try:
-                            bg_candidates = generate_ai_background(
+                            # One generation on a master canvas, reframed per platform;
+                            # with DASHSCOPE_MAX_CONCURRENCY >= 4 the candidates fan out and preview as each lands
+                            preview, on_candidate = _progressive_preview(mat_platforms[0], 4)
+                            bg_candidates = generate_ai_background_multi(
                                 product_image=rgba_product,
                                 product_name=selected_mat["name"],
                                 style=mat_template_style,
-                                width=canvas_w,
-                                height=canvas_h,
+                                sizes=_platform_sizes(mat_platforms),
                                 scene_prompt=mat_scene_prompt,
                                 custom_prompt=mat_custom_prompt,
                                 ref_image=mat_ref_image,
                                 n=4,
+                                fresh=st.session_state.pop("mat_bg_fresh", False),
+                                fan_out=True,
+                                hedge=True,
+                                on_candidate=on_candidate,
                             )
+                            preview.empty()
                             st.session_state["mat_bg_candidates"] = bg_candidates
                         except Exception as e:
                             st.warning(f"AI 背景生成失败，将使用模板默认背景: {e}")
@@ -631,18 +814,8 @@ elif input_method == "从素材库选择":
                             platforms=mat_platforms,
                             template_style=mat_actual_style,
                         )
-                    with st.spinner("正在生成文案..."):
-                        try:
-                            gen_copies = generate_copy(
-                                product_name=selected_mat["name"],
-                                selling_points=selected_mat.get("selling_points", []),
-                                price=selected_mat["price"],
-                                platform=mat_platforms[0],
-                                style=mat_copy_style,
-                            )
-                        except Exception as e:
-                            st.error(f"文案生成失败: {e}")
-                            gen_copies = []
+                    # Copy has been generating since the click; candidates not yet in stream in here
+                    gen_copies = _stream_copies(st.session_state.pop("mat_gen_copy_job"))
                     st.session_state["mat_gen_images"] = gen_images
                     st.session_state["mat_gen_copies"] = gen_copies
                     st.session_state["mat_gen_saved"] = False
@@ -650,11 +823,12 @@ elif input_method == "从素材库选择":
         # --- Candidate selection (persists across reruns via session_state) ---
         if "mat_bg_candidates" in st.session_state and st.session_state.get("mat_gen_context", {}).get("use_ai_bg"):
             bg_candidates = st.session_state["mat_bg_candidates"]
+            preview_platform = st.session_state["mat_gen_context"]["selected_platforms"][0]
             st.subheader("选择 AI 背景")
             cols = st.columns(4)
-            for i, bg_img in enumerate(bg_candidates):
+            for i, bg_set in enumerate(bg_candidates):
                 with cols[i]:
-                    st.image(bg_img, use_container_width=True, caption=f"方案 {i+1}")
+                    st.image(bg_set[preview_platform], use_container_width=True, caption=f"方案 {i+1}")
 
             selected_bg_idx = st.radio(
                 "选择背景方案",
@@ -668,6 +842,8 @@ elif input_method == "从素材库选择":
             col_regen, col_confirm = st.columns(2)
             with col_regen:
                 if st.button("🔄 重新生成（点击后请再按一键生成）", key="mat_regenerate"):
+                    # Ask for new variations instead of the cached result
+                    st.session_state["mat_bg_fresh"] = True
                     st.session_state.pop("mat_bg_candidates", None)
                     st.session_state.pop("mat_gen_images", None)
                     st.session_state.pop("mat_gen_copies", None)
@@ -684,20 +860,10 @@ elif input_method == "从素材库选择":
                             platforms=ctx["selected_platforms"],
                             template_style=ctx["actual_style"],
                             skip_bg_removal=True,
-                            ai_composed_override=selected_ai_composed,
+                            ai_composed_overrides=selected_ai_composed,
                         )
-                    with st.spinner("正在生成文案..."):
-                        try:
-                            gen_copies = generate_copy(
-                                product_name=product_info["name"],
-                                selling_points=product_info.get("selling_points", []),
-                                price=product_info["price"],
-                                platform=ctx["selected_platforms"][0],
-                                style=ctx["copy_style"],
-                            )
-                        except Exception as e:
-                            st.error(f"文案生成失败: {e}")
-                            gen_copies = []
+                    # Copy has been generating since the click; candidates not yet in stream in here
+                    gen_copies = _stream_copies(st.session_state.pop("mat_gen_copy_job", None) or _start_copy_job(ctx))
                     st.session_state["mat_gen_images"] = gen_images
                     st.session_state["mat_gen_copies"] = gen_copies
                     st.session_state["mat_gen_saved"] = False
@@ -707,7 +873,7 @@ elif input_method == "从素材库选择":
         # --- Display results (persists across reruns) ---
         if "mat_gen_images" in st.session_state:
             gen_images = st.session_state["mat_gen_images"]
-            gen_copies = st.session_state.get("mat_gen_copies", [])
+            gen_copies = st.session_state.get("mat_gen_copies", {})
             ctx = st.session_state.get("mat_gen_context", {})
 
             # Save history (only once per generation)
@@ -724,7 +890,7 @@ elif input_method == "从素材库选择":
                         platform=pk,
                         copy_style=ctx.get("copy_style", ""),
                         image_path=out_path,
-                        copies=gen_copies,
+                        copies=gen_copies.get(pk, []),
                     )
                 st.session_state["mat_gen_saved"] = True
 
@@ -734,12 +900,7 @@ elif input_method == "从素材库选择":
                 st.image(img, use_container_width=True)
 
             if gen_copies:
-                st.subheader("候选文案")
-                for i, ci in enumerate(gen_copies):
-                    with st.expander(f"文案方案 {i + 1}", expanded=True):
-                        st.markdown(f"**标题：** {ci.get('title', '')}")
-                        for sp in ci.get("selling_points", []):
-                            st.markdown(f"- {sp}")
+                _render_copies(gen_copies)
 
             # Download
             zip_buffer = io.BytesIO()
@@ -748,5 +909,7 @@ elif input_method == "从素材库选择":
                     buf = io.BytesIO()
                     img.save(buf, format="PNG")
                     zf.writestr(f"{pk}_main.png", buf.getvalue())
+                if gen_copies:
+                    zf.writestr("copy.txt", format_copy_text(gen_copies))
             zip_buffer.seek(0)
             st.download_button("📦 下载全部", data=zip_buffer, file_name=f"{ctx.get('product_info', {}).get('name', 'product')}_outputs.zip", mime="application/zip")
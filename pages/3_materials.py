@@ -10,17 +10,26 @@ st.title("素材库")
 db = Database()
 
 # Search bar
-search_query = st.text_input("🔍 搜索商品", placeholder="输入商品名称关键词...")
+search_query = st.text_input("🔍 搜索商品", placeholder="输入商品名称或卖点关键词，多个关键词用空格分隔...")
 
+# Keyset pagination for the full listing: a stack of cursors, one per page visited
+cursors = st.session_state.setdefault("material_cursors", [None])
+next_cursor = None
 if search_query:
     materials = db.search_materials(search_query)
 else:
-    materials = db.list_materials()
+    materials, next_cursor = db.list_materials_page(after=cursors[-1])
+    if not materials and len(cursors) > 1:
+        # Everything on this page was deleted; step back
+        cursors.pop()
+        st.rerun()
 
 if not materials:
     st.info("素材库为空，在生成页面勾选「保存到素材库」即可添加商品素材")
+elif search_query:
+    st.caption(f"找到 {len(materials)} 个匹配商品（按相关度排序）")
 else:
-    st.caption(f"共 {len(materials)} 个商品素材")
+    st.caption(f"第 {len(cursors)} 页 · 本页 {len(materials)} 个商品素材")
 
     cols = st.columns(3)
     for i, mat in enumerate(materials):
@@ -67,3 +76,14 @@ else:
                         )
                         del st.session_state[f"editing_mat_{mat['id']}"]
                         st.rerun()
+
+    if not search_query:
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if len(cursors) > 1 and st.button("上一页"):
+                cursors.pop()
+                st.rerun()
+        with col_next:
+            if next_cursor is not None and st.button("下一页"):
+                cursors.append(next_cursor)
+                st.rerun()
@@ -1,19 +1,56 @@
 # pages/4_history.py
 import streamlit as st
+import datetime
 import os
 from PIL import Image
+from core.platforms import PLATFORMS
 from data.db import Database
 
 st.set_page_config(page_title="历史记录", layout="wide")
 st.title("历史记录")
 
 db = Database()
-history = db.list_history(limit=100)
+
+# --- Filters ---
+col_platform, col_template, col_dates = st.columns([1, 1, 2])
+with col_platform:
+    filter_platform = st.selectbox(
+        "平台",
+        options=[""] + list(PLATFORMS.keys()),
+        format_func=lambda k: PLATFORMS[k]["label"] if k else "全部平台",
+    )
+with col_template:
+    filter_template = st.text_input("模板", placeholder="模板名称（精确匹配）").strip()
+with col_dates:
+    date_range = st.date_input("生成日期", value=(), help="选择起止日期，留空表示不限")
+
+since = until = None
+if len(date_range) == 2:
+    since = date_range[0].isoformat()
+    until = (date_range[1] + datetime.timedelta(days=1)).isoformat()
+
+# Keyset pagination: a stack of cursors, one per page visited; filters reset it
+filters = (filter_platform, filter_template, since, until)
+if st.session_state.get("history_filters") != filters:
+    st.session_state["history_filters"] = filters
+    st.session_state["history_cursors"] = [None]
+cursors = st.session_state["history_cursors"]
+
+history, next_cursor = db.list_history_page(
+    after=cursors[-1],
+    platform=filter_platform or None,
+    template_name=filter_template or None,
+    since=since,
+    until=until,
+)
+
+# Materials behind this page's records, for "重新生成": one query, not one per record
+materials = db.get_materials(record["material_id"] for record in history)
 
 if not history:
     st.info("暂无生成记录")
 else:
-    st.caption(f"共 {len(history)} 条记录")
+    st.caption(f"第 {len(cursors)} 页 · 本页 {len(history)} 条记录")
 
     for record in history:
         with st.container(border=True):
@@ -49,9 +86,17 @@ else:
                         )
 
                 # Re-generate
-                mat_id = record.get("material_id")
-                if mat_id:
-                    mat = db.get_material(mat_id)
-                    if mat and st.button("重新生成", key=f"regen_{record['id']}"):
-                        st.session_state["prefill_material"] = mat
-                        st.switch_page("pages/1_generate.py")
+                mat = materials.get(record.get("material_id"))
+                if mat and st.button("重新生成", key=f"regen_{record['id']}"):
+                    st.session_state["prefill_material"] = mat
+                    st.switch_page("pages/1_generate.py")
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("上一页"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if next_cursor is not None and st.button("下一页"):
+            cursors.append(next_cursor)
+            st.rerun()
@@ -2,6 +2,10 @@ import pytest
 from PIL import Image
 import os
 
+from core.rate_limiter import reset_governors
+from core.result_cache import BlobCache
+from data.db import Database
+
 FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
 
 
@@ -16,3 +20,35 @@ def sample_product_image():
     path = os.path.join(FIXTURES_DIR, "test_product.png")
     img.save(path)
     return path
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Point the AI background result cache at a per-test temp directory."""
+    cache = BlobCache(str(tmp_path / "ai_backgrounds"), 64 * 1024 * 1024)
+    monkeypatch.setattr("core.bg_generator._result_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_task_journal(tmp_path, monkeypatch):
+    """Give each test its own AI task journal database."""
+    db = Database(str(tmp_path / "journal.db"))
+    monkeypatch.setattr("core.bg_generator._journal_db", db)
+    yield db
+    db.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_copy_cache(isolated_task_journal, monkeypatch):
+    """Keep copy responses cached in the per-test database."""
+    monkeypatch.setattr("core.copy_generator._cache_db", isolated_task_journal)
+    return isolated_task_journal
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_governors():
+    """Start every test with full provider token buckets."""
+    reset_governors()
+    yield
+    reset_governors()
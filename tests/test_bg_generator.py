@@ -6,18 +6,37 @@ from unittest.mock import MagicMock, patch
 import pytest
 from PIL import Image
 
+from core import metrics
 from core.bg_generator import (
     SCENE_PRESETS,
     STYLE_PROMPTS,
     STYLE_HINTS,
+    clear_feather_cache,
+    clear_upload_cache,
     generate_ai_background,
+    generate_ai_background_multi,
     get_scene_presets,
+    plan_master_canvas,
+    reframe,
+    warm_ai_background_multi,
+    _feathered_product,
+    _prepare_ref_image,
     _save_rgba_to_temp,
+    _upload_image,
 )
 
 MOCK_OSS_URL = "https://oss.example.com/uploaded_image.png"
 
 
+@pytest.fixture(autouse=True)
+def _fresh_upload_cache():
+    clear_upload_cache()
+    clear_feather_cache()
+    metrics.reset()
+    yield
+    clear_upload_cache()
+
+
 class TestStylePrompts:
     def test_all_styles_have_prompts(self):
         for style in ["promo", "minimal", "premium", "fresh", "social"]:
@@ -386,3 +405,382 @@ class TestGenerateAiBackground:
         # Should use short hint, not full scene description
         assert "高端" in prompt
         assert "岩板台面" not in prompt
+
+
+@patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+class TestUploadCache:
+    def test_identical_image_uploaded_once(self, mock_upload):
+        img = Image.new("RGBA", (64, 64), (10, 20, 30, 255))
+        first = _upload_image(img, "key")
+        second = _upload_image(img.copy(), "key")
+
+        assert first[0] == second[0] == MOCK_OSS_URL
+        assert first[1] > 0 and second[1] == 0
+        assert mock_upload.call_count == 1
+        assert metrics.get_counter("oss_upload.misses") == 1
+        assert metrics.get_counter("oss_upload.hits") == 1
+        assert metrics.get_counter("oss_upload.bytes_saved") > 0
+
+    def test_different_content_or_account_uploads_again(self, mock_upload):
+        img = Image.new("RGBA", (64, 64), (10, 20, 30, 255))
+        _upload_image(img, "key")
+        _upload_image(Image.new("RGBA", (64, 64), (0, 0, 0, 0)), "key")
+        _upload_image(img, "other-key")
+        assert mock_upload.call_count == 3
+
+    def test_expired_entry_is_reuploaded(self, mock_upload):
+        img = Image.new("RGBA", (64, 64), (10, 20, 30, 255))
+        with patch("core.bg_generator.time.monotonic", return_value=0):
+            _upload_image(img, "key")
+        with patch("core.bg_generator.time.monotonic", return_value=48 * 3600):
+            _upload_image(img, "key")
+        assert mock_upload.call_count == 2
+
+    def test_failed_upload_not_cached(self, mock_upload):
+        img = Image.new("RGBA", (64, 64), (10, 20, 30, 255))
+        mock_upload.side_effect = [RuntimeError("AI背景生成失败: 图片上传 OSS 失败"), MOCK_OSS_URL]
+        with pytest.raises(RuntimeError):
+            _upload_image(img, "key")
+        assert _upload_image(img, "key")[0] == MOCK_OSS_URL
+        assert mock_upload.call_count == 2
+
+    @patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+    @patch("core.bg_generator.requests.get")
+    @patch("core.bg_generator.requests.post")
+    def test_batch_rows_share_ref_image_upload(self, mock_post, mock_get, mock_upload):
+        """Same ref image across rows is uploaded once; each distinct product once."""
+        mock_post.return_value = _mock_submit_response()
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ] * 2
+
+        ref_img = Image.new("RGB", (200, 200), (0, 100, 200))
+        generate_ai_background(_make_product_image(), "商品A", "promo", 800, 800, ref_image=ref_img)
+        generate_ai_background(_make_product_image(300, 400), "商品B", "promo", 800, 800, ref_image=ref_img)
+
+        # 2 distinct product canvases + 1 shared reference image
+        assert mock_upload.call_count == 3
+
+
+class TestUploadPreparation:
+    def test_large_ref_image_capped(self):
+        ref = Image.new("RGBA", (4000, 3000), (0, 100, 200, 255))
+        prepared = _prepare_ref_image(ref)
+        assert prepared.mode == "RGB"
+        assert max(prepared.size) == 1024
+        assert prepared.size == (1024, 768)
+
+    def test_transparent_ref_image_flattened_onto_white(self):
+        ref = Image.new("RGBA", (100, 100), (0, 0, 0, 0))
+        ref.paste((200, 30, 30, 255), (25, 25, 75, 75))
+        prepared = _prepare_ref_image(ref)
+        assert prepared.mode == "RGB"
+        assert prepared.getpixel((5, 5)) == (255, 255, 255)
+        assert prepared.getpixel((50, 50)) == (200, 30, 30)
+
+    def test_small_ref_image_untouched(self):
+        ref = Image.new("RGB", (300, 200), (0, 100, 200))
+        assert _prepare_ref_image(ref).size == (300, 200)
+
+    @patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+    def test_ref_image_uploaded_as_jpeg(self, mock_upload):
+        suffixes = []
+        mock_upload.side_effect = lambda path, key: suffixes.append(os.path.splitext(path)[1]) or MOCK_OSS_URL
+        _upload_image(Image.new("RGB", (64, 64), (1, 2, 3)), "key")
+        _upload_image(Image.new("RGBA", (64, 64), (1, 2, 3, 0)), "key")
+        assert suffixes == [".jpg", ".png"]
+
+    @patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+    @patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+    @patch("core.bg_generator.requests.get")
+    @patch("core.bg_generator.requests.post")
+    def test_upload_bytes_and_latency_recorded(self, mock_post, mock_get, mock_upload):
+        mock_post.return_value = _mock_submit_response()
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ]
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        assert metrics.summarize("ai_bg.upload_bytes")["count"] == 1
+        assert metrics.summarize("ai_bg.upload_bytes")["max"] > 0
+        assert metrics.summarize("ai_bg.upload_seconds")["count"] == 1
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+@patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+@patch("core.bg_generator.requests.get")
+@patch("core.bg_generator.requests.post")
+class TestResultCache:
+    def _arm(self, mock_post, mock_get, rounds=1):
+        mock_post.return_value = _mock_submit_response()
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ] * rounds
+
+    def test_identical_inputs_reuse_raw_results(self, mock_post, mock_get, mock_upload):
+        self._arm(mock_post, mock_get)
+        first = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        second = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert mock_post.call_count == 1
+        assert first[0].tobytes() == second[0].tobytes()
+        assert metrics.hit_rate("ai_bg_cache") == 0.5
+
+    def test_changed_inputs_miss(self, mock_post, mock_get, mock_upload):
+        self._arm(mock_post, mock_get, rounds=3)
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        generate_ai_background(_make_product_image(), "商品", "premium", 800, 800)
+        generate_ai_background(_make_product_image(), "商品", "promo", 750, 352)
+        assert mock_post.call_count == 3
+
+    def test_fresh_bypasses_cache(self, mock_post, mock_get, mock_upload):
+        self._arm(mock_post, mock_get, rounds=2)
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800, fresh=True)
+        assert mock_post.call_count == 2
+        assert metrics.get_counter("ai_bg_cache.bypass") == 1
+
+    def test_cache_hit_skips_upload(self, mock_post, mock_get, mock_upload, isolated_result_cache):
+        self._arm(mock_post, mock_get)
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        clear_upload_cache()
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        assert mock_upload.call_count == 1
+        assert isolated_result_cache.total_bytes() > 0
+
+    def test_partial_fan_out_not_cached(self, mock_post, mock_get, mock_upload, isolated_result_cache):
+        # One of the two single-image tasks failed
+        with patch("core.bg_generator._iter_fanned_out", return_value=iter([_make_result_image()])):
+            result = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800, n=2, fan_out=True)
+
+        assert len(result) == 1
+        assert isolated_result_cache.total_bytes() == 0
+
+
+class TestFeatheredBlend:
+    def _product(self):
+        product = Image.new("RGBA", (120, 120), (0, 0, 0, 0))
+        product.paste(Image.new("RGBA", (80, 80), (200, 40, 40, 255)), (20, 20))
+        return product
+
+    def test_mask_reused_across_calls(self):
+        first = _feathered_product(self._product())
+        second = _feathered_product(self._product())
+        assert first[1] is second[1]
+        assert metrics.get_counter("feather_cache.hits") == 1
+        assert metrics.get_counter("feather_cache.misses") == 1
+
+    def test_matches_alpha_composite_blend(self):
+        from PIL import ImageFilter
+
+        product = self._product()
+        scene = Image.new("RGB", (200, 200), (30, 90, 160))
+
+        alpha = product.getchannel("A").filter(ImageFilter.MinFilter(3)).filter(ImageFilter.GaussianBlur(3))
+        feathered = product.copy()
+        feathered.putalpha(alpha)
+        expected = scene.convert("RGBA")
+        expected.alpha_composite(feathered, (40, 40))
+
+        product_rgb, mask = _feathered_product(product)
+        actual = scene.copy()
+        actual.paste(product_rgb, (40, 40), mask)
+        assert actual.tobytes() == expected.convert("RGB").tobytes()
+
+    def test_settings_change_mask(self):
+        _, default = _feathered_product(self._product())
+        _, hard = _feathered_product(self._product(), feather_radius=0, matte_contract=0)
+        assert hard.tobytes() == self._product().getchannel("A").tobytes()
+        assert default.tobytes() != hard.tobytes()
+
+    def test_opaque_product_has_no_mask(self):
+        product_rgb, mask = _feathered_product(Image.new("RGB", (50, 50), (1, 2, 3)))
+        assert mask is None
+        assert product_rgb.mode == "RGB"
+
+
+class TestMultiAspect:
+    SIZES = {"taobao": (800, 800), "pinduoduo": (750, 352), "xiaohongshu": (1080, 1440)}
+
+    def test_single_target_matches_per_platform_canvas(self):
+        master, scale, frames = plan_master_canvas((400, 400), {"taobao": (800, 800)})
+        assert master == (800, 800)
+        assert frames["taobao"] == (800, 800)
+        assert scale == pytest.approx(1.2)
+
+    def test_master_covers_every_frame(self):
+        master, _, frames = plan_master_canvas((400, 300), self.SIZES)
+        assert max(master) <= 2048
+        for key, (fw, fh) in frames.items():
+            assert fw <= master[0] and fh <= master[1]
+            w, h = self.SIZES[key]
+            assert fw / fh == pytest.approx(w / h, rel=0.01)
+
+    def test_reframe_keeps_product_inside_crop(self):
+        img = Image.new("RGB", (1000, 600), (255, 255, 255))
+        bbox = (850, 250, 950, 350)
+        out = reframe(img, (400, 400), (200, 200), bbox)
+        assert out.size == (200, 200)
+        # Crop clamped to the right edge still contains the product box
+        left = min(max(900 - 200, 0), 1000 - 400)
+        assert left <= bbox[0] and bbox[2] <= left + 400
+
+    @patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+    @patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+    @patch("core.bg_generator.requests.get")
+    @patch("core.bg_generator.requests.post")
+    def test_one_task_for_all_platforms(self, mock_post, mock_get, mock_upload):
+        mock_post.return_value = _mock_submit_response()
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=2),
+            _mock_image_download(_make_result_image(2048, 1000)),
+            _mock_image_download(_make_result_image(2048, 1000)),
+        ]
+
+        result = generate_ai_background_multi(_make_product_image(), "商品", "promo", self.SIZES, n=2)
+
+        assert mock_post.call_count == 1
+        assert len(result) == 2
+        for candidate in result:
+            assert {k: img.size for k, img in candidate.items()} == self.SIZES
+            assert all(img.mode == "RGB" for img in candidate.values())
+
+    @patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+    @patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+    @patch("core.bg_generator.requests.get")
+    @patch("core.bg_generator.requests.post")
+    def test_warm_uploads_the_same_canvas(self, mock_post, mock_get, mock_upload):
+        mock_post.return_value = _mock_submit_response()
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image(2048, 1000)),
+        ]
+
+        assert warm_ai_background_multi(_make_product_image(), self.SIZES) > 0
+        mock_post.assert_not_called()
+        generate_ai_background_multi(_make_product_image(), "商品", "promo", self.SIZES)
+
+        # The generate call found the prefetched upload
+        assert mock_upload.call_count == 1
+        assert metrics.get_counter("oss_upload.hits") == 1
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+@patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+@patch("core.bg_generator.requests.get")
+@patch("core.bg_generator.requests.post")
+class TestTaskJournal:
+    def test_timed_out_task_resumed_on_next_request(self, mock_post, mock_get, mock_upload, isolated_task_journal):
+        mock_post.return_value = _mock_submit_response("task-lost")
+        with patch("core.bg_generator.MAX_POLL_TIME", 0):
+            with pytest.raises(RuntimeError, match="超时"):
+                generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        assert isolated_task_journal.get_ai_task("task-lost")["status"] == "PENDING"
+
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ]
+        result = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert len(result) == 1
+        assert mock_post.call_count == 1
+        assert "task-lost" in mock_get.call_args_list[0].args[0]
+        assert isolated_task_journal.get_ai_task("task-lost")["status"] == "CLAIMED"
+
+    def test_finished_unclaimed_task_downloaded_without_polling(self, mock_post, mock_get, mock_upload, isolated_task_journal):
+        mock_post.return_value = _mock_submit_response("task-done")
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            RuntimeError("browser refreshed during download"),
+        ]
+        with pytest.raises(RuntimeError):
+            generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        assert isolated_task_journal.get_ai_task("task-done")["status"] == "SUCCEEDED"
+
+        mock_get.side_effect = [_mock_image_download(_make_result_image())]
+        result = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert len(result) == 1
+        assert mock_post.call_count == 1
+        assert metrics.get_counter("ai_task_journal.resumed") == 1
+
+    def test_failed_task_not_resumed(self, mock_post, mock_get, mock_upload, isolated_task_journal):
+        mock_post.side_effect = [_mock_submit_response("task-1"), _mock_submit_response("task-2")]
+        mock_get.side_effect = [
+            _mock_poll_response("FAILED"),
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ]
+        with pytest.raises(RuntimeError, match="AI背景生成失败"):
+            generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert mock_post.call_count == 2
+        assert isolated_task_journal.get_ai_task("task-1")["status"] == "FAILED"
+        assert isolated_task_journal.get_ai_task("task-2")["status"] == "CLAIMED"
+
+    def test_cancelled_task_not_resumed(self, mock_post, mock_get, mock_upload, isolated_task_journal):
+        mock_post.side_effect = [_mock_submit_response("task-gone"), _mock_submit_response("task-new")]
+        with patch("core.bg_generator.MAX_POLL_TIME", 0):
+            with pytest.raises(RuntimeError, match="超时"):
+                generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+        assert isolated_task_journal.get_ai_task("task-gone")["status"] == "PENDING"
+
+        # The journaled task was cancelled meanwhile: submit a new one instead of polling it to timeout
+        mock_get.side_effect = [
+            _mock_poll_response("CANCELED"),
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ]
+        result = generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert len(result) == 1
+        assert mock_post.call_count == 2
+        assert isolated_task_journal.get_ai_task("task-gone")["status"] == "CANCELED"
+        assert isolated_task_journal.get_ai_task("task-new")["status"] == "CLAIMED"
+
+    def test_stopped_poll_cancels_task(self, mock_post, mock_get, mock_upload, isolated_task_journal):
+        import threading
+
+        from core.bg_generator import _poll_result
+
+        isolated_task_journal.save_ai_task("task-slow", "h")
+        mock_get.return_value = _mock_poll_response("PENDING")
+        mock_post.return_value = MagicMock(status_code=200)
+        stop = threading.Event()
+        stop.set()
+
+        with pytest.raises(RuntimeError, match="取消"):
+            _poll_result("task-slow", "test-key", stop)
+
+        assert mock_post.call_args.args[0].endswith("/tasks/task-slow/cancel")
+        assert isolated_task_journal.get_ai_task("task-slow")["status"] == "CANCELED"
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "test-key"})
+@patch("core.bg_generator._upload_to_oss", return_value=MOCK_OSS_URL)
+@patch("core.bg_generator.requests.get")
+@patch("core.bg_generator.requests.post")
+class TestEndpoints:
+    def test_base_url_from_env_file_used_for_submit_and_poll(self, mock_post, mock_get, mock_upload):
+        os.environ.pop("DASHSCOPE_HTTP_BASE_URL", None)
+
+        def load_env():
+            # What load_dotenv does for a .env containing the override
+            os.environ.setdefault("DASHSCOPE_HTTP_BASE_URL", "http://127.0.0.1:8765/api/v1/")
+
+        mock_post.return_value = _mock_submit_response("task-stub")
+        mock_get.side_effect = [
+            _mock_poll_response("SUCCEEDED", n=1),
+            _mock_image_download(_make_result_image()),
+        ]
+        with patch("core.providers.load_env", side_effect=load_env):
+            generate_ai_background(_make_product_image(), "商品", "promo", 800, 800)
+
+        assert mock_post.call_args.args[0] == (
+            "http://127.0.0.1:8765/api/v1/services/aigc/background-generation/generation/"
+        )
+        assert mock_get.call_args_list[0].args[0] == "http://127.0.0.1:8765/api/v1/tasks/task-stub"
@@ -1,6 +1,18 @@
 # tests/test_copy_generator.py
+import json
 from unittest.mock import patch, MagicMock
-from core.copy_generator import generate_copy, COPY_STYLES
+
+import pytest
+from core import metrics
+from core.copy_generator import (
+    COPY_STYLES,
+    format_copy_text,
+    generate_copy,
+    generate_copy_batch,
+    generate_copy_local,
+    generate_copy_multi,
+    generate_copy_stream,
+)
 
 
 def test_copy_styles_exist():
@@ -47,3 +59,353 @@ def test_generate_copy_with_different_styles():
                 style=style,
             )
             assert len(results) == 2
+
+
+def _mock_copy_response(prompt_tokens=300, completion_tokens=120):
+    response = MagicMock()
+    response.choices = [
+        MagicMock(message=MagicMock(content='{"candidates": [{"title": "T1", "selling_points": ["S1"]}, {"title": "T2", "selling_points": ["S2"]}]}'))
+    ]
+    response.usage = MagicMock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return response
+
+
+class TestCopyCache:
+    def setup_method(self):
+        metrics.reset()
+
+    def test_repeat_request_served_from_cache(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            first = generate_copy("商品", ["好用", "便宜"], 99.9, "taobao", "promo")
+            # Whitespace / empty selling points / price formatting normalize to the same key
+            second = generate_copy(" 商品 ", ["好用 ", "", "便宜"], 99.90, "taobao", "promo")
+
+        assert mock_client.chat.completions.create.call_count == 1
+        assert first == second
+        assert metrics.hit_rate("copy_cache") == 0.5
+        assert metrics.get_counter("copy_cache.tokens_saved") == 420
+
+    def test_different_inputs_miss(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+            generate_copy("商品", ["好用"], 99.9, "douyin", "promo")
+            generate_copy("商品", ["好用"], 89.9, "taobao", "promo")
+        assert mock_client.chat.completions.create.call_count == 3
+
+    def test_fresh_bypasses_cache(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo", fresh=True)
+        assert mock_client.chat.completions.create.call_count == 2
+        assert metrics.get_counter("copy_cache.bypass") == 1
+
+    def test_expired_entries_ignored(self, isolated_copy_cache):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+            isolated_copy_cache.conn.execute("UPDATE copy_cache SET created_at = datetime('now', '-30 days')")
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+        assert mock_client.chat.completions.create.call_count == 2
+
+
+class TestStructuredOutput:
+    def setup_method(self):
+        metrics.reset()
+
+    def _respond(self, content, finish_reason="stop"):
+        response = _mock_copy_response()
+        response.choices = [MagicMock(message=MagicMock(content=content), finish_reason=finish_reason)]
+        return response
+
+    def test_json_mode_and_token_budget(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+            generate_copy("商品", ["好用"], 99.9, "xiaohongshu", "promo")
+        taobao, xhs = (c.kwargs for c in mock_client.chat.completions.create.call_args_list)
+        assert taobao["response_format"] == {"type": "json_object"}
+        # Longer title limit -> larger completion budget
+        assert taobao["max_tokens"] > xhs["max_tokens"] > 0
+
+    def test_truncated_response_salvages_complete_candidates(self, isolated_copy_cache):
+        cut = '{"candidates": [{"title": "T1", "selling_points": ["S1"]}, {"title": "T2", "sel'
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = self._respond(cut, "length")
+            results = generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+        assert results == [{"title": "T1", "selling_points": ["S1"]}]
+        assert metrics.get_counter("copy.truncated") == 1
+        assert metrics.get_counter("copy.repaired") == 1
+        # Repaired results are not cached
+        assert isolated_copy_cache.conn.execute("SELECT COUNT(*) FROM copy_cache").fetchone()[0] == 0
+
+    def test_invalid_candidates_dropped(self):
+        content = '{"candidates": [{"title": "", "selling_points": []}, {"title": " T2 ", "selling_points": ["S2", 3]}]}'
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = self._respond(content)
+            results = generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+        assert results == [{"title": "T2", "selling_points": ["S2", "3"]}]
+
+    def test_unparseable_response_raises(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = self._respond("抱歉，无法生成")
+            with pytest.raises(RuntimeError, match="无法解析"):
+                generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+
+    def test_malformed_later_candidate_keeps_earlier_ones(self):
+        first = '{"title": "T1", "selling_points": ["S1"]}'
+        for content in (
+            '{"candidates": [' + first + ', {"title": b}]}',
+            '{"candidates": [' + first + ', {"title": "T2"]]}',
+            '{"candidates": [' + first + ', {: 1}]}',
+        ):
+            with patch("core.copy_generator.client") as mock_client:
+                mock_client.chat.completions.create.return_value = self._respond(content)
+                assert generate_copy("商品", ["好用"], 99.9, "taobao", "promo") == [
+                    {"title": "T1", "selling_points": ["S1"]}
+                ]
+
+    def test_non_object_response_raises(self):
+        for content in ("[]", '"candidates"'):
+            with patch("core.copy_generator.client") as mock_client:
+                mock_client.chat.completions.create.return_value = self._respond(content)
+                with pytest.raises(RuntimeError, match="无法解析"):
+                    generate_copy("商品", ["好用"], 99.9, "taobao", "promo")
+
+    def test_usage_and_latency_recorded_per_style_and_platform(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response(300, 120)
+            generate_copy("商品", ["好用"], 99.9, "taobao", "seeding")
+        assert metrics.summarize("copy.latency_seconds.seeding.taobao")["count"] == 1
+        assert metrics.summarize("copy.completion_tokens.seeding.taobao")["max"] == 120
+        assert metrics.get_counter("copy.prompt_tokens") == 300
+
+
+class TestLocalCopy:
+    NAME = "超轻便携折叠雨伞自动开合防晒款"
+
+    def test_titles_fit_platform_limits(self):
+        from core.platforms import PLATFORMS
+        for style in COPY_STYLES:
+            for key, cfg in PLATFORMS.items():
+                results = generate_copy_local(self.NAME, ["一键自动开合", "UPF50+防晒"], 59.0, key, style)
+                assert len(results) == 2
+                for item in results:
+                    assert 0 < len(item["title"]) <= cfg["title_max_chars"]
+                    assert len(item["selling_points"]) == 3
+
+    def test_deterministic_and_uses_inputs(self):
+        first = generate_copy_local(self.NAME, ["一键自动开合"], 59.0, "taobao", "promo")
+        assert first == generate_copy_local(self.NAME, ["一键自动开合"], 59.0, "taobao", "promo")
+        assert self.NAME in first[0]["title"]
+        assert "¥59" in first[0]["title"]
+        assert first[0]["selling_points"][0].startswith("一键自动开合")
+
+    def test_no_selling_points(self):
+        results = generate_copy_local("伞", [], 19.9, "xiaohongshu", "seeding")
+        assert all(item["title"] and len(item["selling_points"]) == 3 for item in results)
+
+    def test_offline_batch_skips_llm(self):
+        products = [{"name": f"商品{i}", "selling_points": ["卖点"], "price": 10} for i in range(3)]
+        with patch("core.copy_generator.client") as mock_client:
+            results = list(generate_copy_batch(products, ["taobao", "douyin"], "promo", offline=True))
+        mock_client.chat.completions.create.assert_not_called()
+        assert [i for i, _, _ in results] == [0, 1, 2]
+        assert all(set(copies) == {"taobao", "douyin"} and error is None for _, copies, error in results)
+
+
+class TestCopyBatch:
+    PRODUCTS = [{"name": f"商品{i}", "selling_points": ["卖点"], "price": 10 + i} for i in range(6)]
+
+    def test_results_in_input_order(self):
+        import time as time_mod
+
+        def fake_copy(product_name, **kwargs):
+            # Later rows finish first
+            time_mod.sleep(0.05 * (6 - int(product_name[2:])))
+            return [{"title": product_name, "selling_points": []}]
+
+        with patch("core.copy_generator.generate_copy", side_effect=fake_copy):
+            results = list(generate_copy_batch(self.PRODUCTS, "taobao", "promo", max_workers=6))
+
+        assert [i for i, _, _ in results] == list(range(6))
+        assert [c[0]["title"] for _, c, _ in results] == [p["name"] for p in self.PRODUCTS]
+
+    def test_retries_then_succeeds(self):
+        calls = []
+
+        def flaky(product_name, **kwargs):
+            calls.append(product_name)
+            if len(calls) == 1:
+                raise RuntimeError("rate limited")
+            return [{"title": "ok", "selling_points": []}]
+
+        with patch("core.copy_generator.generate_copy", side_effect=flaky), \
+                patch("core.copy_generator.COPY_RETRY_BACKOFF", 0):
+            results = list(generate_copy_batch(self.PRODUCTS[:1], "taobao", "promo"))
+
+        assert results == [(0, [{"title": "ok", "selling_points": []}], None)]
+        assert metrics.get_counter("copy_batch.retries") == 1
+
+    def test_failure_reported_per_row(self):
+        def fail_odd(product_name, **kwargs):
+            if int(product_name[2:]) % 2:
+                raise RuntimeError("boom")
+            return [{"title": product_name, "selling_points": []}]
+
+        with patch("core.copy_generator.generate_copy", side_effect=fail_odd), \
+                patch("core.copy_generator.COPY_RETRY_BACKOFF", 0):
+            results = list(generate_copy_batch(self.PRODUCTS[:4], "taobao", "promo", retries=1))
+
+        assert [bool(c) for _, c, _ in results] == [True, False, True, False]
+        assert isinstance(results[1][2], RuntimeError)
+
+    def test_batch_priority_carries_into_workers(self):
+        from core import rate_limiter
+
+        seen = []
+
+        def record(**kwargs):
+            seen.append(rate_limiter._priority.get())
+            return []
+
+        with patch("core.copy_generator.generate_copy", side_effect=record):
+            with rate_limiter.priority(rate_limiter.BATCH):
+                list(generate_copy_batch(self.PRODUCTS[:3], "taobao", "promo"))
+
+        assert seen == [rate_limiter.BATCH] * 3
+
+
+def test_format_copy_text():
+    text = format_copy_text([{"title": "标题一", "selling_points": ["A", "B"]}])
+    assert text == "=== 文案方案 1 ===\n标题：标题一\n- A\n- B\n\n"
+
+
+class TestCopyMulti:
+    def _response(self, payload):
+        import json as json_mod
+
+        response = MagicMock()
+        response.choices = [MagicMock(message=MagicMock(content=json_mod.dumps(payload, ensure_ascii=False)))]
+        response.usage = MagicMock(prompt_tokens=400, completion_tokens=200)
+        return response
+
+    def test_one_call_for_all_platforms(self):
+        payload = {"platforms": {
+            "taobao": {"candidates": [{"title": "淘宝标题", "selling_points": ["A"]}]},
+            "xiaohongshu": {"candidates": [{"title": "小红书标题", "selling_points": ["B"]}]},
+        }}
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = self._response(payload)
+            result = generate_copy_multi("商品", ["好用"], 99, ["taobao", "xiaohongshu"], "promo")
+
+        assert mock_client.chat.completions.create.call_count == 1
+        assert result["taobao"][0]["title"] == "淘宝标题"
+        assert result["xiaohongshu"][0]["title"] == "小红书标题"
+        prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        # Each platform brings its own limit and tone
+        assert "标题60字以内" in prompt and "标题20字以内" in prompt
+        assert "种草风、生活化、文艺" in prompt
+
+    def test_missing_platform_raises(self):
+        payload = {"platforms": {"taobao": {"candidates": []}}}
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = self._response(payload)
+            with pytest.raises(RuntimeError, match="xiaohongshu"):
+                generate_copy_multi("商品", ["好用"], 99, ["taobao", "xiaohongshu"], "promo")
+
+    def test_single_platform_uses_generate_copy(self):
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = _mock_copy_response()
+            result = generate_copy_multi("商品", ["好用"], 99, ["douyin"], "promo")
+        assert list(result) == ["douyin"]
+        assert len(result["douyin"]) == 2
+
+    def test_format_copy_text_per_platform(self):
+        text = format_copy_text({"taobao": [{"title": "T", "selling_points": []}]})
+        assert text.startswith("##### 淘宝/天猫 #####\n\n=== 文案方案 1 ===\n标题：T\n")
+
+
+class TestCopyStream:
+    def setup_method(self):
+        metrics.reset()
+
+    def _chunks(self, text, size=5):
+        chunks = []
+        for i in range(0, len(text), size):
+            chunk = MagicMock(usage=None)
+            chunk.choices = [MagicMock(delta=MagicMock(content=text[i:i + size]))]
+            chunks.append(chunk)
+        chunks.append(MagicMock(choices=[], usage=MagicMock(prompt_tokens=300, completion_tokens=120)))
+        return chunks
+
+    def test_parser_emits_candidates_as_they_close(self):
+        from core.copy_generator import CandidateStreamParser
+
+        parser = CandidateStreamParser()
+        assert parser.feed('```json\n{"candidates": [{"title": "标题{1}", "selling_points": ["a\\"') == []
+        first = parser.feed('b"]}, {"title": "T2"')
+        assert first == [(None, {"title": "标题{1}", "selling_points": ['a"b']})]
+        assert parser.feed(', "selling_points": []}]}\n```') == [(None, {"title": "T2", "selling_points": []})]
+
+    def test_parser_tracks_platform_owner(self):
+        from core.copy_generator import CandidateStreamParser
+
+        text = '{"platforms": {"taobao": {"candidates": [{"title": "A"}]}, "douyin": {"candidates": [{"title": "B"}]}}}'
+        parser = CandidateStreamParser()
+        found = [item for ch in text for item in parser.feed(ch)]
+        assert found == [("taobao", {"title": "A"}), ("douyin", {"title": "B"})]
+
+    def test_stream_yields_before_completion_and_caches(self):
+        content = '{"candidates": [{"title": "T1", "selling_points": ["S1"]}, {"title": "T2", "selling_points": ["S2"]}]}'
+        consumed = []
+
+        def chunks():
+            for chunk in self._chunks(content):
+                consumed.append(chunk)
+                yield chunk
+
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = chunks()
+            stream = generate_copy_stream("商品", ["好用"], 99, ["taobao"], "promo")
+            platform, first = next(stream)
+            # The first candidate arrives while the response is still streaming
+            assert len(consumed) < len(self._chunks(content))
+            rest = list(stream)
+
+            assert (platform, first["title"]) == ("taobao", "T1")
+            assert [c["title"] for _, c in rest] == ["T2"]
+            assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+            # Same inputs: served from the shared cache without a request
+            assert generate_copy("商品", ["好用"], 99, "taobao", "promo")[1]["title"] == "T2"
+        assert mock_client.chat.completions.create.call_count == 1
+        assert metrics.get_counter("copy_cache.tokens_saved") == 420
+
+    def test_stream_skips_malformed_candidate(self):
+        content = '{"candidates": [{"title": "T1", "selling_points": ["S1"]}, {"title": b}]}'
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = iter(self._chunks(content))
+            streamed = list(generate_copy_stream("商品", ["好用"], 99, ["taobao"], "promo"))
+
+        assert streamed == [("taobao", {"title": "T1", "selling_points": ["S1"]})]
+        assert metrics.summarize("copy.latency_seconds.promo.taobao")["count"] == 1
+
+    def test_stream_drops_unrequested_platforms_and_extra_candidates(self):
+        candidate = lambda title: {"title": title, "selling_points": ["S"]}
+        content = json.dumps({"platforms": {
+            "淘宝": {"candidates": [candidate("X1")]},
+            "taobao": {"candidates": [candidate("T1"), candidate("T2"), candidate("T3")]},
+            "douyin": {"candidates": [candidate("D1"), candidate("D2")]},
+        }}, ensure_ascii=False)
+
+        with patch("core.copy_generator.client") as mock_client:
+            mock_client.chat.completions.create.return_value = iter(self._chunks(content))
+            streamed = list(generate_copy_stream("商品", ["好用"], 99, ["taobao", "douyin"], "promo"))
+
+        assert streamed == [
+            ("taobao", candidate("T1")), ("taobao", candidate("T2")),
+            ("douyin", candidate("D1")), ("douyin", candidate("D2")),
+        ]
@@ -65,3 +65,259 @@ def test_save_and_list_history():
         assert len(history) == 1
         assert history[0]["template_name"] == "促销爆款"
         db.close()
+
+
+def test_ai_task_journal_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        db.save_ai_task("task-1", "hash-a")
+        assert db.find_resumable_ai_task("hash-a")["task_id"] == "task-1"
+        assert db.find_resumable_ai_task("hash-b") is None
+
+        db.update_ai_task("task-1", "SUCCEEDED", ["https://x/1.png"])
+        task = db.find_resumable_ai_task("hash-a")
+        assert task["status"] == "SUCCEEDED"
+        assert task["result_urls"] == ["https://x/1.png"]
+
+        db.update_ai_task("task-1", "CLAIMED")
+        assert db.find_resumable_ai_task("hash-a") is None
+        assert db.get_ai_task("task-1")["status"] == "CLAIMED"
+        db.close()
+
+
+def test_ai_task_journal_ignores_stale_tasks():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        db.save_ai_task("old", "hash-a")
+        db.conn.execute("UPDATE ai_task_journal SET created_at = datetime('now', '-2 days')")
+        db.conn.commit()
+        assert db.find_resumable_ai_task("hash-a") is None
+        db.close()
+
+
+def test_copy_cache_roundtrip_and_purge():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        candidates = [{"title": "标题", "selling_points": ["卖点"]}]
+        db.save_copy_cache("key-1", candidates, "deepseek-chat", 300, 120)
+        cached = db.get_copy_cache("key-1", 24)
+        assert cached["response"] == candidates
+        assert cached["prompt_tokens"] + cached["completion_tokens"] == 420
+
+        db.conn.execute("UPDATE copy_cache SET created_at = datetime('now', '-2 days')")
+        db.conn.commit()
+        assert db.get_copy_cache("key-1", 24) is None
+        assert db.purge_copy_cache(24) == 1
+        db.close()
+
+
+def test_wal_mode_and_per_thread_connections():
+    import threading
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.conn is db.conn
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(db.conn))
+        thread.start()
+        thread.join()
+        assert other[0] is not db.conn
+        db.close()
+
+
+def test_concurrent_writers_and_readers():
+    from concurrent.futures import ThreadPoolExecutor
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        mid = db.save_material("商品", ["卖点"], 10, "/a.png")
+
+        def write(i):
+            db.save_history(mid, "minimal", "taobao", "promo", f"/out{i}.png", [])
+
+        def read(_):
+            return len(db.list_history(limit=10))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            writes = [pool.submit(write, i) for i in range(40)]
+            reads = [pool.submit(read, i) for i in range(40)]
+            for future in writes + reads:
+                future.result()
+        assert len(db.list_history(limit=100)) == 40
+        db.close()
+
+
+def test_materials_keyset_pages_cover_all_rows_once():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        for i in range(7):
+            db.save_material(f"商品{i}", ["卖点"], i, f"/{i}.png")
+        # Same timestamp for all rows: ties are broken by id
+        seen, cursor = [], None
+        while True:
+            page, cursor = db.list_materials_page(after=cursor, limit=3)
+            seen.extend(m["name"] for m in page)
+            if cursor is None:
+                break
+        assert seen == [f"商品{i}" for i in reversed(range(7))]
+        db.close()
+
+
+def test_history_page_filters():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        mid = db.save_material("商品", ["卖点"], 10, "/a.png")
+        for platform in ("taobao", "douyin", "taobao"):
+            db.save_history(mid, "minimal", platform, "promo", "/out.png", [])
+        db.save_history(mid, "promo", "taobao", "promo", "/out.png", [])
+        db.conn.execute("UPDATE generation_history SET created_at = '2026-01-01 10:00:00' WHERE id = 1")
+        db.conn.commit()
+
+        page, cursor = db.list_history_page(platform="taobao")
+        assert [h["id"] for h in page] == [4, 3, 1] and cursor is None
+        assert page[0]["product_name"] == "商品"
+        page, _ = db.list_history_page(platform="taobao", template_name="minimal")
+        assert [h["id"] for h in page] == [3, 1]
+        page, _ = db.list_history_page(since="2026-01-01", until="2026-01-02")
+        assert [h["id"] for h in page] == [1]
+        page, cursor = db.list_history_page(limit=2)
+        assert [h["id"] for h in page] == [4, 3]
+        page, cursor = db.list_history_page(after=cursor, limit=2)
+        assert [h["id"] for h in page] == [2, 1] and cursor is None
+        db.close()
+
+
+def test_search_materials_full_text():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        shoes = db.save_material("轻跑运动鞋", ["透气网面", "缓震中底"], 299, "/a.png")
+        dress = db.save_material("碎花连衣裙", ["透气面料", "显瘦收腰"], 199, "/b.png")
+        db.save_material("透气网面跑鞋", ["轻便"], 259, "/c.png")
+
+        # Selling points are searched; name matches rank first
+        assert [m["name"] for m in db.search_materials("透气网面")] == ["透气网面跑鞋", "轻跑运动鞋"]
+        # Short terms (below the trigram length) fall back to LIKE, combined with AND
+        assert [m["id"] for m in db.search_materials("透气 显瘦")] == [dress]
+        assert [m["id"] for m in db.search_materials("缓震中底 鞋")] == [shoes]
+        assert db.search_materials("  ") == []
+
+        # Triggers keep the index in sync
+        db.update_material(dress, selling_points=["垂感面料"])
+        assert db.search_materials("显瘦收腰") == []
+        db.delete_material(shoes)
+        assert db.search_materials("缓震中底") == []
+        db.close()
+
+
+def test_search_index_built_for_existing_rows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "test.db")
+        db = Database(path)
+        db.conn.executescript(
+            "DROP TABLE materials_fts; DROP TRIGGER materials_fts_insert; "
+            "DROP TRIGGER materials_fts_delete; DROP TRIGGER materials_fts_update;"
+        )
+        db.save_material("旧版数据库商品", ["卖点"], 10, "/a.png")
+        db.close()
+
+        db = Database(path)
+        assert [m["name"] for m in db.search_materials("数据库")] == ["旧版数据库商品"]
+        db.close()
+
+
+def test_bulk_insert_links_history_to_new_materials():
+    import pytest
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        existing = db.save_material("已有商品", [], 1, "/x.png")
+        ids = db.save_materials_bulk([
+            {"name": f"批量商品{i}", "selling_points": ["卖点"], "price": i, "image_path": f"/{i}.png"}
+            for i in range(3)
+        ])
+        assert ids == [existing + 1, existing + 2, existing + 3]
+        assert db.get_material(ids[2])["name"] == "批量商品2"
+        # Bulk-inserted materials are searchable through the FTS triggers
+        assert [m["id"] for m in db.search_materials("批量商品1")] == [ids[1]]
+
+        history_ids = db.save_history_bulk(
+            [
+                {"material_index": i, "template_name": "minimal", "platform": pk, "copy_style": "promo",
+                 "image_path": f"/out{i}_{pk}.png", "copies": [{"title": f"T{i}"}]}
+                for i in range(3) for pk in ("taobao", "douyin")
+            ] + [{"material_id": existing, "platform": "jd"}],
+            material_ids=ids,
+        )
+        assert len(history_ids) == 7
+        history = {h["id"]: h for h in db.list_history(limit=10)}
+        assert history[history_ids[0]]["product_name"] == "批量商品0"
+        assert history[history_ids[5]]["material_id"] == ids[2]
+        assert history[history_ids[5]]["generated_copy"] == [{"title": "T2"}]
+        assert history[history_ids[6]]["product_name"] == "已有商品"
+        assert db.save_materials_bulk([]) == [] and db.save_history_bulk([]) == []
+        unlinked = db.save_history_bulk([{"platform": "jd"}])
+        assert db.list_history(limit=1)[0]["id"] == unlinked[0]
+        assert db.list_history(limit=1)[0]["material_id"] is None
+        with pytest.raises(ValueError):
+            db.save_history_bulk([{"material_index": 0, "platform": "jd"}])
+        for bad in (-1, len(ids)):
+            with pytest.raises(ValueError):
+                db.save_history_bulk([{"platform": "jd"}, {"material_index": bad, "platform": "jd"}], material_ids=ids)
+        # Nothing from the rejected batches was written
+        assert db.list_history(limit=1)[0]["id"] == unlinked[0]
+        db.close()
+
+
+def test_rows_decode_json_lazily_and_select_columns():
+    import json
+    from unittest.mock import patch
+    import pytest
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        mid = db.save_material("商品", ["卖点1", "卖点2"], 10, "/a.png")
+        db.save_history(mid, "minimal", "taobao", "promo", "/out.png", [{"title": "T"}])
+
+        with patch("data.db.json.loads", wraps=json.loads) as loads:
+            rows = db.list_materials()
+            assert rows[0]["name"] == "商品"
+            assert loads.call_count == 0
+            assert rows[0]["selling_points"] == ["卖点1", "卖点2"]
+            assert rows[0].get("selling_points") is rows[0]["selling_points"]
+            assert loads.call_count == 1
+
+        row = db.get_material(mid)
+        assert dict(row) == {
+            "id": mid, "name": "商品", "selling_points": ["卖点1", "卖点2"],
+            "price": 10, "image_path": "/a.png", "created_at": row["created_at"],
+        }
+        assert row.get("missing", "default") == "default"
+
+        history = db.list_history(columns=["product_name", "platform"])
+        assert dict(history[0]) == {"product_name": "商品", "platform": "taobao"}
+        page, _ = db.list_history_page(columns=["platform"])
+        assert set(page[0]) == {"platform", "created_at", "id"}
+        with pytest.raises(KeyError):
+            db.list_materials(columns=["name; DROP TABLE materials"])
+        db.close()
+
+
+def test_get_materials_is_one_query():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, "test.db"))
+        ids = db.save_materials_bulk([{"name": f"商品{i}", "selling_points": [f"卖点{i}"], "price": i} for i in range(100)])
+        db.save_history_bulk(
+            [{"material_index": i % 100, "platform": "taobao"} for i in range(150)] + [{"material_id": 0, "platform": "jd"}],
+            material_ids=ids,
+        )
+
+        statements = []
+        db.conn.set_trace_callback(statements.append)
+        history, _ = db.list_history_page(limit=200)
+        materials = db.get_materials(record["material_id"] for record in history)
+        db.conn.set_trace_callback(None)
+
+        assert len(statements) == 2
+        assert set(materials) == set(ids)  # material_id 0 (no material) is skipped
+        assert materials[ids[7]]["selling_points"] == ["卖点7"]
+        assert db.get_materials([]) == {}
+        assert db.get_materials([ids[0], 10**9]).keys() == {ids[0]}
+        db.close()
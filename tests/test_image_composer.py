@@ -45,3 +45,60 @@ def test_compose_images_multi_platform():
     assert len(results) == 3
     assert results["pinduoduo"].size == (750, 352)
     assert results["douyin"].size == (720, 960)
+
+
+def test_compose_images_per_platform_overrides():
+    product_img = Image.new("RGBA", (400, 400), (255, 0, 0, 255))
+    product_info = {"name": "测试商品", "selling_points": ["卖点1"], "price": 50}
+    overrides = {
+        "taobao": Image.new("RGB", (800, 800), (0, 0, 255)),
+        "pinduoduo": Image.new("RGB", (750, 352), (0, 255, 0)),
+    }
+
+    results = compose_images(
+        product_image=product_img,
+        product_info=product_info,
+        platforms=["taobao", "pinduoduo"],
+        template_style="ai_promo",
+        skip_bg_removal=True,
+        ai_composed_overrides=overrides,
+    )
+
+    assert results["taobao"].getpixel((5, 400))[2] > 200
+    assert results["pinduoduo"].getpixel((5, 176))[1] > 200
+    assert results["pinduoduo"].size == (750, 352)
+
+
+def test_compose_images_ai_deadline_reports_late_platforms():
+    import threading
+
+    product_img = Image.new("RGBA", (400, 400), (255, 0, 0, 255))
+    product_info = {"name": "测试商品", "selling_points": ["卖点1"], "price": 99.9}
+    release = threading.Event()
+    late = {}
+    done = threading.Event()
+
+    def slow_ai(**kwargs):
+        release.wait(5)
+        return [Image.new("RGB", (kwargs["width"], kwargs["height"]), (0, 0, 255))]
+
+    def on_ready(platform, image):
+        late[platform] = image
+        if len(late) == 2:
+            done.set()
+
+    with patch("core.image_composer.remove_background", return_value=product_img), \
+            patch("core.bg_generator.generate_ai_background", side_effect=slow_ai):
+        results = compose_images(
+            product_image=product_img,
+            product_info=product_info,
+            platforms=["taobao", "pinduoduo"],
+            template_style="ai_promo",
+            ai_deadline=0.05,
+            on_ai_ready=on_ready,
+        )
+        assert set(results) == {"taobao", "pinduoduo"}
+        release.set()
+        assert done.wait(5)
+
+    assert late["pinduoduo"].size == results["pinduoduo"].size
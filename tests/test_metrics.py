@@ -0,0 +1,40 @@
+from core import metrics
+
+
+def setup_function():
+    metrics.reset()
+
+
+def test_counters_accumulate():
+    metrics.incr("a")
+    metrics.incr("a", 2.5)
+    assert metrics.get_counter("a") == 3.5
+    assert metrics.get_counter("missing") == 0
+
+
+def test_hit_rate():
+    assert metrics.hit_rate("cache") == 0.0
+    metrics.incr("cache.hits", 3)
+    metrics.incr("cache.misses")
+    assert metrics.hit_rate("cache") == 0.75
+
+
+def test_summarize_samples():
+    for v in range(1, 101):
+        metrics.observe("latency", v)
+    s = metrics.summarize("latency")
+    assert s["count"] == 100
+    assert s["p50"] == 50
+    assert s["p95"] == 95
+    assert s["max"] == 100
+    assert metrics.summarize("empty")["count"] == 0
+
+
+def test_snapshot_and_reset():
+    metrics.incr("c")
+    metrics.observe("s", 1.0)
+    snap = metrics.snapshot()
+    assert snap["counters"]["c"] == 1
+    assert snap["series"]["s"]["count"] == 1
+    metrics.reset()
+    assert metrics.snapshot() == {"counters": {}, "series": {}}
@@ -0,0 +1,39 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from core.pipeline import start_copy
+
+CANDIDATE = {"title": "标题", "selling_points": ["卖点"]}
+
+
+def _slow_stream(*args, **kwargs):
+    time.sleep(0.3)
+    yield "taobao", CANDIDATE
+    yield "douyin", CANDIDATE
+
+
+def test_failed_job_streams_its_candidates_then_raises():
+    def partial(*args, **kwargs):
+        yield "taobao", CANDIDATE
+        raise RuntimeError("文案生成失败")
+
+    with patch("core.pipeline.generate_copy_stream", side_effect=partial):
+        job = start_copy("商品", ["卖点"], 99, ["taobao", "douyin"], "promo")
+        stream = job.stream()
+        assert next(stream) == ("taobao", CANDIDATE)
+        with pytest.raises(RuntimeError, match="文案生成失败"):
+            next(stream)
+
+    # The page keeps template copy for platforms the job did not deliver
+    assert len(job.local_copies()["douyin"]) == 2
+
+
+def test_stream_replays_for_later_consumers():
+    with patch("core.pipeline.generate_copy_stream", side_effect=_slow_stream):
+        job = start_copy("商品", ["卖点"], 99, ["taobao", "douyin"], "promo")
+        first = list(job.stream())
+    assert job.done()
+    assert list(job.stream()) == first == [("taobao", CANDIDATE), ("douyin", CANDIDATE)]
+    assert job.result() == {"taobao": [CANDIDATE], "douyin": [CANDIDATE]}
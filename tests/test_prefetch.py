@@ -0,0 +1,65 @@
+import threading
+import time
+
+from core import metrics
+from core.prefetch import Prefetcher, input_signature
+
+
+class TestInputSignature:
+    def test_stable_and_sensitive(self):
+        assert input_signature(b"img", "promo", None) == input_signature(b"img", "promo", None)
+        assert input_signature(b"img", "promo") != input_signature(b"img", "premium")
+        assert input_signature(b"img2", "promo") != input_signature(b"img", "promo")
+
+
+class TestPrefetcher:
+    def setup_method(self):
+        metrics.reset()
+
+    def test_starts_after_debounce(self):
+        ran = threading.Event()
+        p = Prefetcher(debounce=0.05)
+        p.schedule("a", lambda: ran.set() or "result")
+        assert not ran.is_set()
+        assert ran.wait(2)
+        assert p.take("a").result(timeout=2) == "result"
+        assert metrics.get_counter("prefetch.hits") == 1
+
+    def test_changed_inputs_cancel_pending_work(self):
+        calls = []
+        p = Prefetcher(debounce=0.1)
+        p.schedule("a", lambda: calls.append("a"))
+        p.schedule("b", lambda: calls.append("b") or "b")
+        assert p.take("b").result(timeout=2) == "b"
+        time.sleep(0.2)
+        assert calls == ["b"]
+
+    def test_take_with_stale_signature_misses(self):
+        p = Prefetcher(debounce=10)
+        p.schedule("a", lambda: "a")
+        assert p.take("b") is None
+        assert metrics.get_counter("prefetch.misses") == 1
+        p.cancel()
+
+    def test_take_during_debounce_starts_immediately(self):
+        p = Prefetcher(debounce=10)
+        p.schedule("a", lambda: "a")
+        assert p.take("a").result(timeout=2) == "a"
+        # Handed over: the click owns it now
+        assert p.take("a") is None
+
+    def test_rescheduling_same_signature_keeps_work(self):
+        count = []
+        p = Prefetcher(debounce=0.05)
+        p.schedule("a", lambda: count.append(1))
+        p.schedule("a", lambda: count.append(1))
+        p.take("a").result(timeout=2)
+        assert len(count) == 1
+
+    def test_cancel_drops_pending(self):
+        ran = threading.Event()
+        p = Prefetcher(debounce=0.05)
+        p.schedule("a", ran.set)
+        p.cancel()
+        time.sleep(0.15)
+        assert not ran.is_set()
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core import providers
+
+
+@pytest.fixture
+def fake_provider():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return type("Client", (), {"ping": lambda self: "pong"})()
+
+    providers.register("fake", factory)
+    yield calls
+    providers._factories.pop("fake", None)
+    providers.reset("fake")
+
+
+def test_provider_built_once_on_first_use(fake_provider):
+    assert fake_provider == []
+    first = providers.get("fake")
+    assert providers.get("fake") is first
+    assert fake_provider == [1]
+
+
+def test_reset_rebuilds_provider(fake_provider):
+    first = providers.get("fake")
+    providers.reset("fake")
+    assert providers.get("fake") is not first
+    assert fake_provider == [1, 1]
+
+
+def test_lazy_client_defers_construction(fake_provider):
+    client = providers.LazyClient("fake")
+    assert fake_provider == []
+    assert client.ping() == "pong"
+    client.ping()
+    assert fake_provider == [1]
+
+
+def test_missing_rembg_raises_runtime_error(monkeypatch):
+    monkeypatch.setitem(sys.modules, "rembg", None)
+    providers.reset("rembg")
+    with pytest.raises(RuntimeError, match="rembg is not installed"):
+        providers.get("rembg")
+
+
+def test_core_imports_do_not_load_sdks():
+    code = (
+        "import sys, core.copy_generator, core.bg_generator, core.image_composer; "
+        "print(' '.join(m for m in ('openai', 'dashscope', 'rembg', 'dotenv') if m in sys.modules))"
+    )
+    # No API keys in the environment: importing must not need them either
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env={"PATH": ""},
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from core import metrics
+from core.rate_limiter import (
+    BATCH,
+    INTERACTIVE,
+    Governor,
+    SQLiteTokenBucket,
+    TokenBucket,
+    get_governor,
+    priority,
+)
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.1
+
+
+def test_sqlite_bucket_shared_between_instances(tmp_path):
+    path = str(tmp_path / "rl.db")
+    a = SQLiteTokenBucket(path, "p", rate=0.001, burst=2)
+    b = SQLiteTokenBucket(path, "p", rate=0.001, burst=2)
+    assert a.try_acquire() == 0
+    assert b.try_acquire() == 0
+    assert a.try_acquire() > 0
+    assert b.try_acquire() > 0
+
+
+def test_concurrency_limit():
+    gov = Governor("t", TokenBucket(rate=1000, burst=1000), max_concurrency=2)
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal peak
+        with gov.slot():
+            with lock:
+                peak = max(peak, gov.active)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak == 2
+    assert gov.active == 0
+
+
+def test_interactive_served_before_batch():
+    metrics.reset()
+    gov = Governor("prio", TokenBucket(rate=1000, burst=1000), max_concurrency=1)
+    order = []
+    gov.acquire()  # hold the only slot while waiters queue up
+
+    def waiter(label, level):
+        with gov.slot(level):
+            order.append(label)
+
+    threads = [threading.Thread(target=waiter, args=(f"batch{i}", BATCH)) for i in range(3)]
+    threads.append(threading.Thread(target=waiter, args=("interactive", INTERACTIVE)))
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    while gov.queue_depth < 4:
+        time.sleep(0.005)
+    gov.release()
+    for t in threads:
+        t.join()
+
+    assert order[0] == "interactive"
+    assert metrics.summarize("governor.prio.queue_depth")["max"] == 4
+
+
+def test_priority_context_used_by_default():
+    gov = Governor("ctx", TokenBucket(rate=1000, burst=1000), max_concurrency=1)
+    gov.acquire()
+
+    def batch_caller():
+        with priority(BATCH):
+            with gov.slot():
+                pass
+
+    t = threading.Thread(target=batch_caller)
+    t.start()
+    while gov.queue_depth < 1:
+        time.sleep(0.005)
+    assert gov._waiting[0][0] == BATCH
+    gov.release()
+    t.join()
+
+
+def test_acquire_timeout_raises():
+    gov = Governor("slow", TokenBucket(rate=1000, burst=1000), max_concurrency=1)
+    gov.acquire()
+    with pytest.raises(RuntimeError, match="排队超时"):
+        gov.acquire(timeout=0.05)
+    assert gov.queue_depth == 0
+    gov.release()
+
+
+@patch.dict(os.environ, {"DEEPSEEK_MAX_CONCURRENCY": "3"})
+def test_get_governor_reads_env_limits():
+    gov = get_governor("deepseek")
+    assert gov.max_concurrency == 3
+    assert get_governor("deepseek") is gov
@@ -0,0 +1,43 @@
+import os
+
+from core.result_cache import BlobCache
+
+
+def test_get_missing_returns_none(tmp_path):
+    cache = BlobCache(str(tmp_path / "c"), 1024)
+    assert cache.get("ab" * 32) is None
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    cache = BlobCache(str(tmp_path / "c"), 1024)
+    cache.put("ab" * 32, [b"first", b"second"])
+    assert cache.get("ab" * 32) == [b"first", b"second"]
+
+
+def test_put_replaces_entry(tmp_path):
+    cache = BlobCache(str(tmp_path / "c"), 1024)
+    cache.put("ab" * 32, [b"a", b"b", b"c"])
+    cache.put("ab" * 32, [b"z"])
+    assert cache.get("ab" * 32) == [b"z"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = BlobCache(str(tmp_path / "c"), 250)
+    cache.put("aa" * 32, [b"x" * 100])
+    cache.put("bb" * 32, [b"x" * 100])
+    # Make "aa" the most recently used entry
+    os.utime(os.path.join(str(tmp_path / "c"), "bb", "bb" * 32), (0, 0))
+    cache.get("aa" * 32)
+    cache.put("cc" * 32, [b"x" * 100])
+
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) is not None
+    assert cache.get("cc" * 32) is not None
+    assert cache.total_bytes() <= 250
+
+
+def test_clear(tmp_path):
+    cache = BlobCache(str(tmp_path / "c"), 1024)
+    cache.put("ab" * 32, [b"data"])
+    cache.clear()
+    assert cache.get("ab" * 32) is None
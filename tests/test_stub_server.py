@@ -0,0 +1,150 @@
+import os
+import random
+from unittest.mock import patch
+
+import pytest
+import requests
+from PIL import Image
+
+from benchmarks.stub_server import Latency, StubState, start_server
+from core import bg_generator, metrics
+
+
+@pytest.fixture
+def stub():
+    state = StubState(task_duration="fixed:0.2", chat_latency="fixed:0", seed=1)
+    server = start_server(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state, base
+    server.shutdown()
+
+
+def test_latency_distributions():
+    rng = random.Random(0)
+    assert Latency("fixed:1.5").sample(rng) == 1.5
+    assert 1 <= Latency("uniform:1,2").sample(rng) <= 2
+    assert Latency("lognormal:2,0.3").sample(rng) > 0
+    with pytest.raises(ValueError):
+        Latency("bogus:1")
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key"})
+def test_generate_ai_background_against_stub(stub, monkeypatch):
+    state, base = stub
+    monkeypatch.setenv("DASHSCOPE_HTTP_BASE_URL", f"{base}/api/v1")
+    monkeypatch.setattr(bg_generator, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(bg_generator, "_upload_to_oss", lambda path, key: "oss://stub-uploads/x.png")
+
+    result = bg_generator.generate_ai_background(
+        Image.new("RGBA", (200, 200), (255, 0, 0, 255)), "商品", "promo", 400, 400, n=2,
+    )
+
+    assert len(result) == 2
+    assert result[0].size == (400, 400)
+    assert state.counts["submitted"] == 1
+
+
+def test_quota_errors_returned_as_429(stub):
+    state, base = stub
+    state.quota_error_rate = 1.0
+    resp = requests.post(f"{base}/api/v1/services/aigc/background-generation/generation/", json={})
+    assert resp.status_code == 429
+    assert resp.json()["code"].startswith("Throttling")
+
+
+def test_chat_completions(stub):
+    _, base = stub
+    resp = requests.post(f"{base}/chat/completions", json={"messages": []})
+    assert resp.status_code == 200
+    assert "candidates" in resp.json()["choices"][0]["message"]["content"]
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key", "DASHSCOPE_MAX_CONCURRENCY": "3", "DASHSCOPE_BURST": "3"})
+def test_fan_out_streams_candidates_and_hedges(stub, monkeypatch):
+    state, base = stub
+    monkeypatch.setenv("DASHSCOPE_HTTP_BASE_URL", f"{base}/api/v1")
+    monkeypatch.setattr(bg_generator, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(bg_generator, "_upload_to_oss", lambda path, key: "oss://stub-uploads/x.png")
+
+    bg_generator.clear_upload_cache()
+    metrics.reset()
+
+    arrived = []
+    result = bg_generator.generate_ai_background(
+        Image.new("RGBA", (200, 200), (255, 0, 0, 255)), "商品", "promo", 400, 400, n=2,
+        fan_out=True, hedge=True, on_candidate=arrived.append,
+    )
+
+    assert len(result) == 2
+    assert arrived == result
+    # n single-image tasks plus one hedge
+    assert state.counts["submitted"] == 3
+    assert all(t["n"] == 1 for t in state.tasks.values())
+    # The canvas is uploaded (and measured) once for the whole fan-out, not per task
+    assert metrics.get_counter("oss_upload.misses") == 1
+    assert metrics.get_counter("oss_upload.hits") == 0
+    assert metrics.summarize("ai_bg.upload_bytes")["count"] == 1
+    assert metrics.summarize("ai_bg.upload_bytes")["max"] > 0
+
+
+def test_cancel_only_pending_tasks(stub):
+    state, base = stub
+    submit = requests.post(
+        f"{base}/api/v1/services/aigc/background-generation/generation/", json={"parameters": {"n": 1}}
+    )
+    task_id = submit.json()["output"]["task_id"]
+    assert requests.post(f"{base}/api/v1/tasks/{task_id}/cancel").status_code == 200
+    assert requests.get(f"{base}/api/v1/tasks/{task_id}").json()["output"]["task_status"] == "CANCELED"
+    assert requests.post(f"{base}/api/v1/tasks/missing/cancel").status_code == 400
+
+
+def test_streamed_copy_against_stub(stub, monkeypatch):
+    from openai import OpenAI
+
+    from core import copy_generator
+
+    _, base = stub
+    monkeypatch.setattr(copy_generator, "client", OpenAI(api_key="stub-key", base_url=base))
+
+    streamed = list(copy_generator.generate_copy_stream("商品", ["卖点"], 99, ["taobao"], "promo"))
+
+    assert [c["title"] for _, c in streamed] == ["本地测试标题一", "本地测试标题二"]
+    assert all(platform == "taobao" for platform, _ in streamed)
+
+
+@patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key"})
+def test_fan_out_respects_default_concurrency(stub, monkeypatch):
+    state, base = stub
+    monkeypatch.delenv("DASHSCOPE_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setenv("DASHSCOPE_HTTP_BASE_URL", f"{base}/api/v1")
+    monkeypatch.setattr(bg_generator, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(bg_generator, "_upload_to_oss", lambda path, key: "oss://stub-uploads/x.png")
+    product = Image.new("RGBA", (200, 200), (255, 0, 0, 255))
+
+    # Two dashscope slots: four single-image tasks would queue, so one n=4 task is sent
+    result = bg_generator.generate_ai_background(product, "商品", "promo", 400, 400, n=4, fan_out=True, hedge=True)
+    assert len(result) == 4
+    assert state.counts["submitted"] == 1
+
+    # n=2 fits the slots, but the hedge task would have to wait for one
+    result = bg_generator.generate_ai_background(
+        product, "商品", "minimal", 400, 400, n=2, fan_out=True, hedge=True,
+    )
+    assert len(result) == 2
+    assert state.counts["submitted"] == 3
+    assert [t["n"] for t in state.tasks.values()] == [4, 1, 1]
+
+
+def test_multi_platform_copy_against_stub(stub, monkeypatch):
+    from openai import OpenAI
+
+    from core import copy_generator
+
+    _, base = stub
+    monkeypatch.setattr(copy_generator, "client", OpenAI(api_key="stub-key", base_url=base))
+
+    copies = copy_generator.generate_copy_multi("商品", ["卖点"], 99, ["taobao", "douyin"], "promo")
+    streamed = list(copy_generator.generate_copy_stream("商品", ["卖点"], 99, ["taobao", "xiaohongshu"], "promo"))
+
+    assert set(copies) == {"taobao", "douyin"} and len(copies["douyin"]) == 2
+    assert [platform for platform, _ in streamed] == ["taobao", "taobao", "xiaohongshu", "xiaohongshu"]
@@ -171,3 +171,86 @@ def test_render_minimal_template_no_decorations():
     result = render_image(tpl, product_img, product_info)
     assert isinstance(result, Image.Image)
     assert result.mode == "RGB"
+
+
+def test_render_ai_template_deadline_falls_back_then_delivers_late_result():
+    """A slow AI background should not block past the deadline; the late result is re-rendered."""
+    import threading
+    import time
+
+    tpl = load_template(os.path.join(PRESETS_DIR, "ai_promo_taobao.json"))
+    product_img = Image.new("RGBA", (400, 400), (255, 0, 0, 128))
+    product_info = {"name": "慢速测试", "selling_points": ["卖点"], "price": 99}
+    release = threading.Event()
+    ready = []
+    arrived = threading.Event()
+
+    def slow_ai(**kwargs):
+        release.wait(5)
+        return [Image.new("RGB", (kwargs["width"], kwargs["height"]), (0, 0, 255))]
+
+    def on_ready(image):
+        ready.append(image)
+        arrived.set()
+
+    with patch("core.bg_generator.generate_ai_background", side_effect=slow_ai):
+        start = time.monotonic()
+        result = render_image(tpl, product_img, product_info, ai_deadline=0.05, on_ai_ready=on_ready)
+        assert time.monotonic() - start < 2
+        assert result.size == (800, 800)
+        assert not ready
+
+        release.set()
+        assert arrived.wait(5)
+    assert ready[0].size == (800, 800)
+    # Corner pixel comes from the late AI scene, not the gradient fallback
+    assert ready[0].getpixel((0, 0)) != result.getpixel((0, 0))
+
+
+def test_render_ai_template_within_deadline_uses_ai_result():
+    tpl = load_template(os.path.join(PRESETS_DIR, "ai_promo_taobao.json"))
+    product_img = Image.new("RGBA", (400, 400), (255, 0, 0, 128))
+    product_info = {"name": "快速测试", "selling_points": ["卖点"], "price": 99}
+    scene = [Image.new("RGB", (800, 800), (0, 0, 255))]
+
+    with patch("core.bg_generator.generate_ai_background", return_value=scene) as mock_ai:
+        fast = render_image(tpl, product_img, product_info, ai_deadline=5)
+        inline = render_image(tpl, product_img, product_info)
+
+    assert mock_ai.call_count == 2
+    assert fast.tobytes() == inline.tobytes()
+
+
+def test_render_ai_template_spent_deadline_skips_ai_request():
+    tpl = load_template(os.path.join(PRESETS_DIR, "ai_promo_taobao.json"))
+    product_img = Image.new("RGBA", (400, 400), (255, 0, 0, 128))
+    product_info = {"name": "超时测试", "selling_points": ["卖点"], "price": 99}
+
+    with patch("core.bg_generator.generate_ai_background") as mock_ai:
+        result = render_image(tpl, product_img, product_info, ai_deadline=0)
+
+    assert result.size == (800, 800)
+    mock_ai.assert_not_called()
+
+
+def test_missed_ai_request_without_on_late_is_cancelled():
+    import threading
+    from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+    import pytest
+
+    from core.template_engine import AI_BG_WORKERS, _ai_executor, _await_ai_background
+
+    release = threading.Event()
+    blockers = [_ai_executor.submit(release.wait, 5) for _ in range(AI_BG_WORKERS)]
+    request = MagicMock()
+    try:
+        with pytest.raises(FuturesTimeoutError):
+            _await_ai_background(request, 0.05)
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+    _ai_executor.submit(lambda: None).result()
+
+    request.assert_not_called()